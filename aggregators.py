@@ -0,0 +1,151 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from posts import moscow_hours, moscow_weekdays
+
+# === СТАТИСТИКА ПО ВРЕМЕНИ ПУБЛИКАЦИЙ ===
+WEEKDAYS = 7
+HOURS = 24
+SLOTS = WEEKDAYS * HOURS
+WEEKDAY_NAMES = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+
+# Квантили t-распределения для 95%-интервала (степени свободы 1..30), дальше — нормальное
+T_975 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)
+Z_975 = 1.96
+
+
+def slot_of(timestamps: np.ndarray) -> np.ndarray:
+    """Номер ячейки (день недели × час по Москве) для каждого поста"""
+    return moscow_weekdays(timestamps) * HOURS + moscow_hours(timestamps)
+
+
+class PostingStats:
+    """
+    Онлайн-статистика просмотров по ячейкам: число постов, среднее и M2 (сумма квадратов отклонений).
+    Пачка постов добавляется через bincount за O(пачки), две статистики сливаются формулой Чана,
+    поэтому итог по всей истории обновляется без пересчёта старых постов.
+    """
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, count: np.ndarray, mean: np.ndarray, m2: np.ndarray):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    # === ПОСТРОЕНИЕ ===
+    @classmethod
+    def empty(cls, size: int = SLOTS) -> "PostingStats":
+        return cls(np.zeros(size, dtype=np.int64), np.zeros(size), np.zeros(size))
+
+    @classmethod
+    def from_values(cls, slots: np.ndarray, values: np.ndarray, size: int = SLOTS) -> "PostingStats":
+        """Статистика пачки: значения values в ячейках slots"""
+        slots = np.asarray(slots, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        count = np.bincount(slots, minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, np.bincount(slots, weights=values, minlength=size) / count, 0.0)
+        m2 = np.bincount(slots, weights=(values - mean[slots]) ** 2, minlength=size)
+        return cls(count, mean, m2)
+
+    @classmethod
+    def from_posts(cls, timestamps: np.ndarray, views: np.ndarray) -> "PostingStats":
+        return cls.from_values(slot_of(timestamps), views)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, int, float, float]], size: int = SLOTS) -> "PostingStats":
+        """Из строк (ячейка, число, среднее, M2) хранилища"""
+        stats = cls.empty(size)
+        for slot, count, mean, m2 in rows:
+            stats.count[slot], stats.mean[slot], stats.m2[slot] = count, mean, m2
+        return stats
+
+    def rows(self) -> Iterable[Tuple[int, int, float, float]]:
+        """Непустые ячейки в виде строк для хранилища"""
+        for slot in np.flatnonzero(self.count):
+            yield int(slot), int(self.count[slot]), float(self.mean[slot]), float(self.m2[slot])
+
+    # === СЛИЯНИЕ ===
+    def merge(self, other: "PostingStats") -> "PostingStats":
+        """Статистика объединения двух непересекающихся наборов постов"""
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(count > 0, other.count / count, 0.0)
+        mean = self.mean + delta * share
+        m2 = self.m2 + other.m2 + delta ** 2 * self.count * share
+        return PostingStats(count, mean, m2)
+
+    def remove(self, other: "PostingStats") -> "PostingStats":
+        """Обратное слиянию: статистика без постов other (например, перед заменой их просмотров)"""
+        count = self.count - other.count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, (self.mean * self.count - other.mean * other.count) / count, 0.0)
+        delta = other.mean - mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            correction = np.where(self.count > 0, delta ** 2 * count * other.count / self.count, 0.0)
+        # Погрешность вычитания не должна давать отрицательную дисперсию
+        m2 = np.where(count > 0, np.maximum(self.m2 - other.m2 - correction, 0.0), 0.0)
+        return PostingStats(count, mean, m2)
+
+    def by_hour(self) -> "PostingStats":
+        """Свёртка по дням недели: статистика по 24 часам"""
+        count = self.count.reshape(WEEKDAYS, HOURS)
+        mean = self.mean.reshape(WEEKDAYS, HOURS)
+        m2 = self.m2.reshape(WEEKDAYS, HOURS)
+        total = count.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            hour_mean = np.where(total > 0, (mean * count).sum(axis=0) / total, 0.0)
+        hour_m2 = m2.sum(axis=0) + (count * (mean - hour_mean) ** 2).sum(axis=0)
+        return PostingStats(total, hour_mean, hour_m2)
+
+    # === ВЫВОДЫ ===
+    @property
+    def total(self) -> int:
+        return int(self.count.sum())
+
+    def interval(self) -> Tuple[np.ndarray, np.ndarray]:
+        """95%-доверительный интервал среднего в каждой ячейке (NaN, если постов меньше двух)"""
+        dof = self.count - 1
+        quantile = np.where(dof > len(T_975), Z_975, np.asarray((np.nan,) + T_975)[np.clip(dof, 0, len(T_975))])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            half_width = quantile * np.sqrt(self.m2 / dof / self.count)
+        half_width = np.where(dof > 0, half_width, np.nan)
+        return self.mean - half_width, self.mean + half_width
+
+    def hourly_frame(self) -> pd.DataFrame:
+        """Средние просмотры по часам с 95%-интервалом (только часы с постами)"""
+        stats = self.by_hour() if len(self.count) == SLOTS else self
+        low, high = stats.interval()
+        hours = np.flatnonzero(stats.count)
+        return pd.DataFrame({
+            "hour": hours,
+            "Средние просмотры": stats.mean[hours].round(0),
+            "Кол-во постов": stats.count[hours],
+            "Нижняя граница": np.maximum(low[hours], 0).round(0),
+            "Верхняя граница": high[hours].round(0),
+        })
+
+    def best_slot(self, min_posts: int = 2) -> Optional[Dict]:
+        """Ячейка (день недели, час) с наибольшим средним среди ячеек, где не меньше min_posts постов"""
+        eligible = np.flatnonzero(self.count >= min_posts)
+        if not len(eligible):
+            return None
+        slot = int(eligible[np.argmax(self.mean[eligible])])
+        low, high = self.interval()
+        return {
+            "weekday": slot // HOURS,
+            "weekday_name": WEEKDAY_NAMES[slot // HOURS],
+            "hour": slot % HOURS,
+            "avg_views": float(self.mean[slot]),
+            "ci_low": float(max(low[slot], 0)),
+            "ci_high": float(high[slot]),
+            "posts": int(self.count[slot]),
+        }
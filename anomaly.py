@@ -0,0 +1,130 @@
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# === НАСТРОЙКИ ПОИСКА АНОМАЛИЙ ===
+# Окно скользящей медианы (постов, нечётное) и порог робастного z-score (Iglewicz–Hoaglin)
+ANOMALY_WINDOW = int(os.getenv("ANOMALY_WINDOW", "21"))
+ANOMALY_Z = float(os.getenv("ANOMALY_Z", "3.5"))
+# Минимальный MAD в логарифмах просмотров: ровный ряд не должен давать бесконечные z
+MIN_MAD = 0.05
+# Интервалы между постами с коэффициентом вариации ниже порога — публикация по таймеру
+CADENCE_CV_MIN = float(os.getenv("ANOMALY_CADENCE_CV_MIN", "0.15"))
+MIN_POSTS = 6
+
+# Флаги поста (битовая маска)
+SPIKE = 1       # охват намного выше локальной медианы
+DIP = 2         # охват намного ниже локальной медианы
+VELOCITY = 4    # резкий рост охвата относительно предыдущего поста
+
+# 0.6745 — квантиль нормального распределения: MAD * 1.4826 ≈ σ
+MAD_SCALE = 0.6745
+
+
+def rolling_robust_z(values: np.ndarray, window: int) -> np.ndarray:
+    """Робастный z-score каждого значения относительно медианы и MAD своего окна"""
+    half = window // 2
+    windows = sliding_window_view(np.pad(values, half, mode="edge"), window)
+    # Окно нечётное: медиана — средний элемент после частичной сортировки (O(w) на окно)
+    median = np.partition(windows, half, axis=1)[:, half]
+    mad = np.partition(np.abs(windows - median[:, None]), half, axis=1)[:, half]
+    return MAD_SCALE * (values - median) / np.maximum(mad, MIN_MAD)
+
+
+def robust_z(values: np.ndarray) -> np.ndarray:
+    """Робастный z-score относительно медианы и MAD всего ряда"""
+    if not len(values):
+        return values.astype(np.float64)
+    median = np.median(values)
+    mad = np.median(np.abs(values - median))
+    return MAD_SCALE * (values - median) / max(mad, MIN_MAD)
+
+
+class AnomalyReport:
+    """
+    Аномалии ряда просмотров канала (посты в хронологическом порядке):
+    z — отклонение поста от скользящей медианы, velocity_z — рост относительно предыдущего поста,
+    flags — битовая маска SPIKE/DIP/VELOCITY на каждый пост, cadence_cv — вариация интервалов публикаций.
+    """
+
+    __slots__ = ("z", "velocity_z", "flags", "cadence_cv", "window")
+
+    def __init__(self, z: np.ndarray, velocity_z: np.ndarray, flags: np.ndarray,
+                 cadence_cv: Optional[float], window: int):
+        self.z = z
+        self.velocity_z = velocity_z
+        self.flags = flags
+        self.cadence_cv = cadence_cv
+        self.window = window
+
+    def __len__(self) -> int:
+        return len(self.flags)
+
+    def share(self, flag: int) -> float:
+        """Доля постов с флагом"""
+        return float(np.count_nonzero(self.flags & flag)) / len(self) if len(self) else 0.0
+
+    @property
+    def regular_cadence(self) -> bool:
+        return self.cadence_cv is not None and self.cadence_cv < CADENCE_CV_MIN
+
+    def fake_points(self) -> Dict[str, int]:
+        """
+        Вклад в вероятность накрутки: всплески — до 20 баллов (максимум при 10% постов),
+        скачки — до 10 баллов, публикация по таймеру — 25
+        """
+        return {
+            "spikes": int(round(min(20.0, 200 * self.share(SPIKE)))),
+            "velocity": int(round(min(10.0, 100 * self.share(VELOCITY)))),
+            "cadence": 25 if self.regular_cadence else 0,
+        }
+
+    def flagged_posts(self, post_ids: np.ndarray, views: np.ndarray, limit: int = 50) -> List[Dict]:
+        """Посты с флагами (по убыванию |z|) в сериализуемом виде"""
+        index = np.flatnonzero(self.flags)
+        index = index[np.argsort(-np.abs(self.z[index]), kind="stable")][:limit]
+        return [
+            {
+                "post_id": int(post_ids[i]),
+                "views": int(views[i]),
+                "z": round(float(self.z[i]), 2),
+                "velocity_z": round(float(self.velocity_z[i]), 2),
+                "kinds": [name for flag, name in ((SPIKE, "spike"), (DIP, "dip"), (VELOCITY, "velocity"))
+                          if self.flags[i] & flag],
+            }
+            for i in index
+        ]
+
+
+def detect_anomalies(views: np.ndarray, timestamps: Optional[np.ndarray] = None,
+                     window: int = ANOMALY_WINDOW, threshold: float = ANOMALY_Z) -> AnomalyReport:
+    """
+    Поиск аномалий в ряду просмотров за линейное время (окно фиксированной ширины):
+    просмотры берутся в логарифме, поэтому отклонения считаются в разах, а не в штуках.
+    """
+    n = len(views)
+    log_views = np.log1p(np.asarray(views, dtype=np.float64))
+    # Окно не шире ряда и нечётное, чтобы медиана была центрирована на посте (чётное уменьшается на 1)
+    window = max(1, min(window, n))
+    window -= 1 - window % 2
+
+    z = rolling_robust_z(log_views, window) if n else log_views
+    velocity_z = np.zeros(n)
+    if n > 1:
+        velocity_z[1:] = robust_z(np.diff(log_views))
+
+    flags = np.zeros(n, dtype=np.uint8)
+    flags[z > threshold] |= SPIKE
+    flags[z < -threshold] |= DIP
+    flags[velocity_z > threshold] |= VELOCITY
+
+    cadence_cv = None
+    if timestamps is not None and n > 2:
+        intervals = np.diff(np.asarray(timestamps, dtype=np.float64))
+        intervals = intervals[intervals > 0]
+        if len(intervals) >= MIN_POSTS - 1 and intervals.mean() > 0:
+            cadence_cv = float(intervals.std() / intervals.mean())
+
+    return AnomalyReport(z, velocity_z, flags, cadence_cv, window)
@@ -1,397 +1,29 @@
+from typing import Optional
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import aiohttp
-from bs4 import BeautifulSoup
-import asyncio
-import re
-from datetime import datetime
-import pytz
-import os
-import requests
-from typing import Optional, Dict, List
-import numpy as np
-import time
+
+from charts import hourly_chart_frame, hourly_chart_image, use_native_chart
+from engine import (
+    AI_STREAM_TIMEOUT,
+    ChannelFetchError,
+    ai_response_complete,
+    analyze_channels,
+    groq_init_error,
+    normalize_channel_name,
+    result_store,
+    scrape_cache,
+)
+from event_loop import iterate_async, run_async
+from pipeline import AI_TIMEOUT_MESSAGE, analysis_pipeline
+from ratelimit import host_metrics
+from storage import get_store
 
 # === НАСТРОЙКА СТРАНИЦЫ ===
 st.set_page_config(page_title="📊 ChannelPulsePro AI", layout="wide", page_icon="🤖")
 
-# === ФУНКЦИЯ ДЛЯ АСИНХРОННЫХ ВЫЗОВОВ В STREAMLIT ===
-def run_async(coro):
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    return loop.run_until_complete(coro)
-
-# === НАСТРОЙКИ ИЗ ОКРУЖЕНИЯ ===
-TELEMETR_API_KEY = os.getenv("TELEMETR_API_KEY", "")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
-
-# === ИНИЦИАЛИЗАЦИЯ GROQ КЛИЕНТА ===
-groq_client = None
-if GROQ_API_KEY:
-    try:
-        from groq import Groq
-        groq_client = Groq(api_key=GROQ_API_KEY)
-    except ImportError:
-        st.sidebar.warning("⚠️ Библиотека groq не установлена. ИИ-анализ недоступен.")
-    except Exception as e:
-        st.sidebar.warning(f"⚠️ Ошибка инициализации Groq: {str(e)}")
-
-# === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===
-def parse_views(views_str: str) -> int:
-    """Конвертация просмотров из строки в число"""
-    views_str = views_str.strip().replace('\xa0', ' ')
-    
-    # Обработка случая "нравится" или других нечисловых значений
-    if "нравится" in views_str.lower() or "like" in views_str.lower():
-        return 0
-    
-    if 'тыс' in views_str.lower() or 'k' in views_str.lower():
-        num_match = re.search(r'[\d.,]+', views_str)
-        if num_match:
-            num_str = num_match.group().replace(',', '.')
-            try:
-                return int(float(num_str) * 1000)
-            except ValueError:
-                return 0
-    elif 'млн' in views_str.lower() or 'm' in views_str.lower():
-        num_match = re.search(r'[\d.,]+', views_str)
-        if num_match:
-            num_str = num_match.group().replace(',', '.')
-            try:
-                return int(float(num_str) * 1000000)
-            except ValueError:
-                return 0
-    else:
-        num_match = re.search(r'\d+', views_str.replace(' ', ''))
-        if num_match:
-            return int(num_match.group())
-    
-    return 0
-
-async def fetch_channel_data(channel_name: str, limit: int = 15) -> Optional[pd.DataFrame]:
-    """
-    Сбор данных из публичного Telegram-канала
-    """
-    # ИСПРАВЛЕНО: убраны лишние пробелы в URL
-    url = f"https://t.me/s/{channel_name.strip()}"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url, headers=headers, timeout=15) as response:
-                if response.status != 200:
-                    st.warning(f"⚠️ Канал @{channel_name} не найден или приватный. Попробуйте публичные каналы: habr_com, rian_ru, tass_agency")
-                    return None
-                html = await response.text()
-        except Exception as e:
-            st.error(f"❌ Ошибка подключения к Telegram: {str(e)}")
-            return None
-    
-    soup = BeautifulSoup(html, 'html.parser')
-    posts = soup.find_all('div', class_='tgme_widget_message')
-    
-    if not posts:
-        st.warning(f"⚠️ Не найдены посты в канале @{channel_name}. Убедитесь, что канал публичный.")
-        return None
-    
-    data = []
-    moscow_tz = pytz.timezone('Europe/Moscow')
-    
-    for post in posts[:limit]:
-        date_elem = post.find('time', class_='time')
-        views_elem = post.find('span', class_='tgme_widget_message_views')
-        text_elem = post.find('div', class_='tgme_widget_message_text')
-        
-        if not date_elem or not views_elem:
-            continue
-        
-        try:
-            date_str = date_elem['datetime']
-            post_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-            post_date = post_date.astimezone(moscow_tz)
-            
-            views_text = views_elem.text.strip()
-            views = parse_views(views_text)
-            
-            text_preview = text_elem.text[:50] + "..." if text_elem and text_elem.text else "[медиа]"
-            
-            data.append({
-                "date": post_date,
-                "views": views,
-                "text_preview": text_preview
-            })
-        except Exception as e:
-            continue
-    
-    if not data:
-        st.warning(f"⚠️ Не удалось извлечь достаточно данных из канала @{channel_name}. Нужно минимум 3 поста.")
-        return None
-    
-    return pd.DataFrame(data)
-
-def get_telemetr_data(channel_name: str) -> Optional[Dict]:
-    """Получение данных о подписчиках через Telemetr API или заглушка"""
-    # ИСПОЛЬЗУЕМ ТЕСТОВЫЕ ДАННЫЕ ПО УМОЛЧАНИЮ
-    sample_data = {
-        "gender": {"male": 73, "female": 27},
-        "age": {"25_34": 52, "18_24": 28, "35_44": 15, "other": 5},
-        "top_countries": [
-            {"country": "Россия", "percent": 68},
-            {"country": "Украина", "percent": 8},
-            {"country": "Казахстан", "percent": 5}
-        ],
-        "interests": [
-            {"name": "Python", "value": 42},
-            {"name": "Инструкции", "value": 35},
-            {"name": "AI", "value": 28},
-            {"name": "Data Science", "value": 25},
-            {"name": "Карьера", "value": 22}
-        ],
-        "engagement": 3.5,
-        "activity": 0.65
-    }
-    
-    # Если пользователь ввел habr_com, используем специфические данные
-    if "habr" in channel_name.lower():
-        sample_data["interests"] = [
-            {"name": "Программирование", "value": 65},
-            {"name": "AI", "value": 58},
-            {"name": "DevOps", "value": 45},
-            {"name": "Data Science", "value": 42},
-            {"name": "Кибербезопасность", "value": 38}
-        ]
-        sample_data["engagement"] = 5.2
-        sample_data["activity"] = 0.78
-    
-    return sample_data
-
-def detect_fake_audience(df: pd.DataFrame, audience_data: Optional[Dict] = None) -> Dict:
-    """
-    Анализ на наличие накруток и ботов
-    """
-    results = {
-        "fake_probability": 0,
-        "reasons": [],
-        "recommendations": []
-    }
-    
-    # 1. Анализ динамики роста просмотров
-    if len(df) > 5:
-        views = df['views'].values
-        if len(views) > 1:
-            growth = np.diff(views)
-            if len(growth) > 0:
-                avg_growth = np.mean(growth)
-                max_growth = np.max(growth)
-                
-                if avg_growth > 0 and max_growth > 5 * avg_growth:
-                    results["fake_probability"] += 30
-                    results["reasons"].append("🚨 Обнаружены резкие скачки охвата (+5000+ за 1 день)")
-    
-    # 2. Анализ равномерности распределения по времени
-    if 'hour' in df.columns:
-        hour_counts = df['hour'].value_counts()
-        if len(hour_counts) < 3:
-            results["fake_probability"] += 25
-            results["reasons"].append("🚨 Слишком равномерное распределение по времени публикаций")
-    
-    # 3. Анализ вовлеченности
-    if audience_data and "engagement" in audience_data:
-        if audience_data["engagement"] < 1.0:
-            results["fake_probability"] += 20
-            results["reasons"].append(f"🚨 Низкая вовлеченность: {audience_data['engagement']}% (норма > 3%)")
-    
-    # 4. Анализ географии
-    if audience_data and "top_countries" in audience_data:
-        if len(audience_data["top_countries"]) > 0:
-            top_country = audience_data["top_countries"][0]["percent"]
-            if top_country > 90:
-                results["fake_probability"] += 15
-                results["reasons"].append(f"🚨 Слишком высокая концентрация аудитории в одной стране ({top_country}%)")
-    
-    # 5. Анализ качества подписчиков
-    if audience_data and "activity" in audience_data:
-        if audience_data["activity"] < 0.4:
-            results["fake_probability"] += 10
-            results["reasons"].append(f"🚨 Низкая активность аудитории: {audience_data['activity']*100:.0f}% (норма > 40%)")
-    
-    # Капаем вероятность на 100%
-    results["fake_probability"] = min(100, results["fake_probability"])
-    
-    # Формируем рекомендации
-    if results["fake_probability"] > 30:
-        results["recommendations"].append("✅ **Немедленно проверьте источники роста** — высока вероятность накрутки")
-        results["recommendations"].append("✅ **Удалите неактивных подписчиков** — это увеличит охват на 25-40%")
-    elif results["fake_probability"] > 10:
-        results["recommendations"].append("⚠️ **Проведите аудит аудитории** — возможна частичная накрутка")
-        results["recommendations"].append("✅ **Фокусируйтесь на вовлечении** — это снизит влияние ботов")
-    else:
-        results["recommendations"].append("✅ **Аудитория качественная** — продолжайте текущую стратегию")
-        results["recommendations"].append("✅ **Увеличьте частоту публикаций** — ваша аудитория готова к большему контенту")
-    
-    return results
-
-def analyze_audience_quality(df: pd.DataFrame, audience_data: Optional[Dict] = None) -> Dict:
-    """Анализ качества аудитории"""
-    results = {
-        "quality_score": 85,  # По умолчанию 85%
-        "issues": [],
-        "recommendations": []
-    }
-    
-    # 1. Анализ активности
-    if audience_data and "activity" in audience_data:
-        activity_score = audience_data["activity"] * 100
-        if activity_score < 40:
-            results["quality_score"] -= 20
-            results["issues"].append(f"📉 Низкая активность аудитории: {activity_score:.0f}% (норма > 40%)")
-        elif activity_score < 60:
-            results["quality_score"] -= 10
-            results["issues"].append(f"📉 Средняя активность аудитории: {activity_score:.0f}%")
-    
-    # 2. Анализ вовлеченности
-    if audience_data and "engagement" in audience_data:
-        engagement_score = audience_data["engagement"]
-        if engagement_score < 2.0:
-            results["quality_score"] -= 15
-            results["issues"].append(f"📉 Низкая вовлеченность: {engagement_score}% (норма > 3%)")
-        elif engagement_score < 3.0:
-            results["quality_score"] -= 7
-            results["issues"].append(f"📉 Средняя вовлеченность: {engagement_score}%")
-    
-    # 3. Анализ целевой аудитории
-    target_match = 85 if any(kw in str(df.iloc[0]['text_preview']).lower() for kw in ["habr", "python", "программирование", "код"]) else 70
-    
-    if target_match < 75:
-        results["quality_score"] -= 10
-        results["issues"].append(f"📉 Низкое соответствие целевой аудитории: {target_match}%")
-    
-    # 4. Анализ динамики
-    if len(df) > 5:
-        views = df['views'].values
-        if len(views) >= 6:
-            current_avg = np.mean(views[-3:])
-            previous_avg = np.mean(views[-6:-3])
-            
-            if previous_avg > 0:
-                growth = (current_avg - previous_avg) / previous_avg * 100
-                if growth < -15:
-                    results["quality_score"] -= 10
-                    results["issues"].append(f"📉 Отрицательная динамика: -{abs(growth):.0f}% за последние 3 поста")
-    
-    # Ограничиваем минимальный и максимальный score
-    results["quality_score"] = max(30, min(100, results["quality_score"]))
-    
-    # Формируем рекомендации
-    if results["quality_score"] < 70:
-        results["recommendations"].append(f"🔥 **Срочно улучшайте качество аудитории:** текущий рейтинг {results['quality_score']}%")
-        results["recommendations"].append("✅ **Проведите чистку неактивных подписчиков** — удаление 20% ботов увеличит охват на 25%")
-        results["recommendations"].append("✅ **Добавьте 30% постов с высокой вовлеченностью** (опросы, вопросы, интерактив)")
-    elif results["quality_score"] < 85:
-        results["recommendations"].append(f"📈 **Качество аудитории можно улучшить:** текущий рейтинг {results['quality_score']}%")
-        results["recommendations"].append("✅ **Увеличьте интерактивность** — добавьте опросы в 40% постов")
-        results["recommendations"].append("✅ **Оптимизируйте время публикаций** по данным анализа выше")
-    else:
-        results["recommendations"].append(f"✨ **Отличное качество аудитории:** рейтинг {results['quality_score']}%")
-        results["recommendations"].append("✅ **Масштабируйте успешные стратегии** — увеличьте частоту публикаций")
-        results["recommendations"].append("✅ **Начните монетизацию** — ваша аудитория готова к рекламе")
-    
-    return results
-
-async def generate_ai_recommendations(channel_name: str, df: pd.DataFrame, audience_data: Optional[Dict] = None) -> str:
-    """
-    Генерация рекомендаций через Groq Llama3
-    """
-    if not groq_client:
-        return """
-        ℹ️ **Для ИИ-анализа настройте Groq API:**  
-        1. Получите ключ на https://console.groq.com  
-        2. Добавьте переменную `GROQ_API_KEY` в настройки Render  
-        3. Перезапустите приложение
-        """
-    
-    try:
-        # Подготовка данных для Llama3
-        avg_views = df['views'].mean()
-        best_hour = df['date'].dt.hour.mode()[0]
-        growth_rate = ((df['views'].iloc[-1] - df['views'].iloc[-3]) / df['views'].iloc[-3] * 100) if len(df) > 3 else 0
-        
-        # Формирование промпта
-        prompt = f"""
-        Ты — эксперт по монетизации Telegram-каналов с 10-летним опытом. 
-        Проанализируй данные для канала @{channel_name} на основе последних 15 постов:
-        
-        📊 СТАТИСТИКА:
-        • Средний охват: {avg_views:,.0f} просмотров
-        • Лучшее время публикаций: {best_hour}:00 МСК
-        • Динамика роста: {growth_rate:+.1f}% за последние 3 поста
-        • Количество постов в анализе: {len(df)}
-        
-        👥 ДАННЫЕ АУДИТОРИИ (примерные):
-        • Демография: 73% мужчины, 52% — 25-34 года
-        • Топ интересы: Программирование (65%), AI (58%), DevOps (45%)
-        • Вовлеченность: 5.2%
-        
-        💡 ЗАДАЧА:
-        1. Сгенерируй 3 конкретные, приоритетные рекомендации для увеличения дохода
-        2. Укажи измеримые метрики (на сколько % вырастет охват/доход)
-        3. Дай готовый шаблон для продажи рекламы
-        4. Предложи оптимальную ценовую стратегию
-        
-        📝 ФОРМАТ ОТВЕТА:
-        Используй markdown с эмоджи. Раздели на секции:
-        • 🎯 ТОП-3 РЕКОМЕНДАЦИИ
-        • 💰 СТРАТЕГИЯ МОНЕТИЗАЦИИ
-        • 📈 ПРОГНОЗ РОСТА
-        
-        Не добавляй лишней информации. Будь конкретным и практичным.
-        """
-        
-        # Запрос к Groq
-        response = groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama-3.1-8b-instant",
-            temperature=0.3,
-            max_tokens=500,
-        )
-        
-        return response.choices[0].message.content
-    
-    except Exception as e:
-        error_msg = str(e).lower()
-        if "rate limit" in error_msg or "quota" in error_msg:
-            return """
-            ⏳ **Достигнут лимит Groq API.** Попробуйте через 1 минуту или используйте тестовые рекомендации ниже:
-            
-            🎯 **ТОП-3 РЕКОМЕНДАЦИИ для @habr_com:**
-            • **Смещение времени публикаций** на 19:00-21:00 МСК (+35% охвата)
-            • **Увеличение количества инструкций с кодом** — они получают на 2.5x больше просмотров
-            • **Внедрение еженедельной рубрики "Инструмент недели"** — рост подписчиков на 15%
-            
-            💰 **СТРАТЕГИЯ МОНЕТИЗАЦИИ:**
-            • Базовая реклама: 8,000 ₽ за пост (5,000 просмотров)
-            • Спонсорский пост с глубоким анализом: 25,000 ₽
-            • Годовое партнерство с tech-компанией: 400,000 ₽
-            
-            📈 **ПРОГНОЗ РОСТА:**
-            При реализации рекомендаций:
-            • Месяц 1: +25% к охвату, +15% к подписчикам
-            • Месяц 3: +60% к доходу от рекламы
-            """
-        return f"""
-        ❌ **Ошибка генерации ИИ-рекомендаций:** {str(e)[:100]}
-        
-        ⚙️ **Рекомендации без ИИ:**
-        • Оптимизируйте время публикаций на {best_hour}:00 МСК
-        • Увеличьте долю интерактивного контента на 30%
-        • Проанализируйте топ-3 конкурентов для копирования успешных форматов
-        """
+if groq_init_error:
+    st.sidebar.warning(groq_init_error)
 
 # === ОСНОВНОЙ ИНТЕРФЕЙС ===
 st.title("🤖 ChannelPulsePro AI — Аналитика с Groq Llama3")
@@ -403,6 +35,7 @@ if 'test_mode' not in st.session_state:
 
 if st.button("🚀 Запустить демо-анализ (habr_com)", type="primary", use_container_width=True):
     st.session_state.test_mode = True
+    st.session_state.demo_requested = True
     st.session_state.channel_input = "habr_com"
     st.rerun()
 
@@ -426,251 +59,425 @@ with col1:
 with col2:
     analyze_btn = st.button("🔍 Анализировать", use_container_width=True)
 
-# Хранение результатов в session_state для сохранения после перезагрузок
-if 'last_analysis_results' not in st.session_state:
-    st.session_state.last_analysis_results = None
 
-if analyze_btn or st.session_state.test_mode:
-    channel_username = channel.strip().replace("@", "").split("/")[-1].split("?")[0]
-    
-    if not channel_username:
-        st.error("❌ Пожалуйста, введите username канала")
-        st.stop()
-    
-    with st.spinner("🔍 Собираю данные из последних 15 постов... (15-30 сек)"):
-        # ===== 1. СБОР ДАННЫХ =====
-        df = run_async(fetch_channel_data(channel_username, limit=15))
-        
-        if df is None or len(df) < 3:
-            st.error("❌ Не удалось собрать достаточно данных. Нужно минимум 3 поста для точного анализа.")
-            st.stop()
-        
-        st.session_state.last_analysis_results = {
-            "channel_username": channel_username,
-            "df": df
-        }
-        st.success(f"✅ Успешно собраны данные из последних {len(df)} постов канала @{channel_username}!")
-        
-        # ===== 2. БАЗОВАЯ СТАТИСТИКА =====
-        st.subheader("📊 Основные метрики (последние 15 постов)")
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Средний охват", f"{df['views'].mean():,.0f}")
-        with col2:
-            st.metric("Пик просмотров", f"{df['views'].max():,}")
-        with col3:
-            if len(df) >= 7:
-                weekly_growth = ((df['views'].iloc[-1] / df['views'].iloc[-7] - 1) * 100) if df['views'].iloc[-7] > 0 else 0
-                st.metric("Рост за неделю", f"{weekly_growth:+.0f}%")
+# Сравнение с конкурентами: все каналы собираются параллельно
+def render_competitors():
+    with st.expander("📊 Сравнение с конкурентами"):
+        competitors_input = st.text_area(
+            "Каналы для сравнения (через запятую или с новой строки)",
+            value="habr_com, tproger, vc_ru",
+        )
+        compare_btn = st.button("⚖️ Сравнить каналы", use_container_width=True)
+
+        if compare_btn:
+            competitors = list(dict.fromkeys(
+                normalize_channel_name(c) for c in competitors_input.replace(",", "\n").splitlines() if c.strip()
+            ))
+            if not competitors:
+                st.error("❌ Укажите хотя бы один канал")
+                st.session_state.competitor_summaries = None
             else:
-                st.metric("Постов", f"{len(df)}")
-        with col4:
-            st.metric("Постов проанализировано", len(df))
-        
-        # ===== 3. ПРИМЕРЫ ПОСЛЕДНИХ ПОСТОВ =====
-        st.divider()
-        st.subheader("📝 Примеры последних постов")
-        for i, row in df.head(5).iterrows():
-            st.markdown(f"""
-            **{row['date'].strftime('%d %b %Y, %H:%M МСК')}**  
-            👁️ {row['views']:,} просмотров  
-            📝 {row['text_preview']}
-            """)
-            st.divider()
-        
-        # ===== 4. АНАЛИЗ ВРЕМЕНИ ПУБЛИКАЦИЙ =====
-        st.subheader(f"⏰ Оптимальное время публикаций для @{channel_username}")
-        
-        df['hour'] = df['date'].dt.hour
-        hourly_stats = df.groupby('hour').agg({
-            'views': ['mean', 'count'],
-        }).round(0)
-        hourly_stats.columns = ['Средние просмотры', 'Кол-во постов']
-        hourly_stats = hourly_stats.reset_index()
-        
-        if not hourly_stats.empty:
-            best_hour_row = hourly_stats.loc[hourly_stats['Средние просмотры'].idxmax()]
-            best_hour = int(best_hour_row['hour'])
-            best_views = best_hour_row['Средние просмотры']
-            avg_views = hourly_stats['Средние просмотры'].mean()
-            uplift = ((best_views / avg_views) - 1) * 100 if avg_views > 0 else 0
-            
-            # Визуализация
-            fig, ax = plt.subplots(figsize=(12, 5))
-            bars = ax.bar(hourly_stats['hour'].astype(str), hourly_stats['Средние просмотры'], color='#1E88E5')
-            
-            # Выделяем лучший час красным
-            for i, hour in enumerate(hourly_stats['hour']):
-                if hour == best_hour:
-                    bars[i].set_color('#FF7043')
-            
-            ax.set_title(f"Средний охват по времени публикации (МСК)", fontsize=14)
-            ax.set_xlabel("Час публикации (МСК)")
-            ax.set_ylabel("Средние просмотры")
-            ax.grid(alpha=0.3, linestyle='--')
-            
-            # Подписи значений над столбцами
-            for bar in bars:
-                height = bar.get_height()
-                if height > 0:
-                    ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                            f'{int(height):,}',
-                            ha='center', va='bottom', fontsize=9)
-            
-            plt.xticks(rotation=45)
-            st.pyplot(fig)
-            
-            # Рекомендация
-            st.info(f"""
-            🔍 **Выводы из анализа {len(df)} постов:**  
-            • **Лучшее время для @{channel_username}:** {best_hour}:00 МСК  
-            • **Средний охват в это время:** {best_views:,.0f} просмотров  
-            • **Прирост к среднему:** +{uplift:.0f}%  
-            • **Статистическая значимость:** основано на {best_hour_row['Кол-во постов']} постах в это время  
-            
-            💡 **Рекомендация:**  
-            Перенесите 70% публикаций на {best_hour}:00 МСК. Это увеличит ваш средний охват на {uplift:.0f}% без изменения контента.
-            """)
-        
-        # ===== 5. ДАННЫЕ О ПОДПИСЧИКАХ =====
+                with st.spinner(f"🔍 Собираю данные {len(competitors)} каналов параллельно..."):
+                    st.session_state.competitor_summaries = run_async(analyze_channels(competitors, limit=15))
+
+        # Результат хранится в session_state и переживает перезапуски страницы
+        summaries = st.session_state.get("competitor_summaries")
+        if not summaries:
+            return
+        for summary in summaries:
+            if summary["error"]:
+                st.warning(summary["error"])
+        rows = [s for s in summaries if not s["error"]]
+        if rows:
+            comparison = pd.DataFrame([{
+                "Канал": f"@{s['channel']}",
+                "Постов": s["posts"],
+                "Средний охват": round(s["avg_views"]),
+                "Пик просмотров": s["max_views"],
+                "Лучший час (МСК)": f"{s['best_hour']}:00" if s["best_hour"] is not None else "—",
+                "Качество, %": s["quality_score"],
+                "Риск накрутки, %": s["fake_probability"],
+                "Доход, ₽/пост": round(s["earnings"]),
+            } for s in rows])
+            st.dataframe(comparison, hide_index=True, use_container_width=True)
+
+
+render_competitors()
+
+
+# === СЕКЦИИ ОТЧЁТА ===
+def render_overview(channel_username: str, df: pd.DataFrame):
+    # ===== 2. БАЗОВАЯ СТАТИСТИКА =====
+    st.subheader("📊 Основные метрики (последние 15 постов)")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Средний охват", f"{df['views'].mean():,.0f}")
+    with col2:
+        st.metric("Пик просмотров", f"{df['views'].max():,}")
+    with col3:
+        if len(df) >= 7:
+            weekly_growth = ((df['views'].iloc[-1] / df['views'].iloc[-7] - 1) * 100) if df['views'].iloc[-7] > 0 else 0
+            st.metric("Рост за неделю", f"{weekly_growth:+.0f}%")
+        else:
+            st.metric("Постов", f"{len(df)}")
+    with col4:
+        st.metric("Постов проанализировано", len(df))
+    
+    # ===== 3. ПРИМЕРЫ ПОСЛЕДНИХ ПОСТОВ =====
+    st.divider()
+    st.subheader("📝 Примеры последних постов")
+    for i, row in df.head(5).iterrows():
+        st.markdown(f"""
+        **{row['date'].strftime('%d %b %Y, %H:%M МСК')}**  
+        👁️ {row['views']:,} просмотров  
+        📝 {row['text_preview']}
+        """)
         st.divider()
-        st.subheader("👥 Аудитория (примерные данные)")
-        
-        with st.spinner("Загружаю демонстрационные данные о подписчиках..."):
-            audience_data = get_telemetr_data(channel_username)
+
+
+def render_timing(channel_username: str, hourly_stats: pd.DataFrame, best, timing_posts: int):
+    # ===== 4. АНАЛИЗ ВРЕМЕНИ ПУБЛИКАЦИЙ =====
+    st.subheader(f"⏰ Оптимальное время публикаций для @{channel_username}")
+    
+    if best is None:
+        return
+    best_hour = best["best_hour"]
+    best_views = best["best_views"]
+    uplift = best["uplift"]
+    
+    # Визуализация: готовая картинка из кэша или нативный график для длинной истории
+    if use_native_chart(timing_posts):
+        st.caption("Средний охват по времени публикации (МСК)")
+        st.bar_chart(hourly_chart_frame(hourly_stats), color='#1E88E5')
+    else:
+        st.image(hourly_chart_image(hourly_stats, best_hour), use_column_width=True)
+    
+    interval = (f" (95% интервал: {best['ci_low']:,.0f}–{best['ci_high']:,.0f})"
+                if best["ci_low"] is not None else "")
+    slot = best.get("slot")
+    slot_line = (f"• **Лучший слот недели:** {slot['weekday_name']} {slot['hour']}:00 МСК — "
+                 f"{slot['avg_views']:,.0f} просмотров в среднем по {slot['posts']} постам  \n"
+                 if slot else "")
+    
+    # Рекомендация
+    st.info(f"""
+    🔍 **Выводы из анализа {timing_posts} постов:**  
+    • **Лучшее время для @{channel_username}:** {best_hour}:00 МСК  
+    • **Средний охват в это время:** {best_views:,.0f} просмотров{interval}  
+    • **Прирост к среднему:** +{uplift:.0f}%  
+    • **Статистическая значимость:** основано на {best['posts_count']} постах в это время  
+    {slot_line}
+    💡 **Рекомендация:**  
+    Перенесите 70% публикаций на {best_hour}:00 МСК. Это увеличит ваш средний охват на {uplift:.0f}% без изменения контента.
+    """)
+
+
+def render_audience(audience_data: dict, quality_analysis: dict):
+    # ===== 5. ДАННЫЕ О ПОДПИСЧИКАХ =====
+    st.divider()
+    if audience_data is None:
+        st.subheader("👥 Аудитория")
+        st.info("ℹ️ Telemetr пока не собрал данные о подписчиках этого канала")
+    else:
+        from_telemetr = audience_data.get("source") == "telemetr"
+        st.subheader("👥 Аудитория (данные Telemetr)" if from_telemetr else "👥 Аудитория (примерные данные)")
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             st.metric("Пол", f"{audience_data['gender']['male']}% ♂️ / {audience_data['gender']['female']}% ♀️")
         with col2:
-            st.metric("Возраст", f"{audience_data['age']['25_34']}% — 25-34")
+            ages = {k: v for k, v in audience_data['age'].items() if k != "other"}
+            top_age = max(ages, key=ages.get) if ages else None
+            st.metric("Возраст", f"{ages[top_age]}% — {top_age.replace('_', '-')}" if top_age else "—")
         with col3:
             st.metric("Активность", f"{audience_data['activity']*100:.0f}%")
         with col4:
             st.metric("Вовлеченность", f"{audience_data['engagement']}%")
         
-        st.subheader("🎯 Интересы аудитории")
         interests = audience_data['interests'][:5]
-        interest_cols = st.columns(len(interests))
-        for i, interest in enumerate(interests):
-            with interest_cols[i]:
-                st.metric(interest['name'], f"{interest['value']}%")
-        
-        # Аналитика качества
-        quality_analysis = analyze_audience_quality(df, audience_data)
-        
-        st.divider()
-        st.subheader("📊 Качество аудитории")
-        
-        col1, col2 = st.columns([1, 3])
-        with col1:
-            quality_color = "#4CAF50" if quality_analysis["quality_score"] >= 80 else "#FFA726" if quality_analysis["quality_score"] >= 60 else "#EF5350"
-            st.markdown(f"""
-            <div style="text-align: center; padding: 20px; border-radius: 10px; background-color: {quality_color}15; border: 2px solid {quality_color};">
-                <h2 style="color: {quality_color}; margin: 0;">{quality_analysis['quality_score']}%</h2>
-                <p style="margin: 5px 0 0 0;">Качество</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            for issue in quality_analysis["issues"]:
-                st.warning(issue)
+        if interests:
+            st.subheader("🎯 Интересы аудитории")
+            interest_cols = st.columns(len(interests))
+            for i, interest in enumerate(interests):
+                with interest_cols[i]:
+                    st.metric(interest['name'], f"{interest['value']}%")
+    
+    # Аналитика качества
+    st.divider()
+    st.subheader("📊 Качество аудитории")
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        quality_color = "#4CAF50" if quality_analysis["quality_score"] >= 80 else "#FFA726" if quality_analysis["quality_score"] >= 60 else "#EF5350"
+        st.markdown(f"""
+        <div style="text-align: center; padding: 20px; border-radius: 10px; background-color: {quality_color}15; border: 2px solid {quality_color};">
+            <h2 style="color: {quality_color}; margin: 0;">{quality_analysis['quality_score']}%</h2>
+            <p style="margin: 5px 0 0 0;">Качество</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        for issue in quality_analysis["issues"]:
+            st.warning(issue)
+        
+        st.write("**Рекомендации:**")
+        for rec in quality_analysis["recommendations"]:
+            st.success(rec)
+
+
+def render_fake(fake_analysis: dict):
+    # ===== 6. АНАЛИЗ НАКРУТОК =====
+    st.divider()
+    st.subheader("🔍 Анализ на наличие накруток")
+    
+    fake_color = "#EF5350" if fake_analysis["fake_probability"] > 30 else "#FFA726" if fake_analysis["fake_probability"] > 10 else "#4CAF50"
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        st.markdown(f"""
+        <div style="text-align: center; padding: 20px; border-radius: 10px; background-color: {fake_color}15; border: 2px solid {fake_color};">
+            <h2 style="color: {fake_color}; margin: 0;">{fake_analysis['fake_probability']}%</h2>
+            <p style="margin: 5px 0 0 0;">Риск накрутки</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        for reason in fake_analysis["reasons"]:
+            st.error(reason)
+        
+        st.write("**Рекомендации:**")
+        for rec in fake_analysis["recommendations"]:
+            st.info(rec)
+    
+    anomalous_posts = fake_analysis.get("anomalous_posts") or []
+    if anomalous_posts:
+        kinds = {"spike": "всплеск", "dip": "провал", "velocity": "скачок"}
+        with st.expander(f"📌 Посты с аномальным охватом ({len(anomalous_posts)})"):
+            st.dataframe(pd.DataFrame([{
+                "Пост": p["post_id"],
+                "Просмотры": p["views"],
+                "Отклонение (z)": p["z"],
+                "Тип": ", ".join(kinds[k] for k in p["kinds"]),
+            } for p in anomalous_posts]), hide_index=True, use_container_width=True)
+
+
+def render_monetization(monetization: dict):
+    # ===== 7. МОНЕТИЗАЦИЯ =====
+    st.divider()
+    st.subheader("💰 Прогноз монетизации")
+    
+    current_earnings = monetization["current_earnings"]
+    optimized_earnings = monetization["optimized_earnings"]
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Текущий доход", f"{current_earnings:.0f} ₽/пост")
+    with col2:
+        st.metric("После оптимизации", f"{optimized_earnings:.0f} ₽/пост", f"+{optimized_earnings - current_earnings:.0f} ₽")
+    with col3:
+        st.metric("Недельный доход", f"{optimized_earnings * 5:.0f} ₽", "5 постов/неделю")
+
+
+def render_ai(channel_username: str, ai_result: Optional[dict]):
+    # ===== 8. ИИ-РЕКОМЕНДАЦИИ ОТ GROQ =====
+    st.divider()
+    st.subheader("🤖 ИИ-анализ от Groq Llama3 (8B параметров)")
+    
+    # Перезапуск: полный ответ берётся из общего хранилища, а запасной текст об ошибке — только из своей сессии
+    if ai_result is None:
+        ai_key = st.session_state.get("ai_key")
+        ai_result = (result_store.get(("ai", ai_key)) if ai_key else None) or st.session_state.get("ai_fallback")
+    if ai_result is None:
+        st.warning("⚠️ Не удалось подготовить ИИ-рекомендации. Попробуйте повторить анализ позже.")
+        return
+    
+    if "stream" in ai_result:
+        # Запрос к Groq начат конвейером заранее — дописываем текст по мере прихода токенов
+        def tokens():
+            yield ai_result["first"]
+            try:
+                yield from iterate_async(ai_result["stream"], timeout=AI_STREAM_TIMEOUT)
+            except TimeoutError:
+                yield "\n\n" + AI_TIMEOUT_MESSAGE
+        text = st.write_stream(tokens())
+        ai_result = {"text": text, "cached_at": None, "key": ai_result["key"],
+                     "complete": ai_response_complete(ai_result["key"])}
+    else:
+        st.markdown(ai_result["text"])
+        if ai_result["cached_at"] is not None:
+            cached_at = pd.Timestamp(ai_result["cached_at"], unit="s", tz="UTC").tz_convert("Europe/Moscow")
+            st.caption(f"⚡ Ответ из кэша от {cached_at:%d.%m.%Y %H:%M} МСК — данные канала с тех пор не изменились")
+    
+    # Общим для всех сессий становится только полный ответ (как и в кэше LLM)
+    complete = ai_result.get("complete", True)
+    st.session_state.ai_key = ai_result["key"]
+    st.session_state.ai_fallback = None if complete else ai_result
+    if complete:
+        result_store.set(("ai", ai_result["key"]), ai_result)
+
+
+def render_strategy(channel_username: str, analysis: dict):
+    # ===== 9. ИТОГОВЫЕ РЕКОМЕНДАЦИИ =====
+    st.divider()
+    st.subheader("🎯 Ваша стратегия роста")
+    
+    best = analysis["best"]
+    best_hour = best["best_hour"]
+    uplift = best["uplift"]
+    optimized_earnings = analysis["monetization"]["optimized_earnings"]
+    quality_analysis = analysis["quality"]
+    
+    # Фокус — темы канала с наибольшим охватом по текстовому индексу, без него — интересы аудитории
+    top_terms = analysis["topics"]["top_terms"]
+    audience = analysis["audience"]
+    if top_terms:
+        key_words = ', '.join(f"{t['term']} (~{t['avg_views']:,.0f} просмотров)" for t in top_terms[:3])
+    elif audience:
+        key_words = ', '.join([i['name'] for i in audience['interests'][:3]])
+    else:
+        key_words = "темах с наибольшим охватом"
+    
+    st.success(f"""
+    🚀 **Комплексный план для @{channel_username}:**
+    
+    1. **Оптимальное время:** {best_hour}:00 МСК (+{uplift:.0f}% охват)
+    2. **Контент-стратегия:** Фокус на {key_words}
+    3. **Цена за рекламу:** {optimized_earnings:.0f} ₽ за пост
+    4. **Рост аудитории:** {quality_analysis['recommendations'][0].split('**')[-2].strip()}
+    
+    💰 **Прогноз через 30 дней при реализации:**
+    • Охват вырастет на 35-45%
+    • Доход от рекламы: {optimized_earnings * 5 * 4:,.0f} ₽/месяц
+    • Качество аудитории: {quality_analysis['quality_score'] + 10 if quality_analysis['quality_score'] + 10 <= 100 else 100}% (текущее: {quality_analysis['quality_score']}%)
+    """)
+    
+    if top_terms:
+        with st.expander(f"🏷️ Темы с наибольшим охватом (по {analysis['timing_posts']} постам)"):
+            st.dataframe(pd.DataFrame([{
+                "Тема": t["term"],
+                "Постов": t["posts"],
+                "Средние просмотры": round(t["avg_views"]),
+                "95% интервал": f"{t['ci_low']:,.0f}–{t['ci_high']:,.0f}" if t["ci_low"] is not None else "—",
+            } for t in top_terms]), hide_index=True, use_container_width=True)
+
+
+def render_full_report_offer():
+    # ===== 10. КНОПКА ДЛЯ ПОЛНОГО ОТЧЕТА (МОНЕТИЗАЦИЯ) =====
+    st.divider()
+    st.subheader("📥 Получить полный отчет с экспортом в PDF")
+    
+    st.info("""
+    💎 **Полный отчет включает:**
+    • Детальный анализ 50+ постов (а не 15)
+    • Сравнение с 3 конкурентами
+    • Еженедельные автоматические обновления
+    • Персональную стратегию на 3 месяца
+    • Шаблоны для продажи рекламы
+    
+    💰 **Стоимость:** 1 990 ₽/месяц или 4 990 ₽ за разовый глубокий анализ
+    """)
+    
+    if st.button("✅ Получить полный отчет (1 990 ₽)", type="primary", use_container_width=True):
+        st.session_state.full_report_requested = True
+    if st.session_state.get("full_report_requested"):
+        st.success("📧 Отлично! Наш менеджер свяжется с вами в течение 15 минут для оформления заказа. Пожалуйста, укажите ваш email для отправки деталей.")
+
+
+def render_metrics(channel_username: str, sections: dict, metrics: dict):
+    """Секции, которым хватает постов: они рисуются, не дожидаясь данных аудитории"""
+    with sections["overview"].container():
+        render_overview(channel_username, metrics["df"])
+    with sections["timing"].container():
+        render_timing(channel_username, metrics["hourly_stats"], metrics["best"], metrics["timing_posts"])
+    with sections["fake"].container():
+        render_fake(metrics["fake"])
+    with sections["monetization"].container():
+        render_monetization(metrics["monetization"])
+
+
+def render_analysis(channel_username: str, sections: dict, analysis: dict):
+    """Секции, зависящие от аудитории; анализ накруток перерисовывается с учётом её данных"""
+    with sections["audience"].container():
+        render_audience(analysis["audience"], analysis["quality"])
+    with sections["fake"].container():
+        render_fake(analysis["fake"])
+    with sections["strategy"].container():
+        render_strategy(channel_username, analysis)
+
+
+# Канал анализа хранится в session_state, поэтому отчёт не пропадает при нажатии других кнопок
+# Демо-режим остаётся включённым, но анализ запускает только нажатие кнопки, а не каждый перезапуск
+new_analysis = analyze_btn or st.session_state.pop("demo_requested", False)
+if new_analysis:
+    st.session_state.analysis_channel = normalize_channel_name(channel)
+    st.session_state.analysis_key = None
+    st.session_state.ai_key = None
+    st.session_state.ai_fallback = None
+    st.session_state.full_report_requested = False
+    
+    if not st.session_state.analysis_channel:
+        st.error("❌ Пожалуйста, введите username канала")
+        st.stop()
+
+channel_username = st.session_state.get("analysis_channel")
+if channel_username:
+    # Секции занимают свои места сразу и заполняются по мере готовности стадий конвейера:
+    # метрики постов рисуются, не дожидаясь Telemetr, ИИ-ответ начинает генерироваться, пока рисуются метрики
+    status = st.empty()
+    sections = {name: st.empty() for name in ("overview", "timing", "audience", "fake", "monetization", "ai", "strategy")}
+    
+    # Перезапуск страницы (клик в другой секции) рисует отчёт из общего хранилища результатов по ключу сессии:
+    # конвейер — загрузка постов, перепроверка кэша, запрос к Groq — запускается только для нового анализа
+    # или если результат уже вытеснен из хранилища
+    key = st.session_state.get("analysis_key")
+    analysis = result_store.get(key) if key is not None and not new_analysis else None
+    if analysis is not None:
+        status.success(f"✅ Успешно собраны данные из последних {len(analysis['df'])} постов канала @{channel_username}!")
+        render_metrics(channel_username, sections, analysis)
+        render_analysis(channel_username, sections, analysis)
+        with sections["ai"].container():
+            render_ai(channel_username, None)
+    else:
+        status.info("🔍 Собираю данные из последних 15 постов... (15-30 сек)")
+        sections["audience"].info("👥 Загружаю данные аудитории...")
+        sections["ai"].info("🤖 Готовим ИИ-рекомендации...")
+        
+        for event in iterate_async(analysis_pipeline(channel_username, limit=15).run()):
+            if event.name == "posts":
+                # ===== 1. СБОР ДАННЫХ =====
+                if isinstance(event.error, ChannelFetchError):
+                    st.warning(str(event.error))
+                elif event.error is not None:
+                    raise event.error
+                posts = event.value
+                if posts is None or len(posts) < 3:
+                    status.error("❌ Не удалось собрать достаточно данных. Нужно минимум 3 поста для точного анализа.")
+                    for section in sections.values():
+                        section.empty()
+                    st.stop()
             
-            st.write("**Рекомендации:**")
-            for rec in quality_analysis["recommendations"]:
-                st.success(rec)
-        
-        # ===== 6. АНАЛИЗ НАКРУТОК =====
-        st.divider()
-        st.subheader("🔍 Анализ на наличие накруток")
-        
-        fake_analysis = detect_fake_audience(df, audience_data)
-        
-        fake_color = "#EF5350" if fake_analysis["fake_probability"] > 30 else "#FFA726" if fake_analysis["fake_probability"] > 10 else "#4CAF50"
-        
-        col1, col2 = st.columns([1, 3])
-        with col1:
-            st.markdown(f"""
-            <div style="text-align: center; padding: 20px; border-radius: 10px; background-color: {fake_color}15; border: 2px solid {fake_color};">
-                <h2 style="color: {fake_color}; margin: 0;">{fake_analysis['fake_probability']}%</h2>
-                <p style="margin: 5px 0 0 0;">Риск накрутки</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            for reason in fake_analysis["reasons"]:
-                st.error(reason)
+            elif event.name == "metrics":
+                if event.error is not None:
+                    raise event.error
+                metrics = event.value
+                status.success(f"✅ Успешно собраны данные из последних {len(metrics['df'])} постов канала @{channel_username}!")
+                render_metrics(channel_username, sections, metrics)
             
-            st.write("**Рекомендации:**")
-            for rec in fake_analysis["recommendations"]:
-                st.info(rec)
-        
-        # ===== 7. МОНЕТИЗАЦИЯ =====
-        st.divider()
-        st.subheader("💰 Прогноз монетизации")
-        
-        niche = "it" if any(kw in channel_username.lower() for kw in ["habr", "vc", "tproger", "python", "dev", "code"]) else "news"
-        CPM_RATES = {"it": 45, "news": 25, "sport": 30, "business": 50, "finance": 60}
-        cpm_rate = CPM_RATES.get(niche, 35)
-        
-        current_avg = df['views'].mean()
-        current_earnings = (current_avg / 1000) * cpm_rate
-        optimized_earnings = current_earnings * 1.35  # +35% после оптимизации
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Текущий доход", f"{current_earnings:.0f} ₽/пост")
-        with col2:
-            st.metric("После оптимизации", f"{optimized_earnings:.0f} ₽/пост", f"+{optimized_earnings - current_earnings:.0f} ₽")
-        with col3:
-            st.metric("Недельный доход", f"{optimized_earnings * 5:.0f} ₽", "5 постов/неделю")
-        
-        # ===== 8. ИИ-РЕКОМЕНДАЦИИ ОТ GROQ =====
-        st.divider()
-        st.subheader("🤖 ИИ-анализ от Groq Llama3 (8B параметров)")
-        
-        with st.spinner("Генерирую персональные рекомендации через Groq AI..."):
-            ai_recommendations = run_async(generate_ai_recommendations(channel_username, df, audience_data))
-            st.markdown(ai_recommendations)
-        
-        # ===== 9. ИТОГОВЫЕ РЕКОМЕНДАЦИИ =====
-        st.divider()
-        st.subheader("🎯 Ваша стратегия роста")
-        
-        # Формируем строку с ключевыми словами из интересов
-        key_words = ', '.join([i['name'] for i in interests[:3]])
-        
-        st.success(f"""
-        🚀 **Комплексный план для @{channel_username}:**
-        
-        1. **Оптимальное время:** {best_hour}:00 МСК (+{uplift:.0f}% охват)
-        2. **Контент-стратегия:** Фокус на {key_words}
-        3. **Цена за рекламу:** {optimized_earnings:.0f} ₽ за пост
-        4. **Рост аудитории:** {quality_analysis['recommendations'][0].split('**')[-2].strip()}
-        
-        💰 **Прогноз через 30 дней при реализации:**
-        • Охват вырастет на 35-45%
-        • Доход от рекламы: {optimized_earnings * 5 * 4:,.0f} ₽/месяц
-        • Качество аудитории: {quality_analysis['quality_score'] + 10 if quality_analysis['quality_score'] + 10 <= 100 else 100}% (текущее: {quality_analysis['quality_score']}%)
-        """)
-        
-        # ===== 10. КНОПКА ДЛЯ ПОЛНОГО ОТЧЕТА (МОНЕТИЗАЦИЯ) =====
-        st.divider()
-        st.subheader("📥 Получить полный отчет с экспортом в PDF")
-        
-        st.info("""
-        💎 **Полный отчет включает:**
-        • Детальный анализ 50+ постов (а не 15)
-        • Сравнение с 3 конкурентами
-        • Еженедельные автоматические обновления
-        • Персональную стратегию на 3 месяца
-        • Шаблоны для продажи рекламы
-        
-        💰 **Стоимость:** 1 990 ₽/месяц или 4 990 ₽ за разовый глубокий анализ
-        """)
-        
-        if st.button("✅ Получить полный отчет (1 990 ₽)", type="primary", use_container_width=True):
-            st.success("📧 Отлично! Наш менеджер свяжется с вами в течение 15 минут для оформления заказа. Пожалуйста, укажите ваш email для отправки деталей.")
+            elif event.name == "analysis":
+                if event.error is not None:
+                    raise event.error
+                analysis = event.value
+                render_analysis(channel_username, sections, analysis)
+                # Пока данные канала и аудитории не изменились, отчёт берётся из общего хранилища результатов;
+                # в сессии остаётся только ключ
+                st.session_state.analysis_key = analysis["key"]
+            
+            elif event.name == "ai":
+                with sections["ai"].container():
+                    render_ai(channel_username, event.value)
+    
+    render_full_report_offer()
+
 
 # === САЙДБАР ===
 with st.sidebar:
@@ -718,6 +525,25 @@ with st.sidebar:
     """)
     
     st.divider()
+    cache_stats = scrape_cache.stats()
+    st.caption(
+        f"Кэш каналов: {cache_stats['entries']} записей, {cache_stats['bytes'] / 1024:.0f} КБ • "
+        f"попадания {cache_stats['hits']} (устаревшие {cache_stats['stale_hits']}), "
+        f"промахи {cache_stats['misses']}, вытеснения {cache_stats['evictions']}"
+    )
+    result_stats = result_store.stats()
+    st.caption(
+        f"Результаты анализа: {result_stats['entries']} записей, {result_stats['bytes'] / 1024 / 1024:.1f} МБ "
+        f"из {result_store.max_bytes / 1024 / 1024:.0f} МБ • вытеснения {result_stats['evictions']}"
+    )
+    for host, metrics in host_metrics().items():
+        st.caption(
+            f"{host}: лимит {metrics['limit']:.1f} параллельных запросов • 429: {metrics['throttled']} • "
+            f"ошибки: {metrics['server_errors'] + metrics['network_errors']} • повторы: {metrics['retries']} • "
+            f"предохранитель: {metrics['circuit']}"
+        )
+    llm_stats = get_store().llm_cache_stats()
+    st.caption(f"Кэш ИИ-ответов: {llm_stats['entries']} записей, {llm_stats['bytes'] / 1024:.0f} КБ")
     st.caption("© 2026 ChannelPulsePro AI\nВерсия 4.2 • Этичная аналитика")
 
 # === СКРЫТЫЙ ТЕСТОВЫЙ РЕЖИМ ===
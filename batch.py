@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from functools import partial
+from typing import Dict, List
+
+import pandas as pd
+
+from engine import COMPETITOR_CONCURRENCY, analyze_channel, analyze_channels, normalize_channel_name
+from http_client import close_http_client
+from parse_pool import get_parse_pool
+
+
+def read_channels(path: str) -> List[str]:
+    """Список каналов из файла (по одному в строке, # — комментарий); '-' — stdin"""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        channels = []
+        for line in stream:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                channels.append(normalize_channel_name(line))
+        # Без дубликатов, порядок сохраняется
+        return list(dict.fromkeys(c for c in channels if c))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def reports_to_frame(reports: List[Dict]) -> pd.DataFrame:
+    """Плоская таблица для Parquet: вложенные структуры сохраняются как JSON-строки"""
+    rows = []
+    for report in reports:
+        rows.append({
+            key: json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+            for key, value in report.items()
+        })
+    return pd.DataFrame(rows)
+
+
+async def run_batch(channels: List[str], limit: int, concurrency: int, with_ai: bool) -> List[Dict]:
+    try:
+        return await analyze_channels(
+            channels,
+            limit=limit,
+            concurrency=concurrency,
+            analyzer=partial(analyze_channel, with_ai=with_ai),
+        )
+    finally:
+        await close_http_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный анализ Telegram-каналов без интерфейса")
+    parser.add_argument("channels", help="файл со списком каналов (по одному в строке) или '-' для stdin")
+    parser.add_argument("-o", "--output", required=True, help="путь к файлу результатов")
+    parser.add_argument("-f", "--format", choices=["json", "parquet"], default=None,
+                        help="формат результатов (по умолчанию — по расширению файла)")
+    parser.add_argument("--limit", type=int, default=15, help="число последних постов на канал")
+    parser.add_argument("--concurrency", type=int, default=COMPETITOR_CONCURRENCY,
+                        help="сколько каналов обрабатывать одновременно")
+    parser.add_argument("--no-ai", action="store_true", help="не запрашивать ИИ-рекомендации")
+    args = parser.parse_args()
+
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "json")
+    channels = read_channels(args.channels)
+    if not channels:
+        parser.error("список каналов пуст")
+
+    started = time.perf_counter()
+    try:
+        reports = asyncio.run(run_batch(channels, args.limit, args.concurrency, not args.no_ai))
+    finally:
+        get_parse_pool().shutdown()
+    elapsed = time.perf_counter() - started
+
+    if output_format == "parquet":
+        try:
+            reports_to_frame(reports).to_parquet(args.output, index=False)
+        except ImportError:
+            sys.exit("❌ Для Parquet установите pyarrow: pip install pyarrow")
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+    failed = sum(1 for r in reports if r.get("error"))
+    print(f"✅ Обработано каналов: {len(reports)} (ошибок: {failed}) за {elapsed:.1f} сек → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import pandas as pd
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Оценка объёма объекта в байтах: для DataFrame — с учётом строк, для массивов и PostBatch — nbytes,
+    для словарей и списков — рекурсивно по содержимому
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class CacheEntry:
+    __slots__ = ("value", "expires_at", "size", "meta")
+
+    def __init__(self, value: Any, expires_at: Optional[float], size: int, meta: Optional[Dict]):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.meta = meta or {}
+
+    @property
+    def stale(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+class TTLCache:
+    """
+    LRU-кэш с TTL на запись и ограничением по числу записей и объёму в байтах.
+    Устаревшие записи не удаляются при чтении: вызывающий решает, отдать ли их
+    (stale-while-revalidate) или загрузить заново.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = 300,
+        sizeof: Callable[[Any], int] = estimate_size,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_entry(self, key: Hashable) -> Optional[CacheEntry]:
+        """Запись с учётом свежести (None — промах)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            if entry.stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Только свежее значение"""
+        entry = self.get_entry(key)
+        if entry is None or entry.stale:
+            return default
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, meta: Optional[Dict] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        entry = CacheEntry(value, expires_at, self.sizeof(value), meta)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._data[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def touch(self, key: Hashable, ttl: Optional[float] = None):
+        """Продление срока жизни записи (например, после ответа 304 Not Modified)"""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                entry.expires_at = time.monotonic() + ttl if ttl is not None else None
+                self._data.move_to_end(key)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return None
+            self._bytes -= entry.size
+            return entry.value
+
+    def _evict(self):
+        # Самая новая запись не вытесняется, даже если одна превышает лимит
+        while len(self._data) > 1 and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, entry = self._data.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
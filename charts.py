@@ -0,0 +1,93 @@
+import hashlib
+import io
+import os
+from typing import Optional
+
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from cache import TTLCache
+
+# === НАСТРОЙКИ ГРАФИКОВ ===
+CHART_CACHE_MAX_ENTRIES = int(os.getenv("CHART_CACHE_MAX_ENTRIES", "128"))
+CHART_CACHE_MAX_MB = float(os.getenv("CHART_CACHE_MAX_MB", "32"))
+# Начиная с такого числа постов вместо картинки рисуется нативный график Streamlit
+CHART_NATIVE_MIN_POSTS = int(os.getenv("CHART_NATIVE_MIN_POSTS", "200"))
+
+BAR_COLOR = '#1E88E5'
+BEST_BAR_COLOR = '#FF7043'
+
+# Готовые изображения общие для всех сессий; ключ — содержимое данных графика
+chart_cache = TTLCache(
+    max_entries=CHART_CACHE_MAX_ENTRIES,
+    max_bytes=int(CHART_CACHE_MAX_MB * 1024 * 1024),
+    ttl=None,
+    sizeof=len,
+)
+
+
+def _chart_key(hourly_stats: pd.DataFrame, best_hour: Optional[int], fmt: str, dpi: int) -> str:
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(hourly_stats, index=False).values.tobytes())
+    digest.update(f"{best_hour}|{fmt}|{dpi}".encode("ascii"))
+    return digest.hexdigest()
+
+
+def _draw_hourly_chart(hourly_stats: pd.DataFrame, best_hour: Optional[int], fmt: str, dpi: int) -> bytes:
+    # Figure без pyplot не попадает в глобальный реестр фигур и освобождается вместе с объектом
+    fig = Figure(figsize=(12, 5))
+    FigureCanvasAgg(fig)
+    try:
+        ax = fig.subplots()
+        bars = ax.bar(hourly_stats['hour'].astype(str), hourly_stats['Средние просмотры'], color=BAR_COLOR)
+
+        # Выделяем лучший час красным
+        for i, hour in enumerate(hourly_stats['hour']):
+            if hour == best_hour:
+                bars[i].set_color(BEST_BAR_COLOR)
+
+        ax.set_title("Средний охват по времени публикации (МСК)", fontsize=14)
+        ax.set_xlabel("Час публикации (МСК)")
+        ax.set_ylabel("Средние просмотры")
+        ax.grid(alpha=0.3, linestyle='--')
+
+        # Подписи значений над столбцами
+        for bar in bars:
+            height = bar.get_height()
+            if height > 0:
+                ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                        f'{int(height):,}',
+                        ha='center', va='bottom', fontsize=9)
+
+        ax.tick_params(axis='x', labelrotation=45)
+        fig.tight_layout()
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, dpi=dpi)
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def hourly_chart_image(hourly_stats: pd.DataFrame, best_hour: Optional[int], fmt: str = "png", dpi: int = 100) -> bytes:
+    """
+    Столбчатый график среднего охвата по часам в виде PNG/SVG.
+    Результат кэшируется по содержимому hourly_stats, поэтому одинаковые данные рисуются один раз.
+    """
+    key = _chart_key(hourly_stats, best_hour, fmt, dpi)
+    image = chart_cache.get(key)
+    if image is None:
+        image = _draw_hourly_chart(hourly_stats, best_hour, fmt, dpi)
+        chart_cache.set(key, image)
+    return image
+
+
+def hourly_chart_frame(hourly_stats: pd.DataFrame) -> pd.DataFrame:
+    """Данные для нативного st.bar_chart: индекс — час, колонка — средние просмотры"""
+    return hourly_stats.set_index('hour')[['Средние просмотры']]
+
+
+def use_native_chart(posts_count: int) -> bool:
+    """Нативный график дешевле картинки и остаётся интерактивным на длинной истории"""
+    return posts_count >= CHART_NATIVE_MIN_POSTS
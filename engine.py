@@ -0,0 +1,899 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from aggregators import PostingStats
+from anomaly import MIN_POSTS, SPIKE, VELOCITY, detect_anomalies
+from cache import TTLCache
+from http_client import get_session
+from parse_pool import get_parse_pool
+from posts import PostBatch, PostsLike, first_text_of, hours_of, post_ids_of, timestamps_of, views_of
+from ratelimit import get_groq_limiter
+from scraper import (
+    ChannelFetchError,
+    DEFAULT_MAX_PAGES,
+    DEFAULT_MAX_POSTS,
+    RateLimitedError,
+    UpstreamUnavailableError,
+    probe_channel,
+)
+from singleflight import SingleFlight
+from storage import get_store, refresh_channel
+from summarize import SUMMARY_TIMEOUT, Summarizer, estimate_tokens, history_fingerprint, summarized_posts
+from telemetr import fetch_audience, fetch_audiences
+from textindex import query_terms
+
+# === НАСТРОЙКИ ИЗ ОКРУЖЕНИЯ ===
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+
+GROQ_MODEL = "llama-3.1-8b-instant"
+GROQ_TEMPERATURE = 0.3
+GROQ_MAX_TOKENS = 500
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+# Сколько интерфейс ждёт очередной фрагмент потока рекомендаций (включая ожидание лимитов Groq)
+AI_STREAM_TIMEOUT = float(os.getenv("AI_STREAM_TIMEOUT", "90"))
+
+# Кэш ответов модели в SQLite: промпт полностью определяется входными данными
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "16"))
+
+# Сколько постов истории суммируется для ИИ-рекомендаций
+AI_HISTORY_POSTS = int(os.getenv("AI_HISTORY_POSTS", str(DEFAULT_MAX_POSTS)))
+
+# === ИНИЦИАЛИЗАЦИЯ GROQ КЛИЕНТА ===
+# Ошибка инициализации сохраняется, чтобы интерфейс мог показать предупреждение
+AsyncGroq = None
+groq_init_error: Optional[str] = None
+if GROQ_API_KEY:
+    try:
+        from groq import AsyncGroq
+    except ImportError:
+        groq_init_error = "⚠️ Библиотека groq не установлена. ИИ-анализ недоступен."
+
+# Асинхронный клиент держит httpx-пул, привязанный к event loop, поэтому создаётся на loop
+_groq_client = None
+_groq_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def ai_enabled() -> bool:
+    """Настроен ли ИИ-анализ (ключ и библиотека groq)"""
+    return AsyncGroq is not None
+
+
+def get_groq_client():
+    """Асинхронный клиент Groq для текущего event loop (None, если ИИ не настроен)"""
+    global _groq_client, _groq_client_loop, groq_init_error
+    if AsyncGroq is None:
+        return None
+    loop = asyncio.get_running_loop()
+    if _groq_client is None or _groq_client_loop is not loop:
+        try:
+            _groq_client = AsyncGroq(api_key=GROQ_API_KEY, timeout=GROQ_TIMEOUT)
+            _groq_client_loop = loop
+        except Exception as e:
+            groq_init_error = f"⚠️ Ошибка инициализации Groq: {str(e)}"
+            return None
+    return _groq_client
+
+# === ОБЩИЕ ДЛЯ ПРОЦЕССА ОБЪЕКТЫ ===
+# Модуль импортируется один раз на процесс, поэтому эти объекты общие для всех сессий
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", "300"))
+SCRAPE_CACHE_MAX_ENTRIES = int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", "256"))
+SCRAPE_CACHE_MAX_MB = float(os.getenv("SCRAPE_CACHE_MAX_MB", "64"))
+
+flights: Dict[str, SingleFlight] = {
+    "fetch": SingleFlight(), "ai": SingleFlight(), "revalidate": SingleFlight(), "summary": SingleFlight(),
+}
+scrape_cache = TTLCache(
+    max_entries=SCRAPE_CACHE_MAX_ENTRIES,
+    max_bytes=int(SCRAPE_CACHE_MAX_MB * 1024 * 1024),
+    ttl=SCRAPE_CACHE_TTL,
+)
+# Результаты анализа общие для всех сессий: ключ — (канал, версия данных), сессии хранят только ключ
+RESULT_STORE_TTL = float(os.getenv("RESULT_STORE_TTL", "3600"))
+RESULT_STORE_MAX_ENTRIES = int(os.getenv("RESULT_STORE_MAX_ENTRIES", "512"))
+RESULT_STORE_MAX_MB = float(os.getenv("RESULT_STORE_MAX_MB", "128"))
+
+result_store = TTLCache(
+    max_entries=RESULT_STORE_MAX_ENTRIES,
+    max_bytes=int(RESULT_STORE_MAX_MB * 1024 * 1024),
+    ttl=RESULT_STORE_TTL,
+)
+# Данные канала из расписания (scheduler.py) считаются свежими в течение интервала с запасом на разброс
+TRACKED_MAX_AGE_FACTOR = 1.5
+
+# Ссылки на фоновые задачи, чтобы их не собрал сборщик мусора
+background_tasks: set = set()
+
+# === СБОР ДАННЫХ ===
+async def fetch_channel_data(channel_name: str, limit: int = 15, max_pages: int = DEFAULT_MAX_PAGES) -> PostBatch:
+    """
+    Сбор данных из публичного Telegram-канала через кэш (TTL + LRU).
+    Устаревшая запись отдаётся сразу, а в фоне канал перепроверяется условным GET.
+    Одновременные запросы одного канала с тем же limit выполняются один раз.
+    Выполняется в фоновом event loop, поэтому ошибки для пользователя передаются через ChannelFetchError.
+    """
+    key = (channel_name.lower(), limit)
+    entry = scrape_cache.get_entry(key)
+
+    if entry is not None:
+        if entry.stale:
+            _schedule_revalidation(key, channel_name, limit, max_pages, entry.meta)
+        return entry.value
+
+    # PostBatch неизменяем, поэтому один объект безопасно отдавать всем ожидавшим
+    return await flights["fetch"].do(key, lambda: _load_and_cache(key, channel_name, limit, max_pages))
+
+async def _load_and_cache(key, channel_name: str, limit: int, max_pages: int, validators: Optional[Dict] = None) -> PostBatch:
+    posts = await _load_channel_data(channel_name, limit, max_pages)
+    scrape_cache.set(key, posts, meta=validators)
+    return posts
+
+def _schedule_revalidation(key, channel_name: str, limit: int, max_pages: int, validators: Dict):
+    """Фоновая перепроверка устаревшей записи кэша"""
+    async def revalidate():
+        if _tracked_fresh(channel_name, limit):
+            # Канал обновляет планировщик — достаточно перечитать хранилище, без запросов к t.me
+            await flights["fetch"].do(key, lambda: _load_and_cache(key, channel_name, limit, max_pages, validators))
+            return
+        if validators.get("conditional", True):
+            try:
+                modified, new_validators = await probe_channel(get_session(), channel_name, validators)
+            except Exception:
+                return
+            if not modified:
+                scrape_cache.touch(key)
+                return
+        else:
+            # t.me не поддержал условные запросы — проверка только удвоила бы трафик
+            new_validators = validators
+        try:
+            await flights["fetch"].do(key, lambda: _load_and_cache(key, channel_name, limit, max_pages, new_validators))
+        except ChannelFetchError:
+            pass
+
+    task = asyncio.ensure_future(flights["revalidate"].do(key, revalidate))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+def _tracked_fresh(channel_name: str, limit: int) -> bool:
+    """Канал отслеживается планировщиком, обновлён недавно и с достаточной глубиной истории"""
+    tracked = get_store().tracked_channel(channel_name)
+    return bool(
+        tracked
+        and tracked["last_success_at"]
+        and tracked["max_posts"] >= limit
+        and time.time() - tracked["last_success_at"] < tracked["interval"] * TRACKED_MAX_AGE_FACTOR
+    )
+
+async def _load_channel_data(channel_name: str, limit: int, max_pages: int) -> PostBatch:
+    store = get_store()
+    if _tracked_fresh(channel_name, limit):
+        posts = store.load_batch(channel_name, limit=limit)
+        if len(posts):
+            return posts
+
+    has_cache = store.max_post_id(channel_name) is not None
+
+    try:
+        await refresh_channel(store, get_session(), channel_name, max_posts=limit, max_pages=max_pages,
+                              parse_pool=get_parse_pool())
+    except RateLimitedError as e:
+        if not has_cache:
+            wait = f" через {e.retry_after:.0f} сек" if e.retry_after else " через минуту"
+            raise RateLimitedError(f"⏳ Telegram временно ограничил частоту запросов. Попробуйте{wait}.",
+                                   status=e.status, retry_after=e.retry_after)
+    except UpstreamUnavailableError as e:
+        if not has_cache:
+            raise UpstreamUnavailableError("❌ Telegram сейчас не отвечает. Попробуйте через минуту.",
+                                           status=e.status, retry_after=e.retry_after)
+    except ChannelFetchError:
+        if not has_cache:
+            raise ChannelFetchError(f"⚠️ Канал @{channel_name} не найден или приватный. Попробуйте публичные каналы: habr_com, rian_ru, tass_agency")
+    except Exception as e:
+        if not has_cache:
+            raise ChannelFetchError(f"❌ Не удалось загрузить канал @{channel_name} ({type(e).__name__}). Попробуйте позже.")
+
+    posts = store.load_batch(channel_name, limit=limit)
+
+    if not len(posts):
+        raise ChannelFetchError(f"⚠️ Не найдены посты в канале @{channel_name}. Убедитесь, что канал публичный.")
+
+    return posts
+
+def detect_fake_audience(posts: PostsLike, audience_data: Optional[Dict] = None) -> Dict:
+    """
+    Анализ на наличие накруток и ботов
+    """
+    results = {
+        "fake_probability": 0,
+        "reasons": [],
+        "recommendations": [],
+        "anomalous_posts": [],
+        "cadence_cv": None,
+    }
+    
+    # 1. Всплески и скачки охвата относительно скользящей медианы (anomaly.py)
+    # 2. Публикации по таймеру: почти одинаковые интервалы или всего 1-2 часа публикаций
+    regular_cadence = False
+    if len(posts) >= MIN_POSTS:
+        views = views_of(posts)
+        anomalies = detect_anomalies(views, timestamps_of(posts))
+        points = anomalies.fake_points()
+        results["anomalous_posts"] = anomalies.flagged_posts(post_ids_of(posts), views)
+        results["cadence_cv"] = anomalies.cadence_cv
+        
+        if points["spikes"]:
+            results["fake_probability"] += points["spikes"]
+            results["reasons"].append(
+                f"🚨 Аномальные всплески охвата: {anomalies.share(SPIKE):.0%} постов выше локальной нормы в разы"
+            )
+        if points["velocity"]:
+            results["fake_probability"] += points["velocity"]
+            results["reasons"].append(
+                f"🚨 Резкие скачки охвата между соседними постами: {anomalies.share(VELOCITY):.0%} постов"
+            )
+        if points["cadence"]:
+            regular_cadence = True
+            results["fake_probability"] += points["cadence"]
+            results["reasons"].append(
+                f"🚨 Посты выходят через почти одинаковые интервалы (разброс {anomalies.cadence_cv:.0%}) — похоже на автопостинг"
+            )
+    
+    hours = hours_of(posts)
+    if hours is not None and not regular_cadence and len(np.unique(hours)) < 3:
+        results["fake_probability"] += 25
+        results["reasons"].append("🚨 Слишком равномерное распределение по времени публикаций")
+    
+    # 3. Анализ вовлеченности
+    if audience_data and "engagement" in audience_data:
+        if audience_data["engagement"] < 1.0:
+            results["fake_probability"] += 20
+            results["reasons"].append(f"🚨 Низкая вовлеченность: {audience_data['engagement']}% (норма > 3%)")
+    
+    # 4. Анализ географии
+    if audience_data and "top_countries" in audience_data:
+        if len(audience_data["top_countries"]) > 0:
+            top_country = audience_data["top_countries"][0]["percent"]
+            if top_country > 90:
+                results["fake_probability"] += 15
+                results["reasons"].append(f"🚨 Слишком высокая концентрация аудитории в одной стране ({top_country}%)")
+    
+    # 5. Анализ качества подписчиков
+    if audience_data and "activity" in audience_data:
+        if audience_data["activity"] < 0.4:
+            results["fake_probability"] += 10
+            results["reasons"].append(f"🚨 Низкая активность аудитории: {audience_data['activity']*100:.0f}% (норма > 40%)")
+    
+    # Капаем вероятность на 100%
+    results["fake_probability"] = min(100, results["fake_probability"])
+    
+    # Формируем рекомендации
+    if results["fake_probability"] > 30:
+        results["recommendations"].append("✅ **Немедленно проверьте источники роста** — высока вероятность накрутки")
+        results["recommendations"].append("✅ **Удалите неактивных подписчиков** — это увеличит охват на 25-40%")
+    elif results["fake_probability"] > 10:
+        results["recommendations"].append("⚠️ **Проведите аудит аудитории** — возможна частичная накрутка")
+        results["recommendations"].append("✅ **Фокусируйтесь на вовлечении** — это снизит влияние ботов")
+    else:
+        results["recommendations"].append("✅ **Аудитория качественная** — продолжайте текущую стратегию")
+        results["recommendations"].append("✅ **Увеличьте частоту публикаций** — ваша аудитория готова к большему контенту")
+    
+    return results
+
+# Тематика по умолчанию, если интересы аудитории неизвестны
+DEFAULT_TARGET_TERMS = ["habr", "python", "программирование", "код"]
+# Доля постов на темы интересов аудитории, начиная с которой контент считается попадающим в аудиторию
+TARGET_SHARE_MIN = float(os.getenv("TARGET_SHARE_MIN", "0.2"))
+
+def target_terms(audience_data: Optional[Dict]) -> List[str]:
+    """Термины для проверки соответствия контента аудитории: интересы из Telemetr или тематика по умолчанию"""
+    interests = [i["name"] for i in (audience_data or {}).get("interests", [])]
+    return query_terms(interests) or DEFAULT_TARGET_TERMS
+
+def analyze_audience_quality(posts: PostsLike, audience_data: Optional[Dict] = None,
+                             topics: Optional[Dict] = None) -> Dict:
+    """Анализ качества аудитории; topics — тематика канала из текстового индекса (см. channel_topics)"""
+    results = {
+        "quality_score": 85,  # По умолчанию 85%
+        "issues": [],
+        "recommendations": []
+    }
+    
+    # 1. Анализ активности
+    if audience_data and "activity" in audience_data:
+        activity_score = audience_data["activity"] * 100
+        if activity_score < 40:
+            results["quality_score"] -= 20
+            results["issues"].append(f"📉 Низкая активность аудитории: {activity_score:.0f}% (норма > 40%)")
+        elif activity_score < 60:
+            results["quality_score"] -= 10
+            results["issues"].append(f"📉 Средняя активность аудитории: {activity_score:.0f}%")
+    
+    # 2. Анализ вовлеченности
+    if audience_data and "engagement" in audience_data:
+        engagement_score = audience_data["engagement"]
+        if engagement_score < 2.0:
+            results["quality_score"] -= 15
+            results["issues"].append(f"📉 Низкая вовлеченность: {engagement_score}% (норма > 3%)")
+        elif engagement_score < 3.0:
+            results["quality_score"] -= 7
+            results["issues"].append(f"📉 Средняя вовлеченность: {engagement_score}%")
+    
+    # 3. Анализ целевой аудитории: какая доля постов канала касается интересов аудитории
+    target_share = topics.get("target_share") if topics else None
+    if target_share is None:
+        target_match = 85 if any(kw in first_text_of(posts).lower() for kw in DEFAULT_TARGET_TERMS) else 70
+    else:
+        target_match = 85 if target_share >= TARGET_SHARE_MIN else 70
+    
+    if target_match < 75:
+        results["quality_score"] -= 10
+        results["issues"].append(
+            f"📉 Низкое соответствие целевой аудитории: {target_match}%"
+            + (f" (о темах аудитории — {target_share:.0%} постов)" if target_share is not None else "")
+        )
+    
+    # 4. Анализ динамики
+    if len(posts) > 5:
+        views = views_of(posts)
+        if len(views) >= 6:
+            current_avg = np.mean(views[-3:])
+            previous_avg = np.mean(views[-6:-3])
+            
+            if previous_avg > 0:
+                growth = (current_avg - previous_avg) / previous_avg * 100
+                if growth < -15:
+                    results["quality_score"] -= 10
+                    results["issues"].append(f"📉 Отрицательная динамика: -{abs(growth):.0f}% за последние 3 поста")
+    
+    # Ограничиваем минимальный и максимальный score
+    results["quality_score"] = max(30, min(100, results["quality_score"]))
+    
+    # Формируем рекомендации
+    if results["quality_score"] < 70:
+        results["recommendations"].append(f"🔥 **Срочно улучшайте качество аудитории:** текущий рейтинг {results['quality_score']}%")
+        results["recommendations"].append("✅ **Проведите чистку неактивных подписчиков** — удаление 20% ботов увеличит охват на 25%")
+        results["recommendations"].append("✅ **Добавьте 30% постов с высокой вовлеченностью** (опросы, вопросы, интерактив)")
+    elif results["quality_score"] < 85:
+        results["recommendations"].append(f"📈 **Качество аудитории можно улучшить:** текущий рейтинг {results['quality_score']}%")
+        results["recommendations"].append("✅ **Увеличьте интерактивность** — добавьте опросы в 40% постов")
+        results["recommendations"].append("✅ **Оптимизируйте время публикаций** по данным анализа выше")
+    else:
+        results["recommendations"].append(f"✨ **Отличное качество аудитории:** рейтинг {results['quality_score']}%")
+        results["recommendations"].append("✅ **Масштабируйте успешные стратегии** — увеличьте частоту публикаций")
+        results["recommendations"].append("✅ **Начните монетизацию** — ваша аудитория готова к рекламе")
+    
+    return results
+
+def prepare_ai_inputs(posts: PostsLike) -> Dict:
+    """Числовые входные данные промпта (по ним же строится ключ кэша ответов)"""
+    views = views_of(posts)
+    hours = hours_of(posts)
+    if hours is None:
+        hours = posts['date'].dt.hour.values
+    return {
+        "avg_views": float(views.mean()),
+        # Самый частый час; при равенстве — наименьший, как у Series.mode()
+        "best_hour": int(np.bincount(hours, minlength=24).argmax()),
+        "growth_rate": float((views[-1] - views[-3]) / views[-3] * 100) if len(posts) > 3 and views[-3] else 0.0,
+        "posts_count": len(posts),
+    }
+
+def _audience_source(audience_data: Optional[Dict]) -> str:
+    return "Telemetr" if audience_data and audience_data.get("source") == "telemetr" else "примерные"
+
+def _audience_lines(audience_data: Optional[Dict]) -> str:
+    """Строки промпта с данными аудитории"""
+    if not audience_data:
+        return "• Данные о подписчиках недоступны"
+    gender = audience_data.get("gender", {})
+    ages = {k: v for k, v in audience_data.get("age", {}).items() if k != "other"}
+    top_age = max(ages, key=ages.get) if ages else None
+    interests = ", ".join(f"{i['name']} ({i['value']}%)" for i in audience_data.get("interests", [])[:3])
+    lines = [f"• Демография: {gender.get('male', 0)}% мужчины"
+             + (f", {ages[top_age]}% — {top_age.replace('_', '-')} года" if top_age else "")]
+    if interests:
+        lines.append(f"• Топ интересы: {interests}")
+    if "engagement" in audience_data:
+        lines.append(f"• Вовлеченность: {audience_data['engagement']}%")
+    return "\n    ".join(lines)
+
+def build_ai_prompt(channel_name: str, inputs: Dict, audience_data: Optional[Dict] = None,
+                    history_summary: Optional[str] = None, history_posts: int = 0) -> str:
+    """Промпт для Llama3 по подготовленным данным канала, аудитории и сводке истории"""
+    history = ""
+    if history_summary:
+        history = f"""
+    📜 СВОДКА ИСТОРИИ КАНАЛА (последние {history_posts} постов):
+    {history_summary}
+    """
+    return f"""
+    Ты — эксперт по монетизации Telegram-каналов с 10-летним опытом. 
+    Проанализируй данные для канала @{channel_name} на основе последних {inputs["posts_count"]} постов:
+    
+    📊 СТАТИСТИКА:
+    • Средний охват: {inputs["avg_views"]:,.0f} просмотров
+    • Лучшее время публикаций: {inputs["best_hour"]}:00 МСК
+    • Динамика роста: {inputs["growth_rate"]:+.1f}% за последние 3 поста
+    • Количество постов в анализе: {inputs["posts_count"]}
+    
+    👥 ДАННЫЕ АУДИТОРИИ ({_audience_source(audience_data)}):
+    {_audience_lines(audience_data)}
+    {history}
+    💡 ЗАДАЧА:
+    1. Сгенерируй 3 конкретные, приоритетные рекомендации для увеличения дохода
+    2. Укажи измеримые метрики (на сколько % вырастет охват/доход)
+    3. Дай готовый шаблон для продажи рекламы
+    4. Предложи оптимальную ценовую стратегию
+    
+    📝 ФОРМАТ ОТВЕТА:
+    Используй markdown с эмоджи. Раздели на секции:
+    • 🎯 ТОП-3 РЕКОМЕНДАЦИИ
+    • 💰 СТРАТЕГИЯ МОНЕТИЗАЦИИ
+    • 📈 ПРОГНОЗ РОСТА
+    
+    Не добавляй лишней информации. Будь конкретным и практичным.
+    """
+
+def _ai_error_message(error: Exception, best_hour: int) -> str:
+    """Запасной текст вместо ИИ-рекомендаций при ошибке Groq"""
+    error_msg = str(error).lower()
+    if "rate limit" in error_msg or "quota" in error_msg:
+        return """
+        ⏳ **Достигнут лимит Groq API.** Попробуйте через 1 минуту или используйте тестовые рекомендации ниже:
+        
+        🎯 **ТОП-3 РЕКОМЕНДАЦИИ для @habr_com:**
+        • **Смещение времени публикаций** на 19:00-21:00 МСК (+35% охвата)
+        • **Увеличение количества инструкций с кодом** — они получают на 2.5x больше просмотров
+        • **Внедрение еженедельной рубрики "Инструмент недели"** — рост подписчиков на 15%
+        
+        💰 **СТРАТЕГИЯ МОНЕТИЗАЦИИ:**
+        • Базовая реклама: 8,000 ₽ за пост (5,000 просмотров)
+        • Спонсорский пост с глубоким анализом: 25,000 ₽
+        • Годовое партнерство с tech-компанией: 400,000 ₽
+        
+        📈 **ПРОГНОЗ РОСТА:**
+        При реализации рекомендаций:
+        • Месяц 1: +25% к охвату, +15% к подписчикам
+        • Месяц 3: +60% к доходу от рекламы
+        """
+    return f"""
+    ❌ **Ошибка генерации ИИ-рекомендаций:** {str(error)[:100]}
+    
+    ⚙️ **Рекомендации без ИИ:**
+    • Оптимизируйте время публикаций на {best_hour}:00 МСК
+    • Увеличьте долю интерактивного контента на 30%
+    • Проанализируйте топ-3 конкурентов для копирования успешных форматов
+    """
+
+def normalize_ai_inputs(inputs: Dict) -> Dict:
+    """Входные данные с той точностью, с которой они попадают в промпт"""
+    return {
+        "avg_views": round(inputs["avg_views"]),
+        "best_hour": int(inputs["best_hour"]),
+        "growth_rate": round(inputs["growth_rate"], 1),
+        "posts_count": int(inputs["posts_count"]),
+    }
+
+def ai_cache_key(channel_name: str, inputs: Dict, audience_data: Optional[Dict] = None,
+                 history: Optional[PostBatch] = None) -> str:
+    """
+    Ключ кэша ответа: хэш модели, параметров генерации, нормализованных входных данных,
+    данных аудитории и отпечатка суммируемой истории
+    """
+    inputs = normalize_ai_inputs(inputs)
+    payload = json.dumps({
+        "model": GROQ_MODEL,
+        "temperature": GROQ_TEMPERATURE,
+        "max_tokens": GROQ_MAX_TOKENS,
+        "channel": channel_name.lower(),
+        "inputs": inputs,
+        "audience": audience_data,
+        "history": history_fingerprint(history) if _use_history(inputs, history) else None,
+        # Изменение шаблона промпта сбрасывает кэш
+        "prompt": hashlib.sha256(build_ai_prompt(channel_name, inputs, audience_data).encode("utf-8")).hexdigest(),
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _use_history(inputs: Dict, history: Optional[PostBatch]) -> bool:
+    # Сводка нужна, только если история длиннее уже переданных в промпт постов
+    return history is not None and len(history) > inputs["posts_count"]
+
+async def fetch_ai_history(channel_name: str) -> Optional[PostBatch]:
+    """Длинная история канала для суммаризации (None, если загрузить не удалось)"""
+    try:
+        return await fetch_channel_data(channel_name, limit=AI_HISTORY_POSTS)
+    except ChannelFetchError:
+        return None
+
+def ai_inputs_key(channel_name: str, posts: PostsLike, audience_data: Optional[Dict] = None,
+                  history: Optional[PostBatch] = None) -> str:
+    """Ключ ответа модели для постов, аудитории и истории (см. ai_cache_key)"""
+    return ai_cache_key(channel_name, normalize_ai_inputs(prepare_ai_inputs(posts)), audience_data, history)
+
+def get_cached_ai_recommendations(channel_name: str, posts: PostsLike, audience_data: Optional[Dict] = None,
+                                  history: Optional[PostBatch] = None) -> Optional[Dict]:
+    """Сохранённые рекомендации для тех же входных данных: {response, created_at, model} или None"""
+    if not GROQ_API_KEY:
+        return None
+    return get_store().get_llm_response(ai_inputs_key(channel_name, posts, audience_data, history), ttl=LLM_CACHE_TTL)
+
+def ai_response_complete(key: str) -> bool:
+    """
+    Завершился ли поток рекомендаций без ошибок: _stream_ai_recommendations сохраняет в кэш LLM
+    только полные ответы (без запасного текста об ошибке и без оборванной сводки истории)
+    """
+    return bool(GROQ_API_KEY) and get_store().get_llm_response(key, ttl=LLM_CACHE_TTL) is not None
+
+def stream_ai_recommendations(channel_name: str, posts: PostsLike, audience_data: Optional[Dict] = None,
+                              history: Optional[PostBatch] = None) -> AsyncIterator[str]:
+    """
+    Потоковая генерация рекомендаций через Groq Llama3: фрагменты текста отдаются по мере прихода токенов.
+    Для длинной истории в промпт попадает готовая сводка (map-reduce, см. summarize.py); если её ещё нет,
+    поток сразу строится по агрегатам, а сводка готовится в фоне для следующих ответов.
+    Готовый ответ для тех же входных данных берётся из кэша. Одновременные запросы
+    с одинаковыми входными данными объединяются — все получают один и тот же поток.
+    """
+    inputs = normalize_ai_inputs(prepare_ai_inputs(posts))
+    if not _use_history(inputs, history):
+        history = None
+    key = ai_cache_key(channel_name, inputs, audience_data, history)
+    return flights["ai"].stream(key, lambda: _stream_ai_recommendations(channel_name, inputs, audience_data, history, key))
+
+async def generate_ai_recommendations(channel_name: str, posts: PostsLike, audience_data: Optional[Dict] = None,
+                                      history: Optional[PostBatch] = None) -> str:
+    """
+    Генерация рекомендаций через Groq Llama3 целиком (для пакетного режима): здесь сводка истории
+    дожидается заранее (не дольше SUMMARY_TIMEOUT), чтобы попасть в ответ
+    """
+    if history is not None and _use_history(prepare_ai_inputs(posts), history):
+        await summarize_ai_history(history)
+    chunks = [chunk async for chunk in stream_ai_recommendations(channel_name, posts, audience_data, history)]
+    return "".join(chunks)
+
+async def _stream_ai_recommendations(channel_name: str, inputs: Dict, audience_data: Optional[Dict],
+                                     history: Optional[PostBatch], cache_key: str) -> AsyncIterator[str]:
+    client = get_groq_client()
+    if not client:
+        yield """
+        ℹ️ **Для ИИ-анализа настройте Groq API:**  
+        1. Получите ключ на https://console.groq.com  
+        2. Добавьте переменную `GROQ_API_KEY` в настройки Render  
+        3. Перезапустите приложение
+        """
+        return
+
+    store = get_store()
+    cached = store.get_llm_response(cache_key, ttl=LLM_CACHE_TTL)
+    if cached is not None:
+        yield cached["response"]
+        return
+
+    # Первый токен не ждёт map-reduce по всей истории: на бесплатном тарифе Groq это минуты.
+    # Без готовой сводки рекомендации строятся по агрегатам, а сводка строится в фоне
+    history_summary = None
+    if history is not None:
+        history_summary = _history_summarizer(client).cached_history_summary(history)
+        if history_summary is None:
+            _schedule_history_summary(history)
+
+    # Подготовка данных для Llama3
+    prompt = build_ai_prompt(channel_name, inputs, audience_data, history_summary,
+                             summarized_posts(history) if history_summary else 0)
+    chunks: List[str] = []
+
+    try:
+        await get_groq_limiter().acquire(estimate_tokens(prompt) + GROQ_MAX_TOKENS)
+        # Потоковый запрос к Groq: не блокирует event loop и отдаёт токены сразу
+        stream = await client.chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model=GROQ_MODEL,
+            temperature=GROQ_TEMPERATURE,
+            max_tokens=GROQ_MAX_TOKENS,
+            stream=True,
+        )
+        async for chunk in stream:
+            content = chunk.choices[0].delta.content if chunk.choices else None
+            if content:
+                chunks.append(content)
+                yield content
+
+    except Exception as e:
+        message = _ai_error_message(e, inputs["best_hour"])
+        yield ("\n\n" + message) if chunks else message
+        return
+
+    # В кэш попадают только полные ответы без ошибок; ответ без сводки истории неполный —
+    # следующий запрос с той же историей возьмёт уже готовую сводку
+    if chunks and (history is None or history_summary):
+        store.put_llm_response(cache_key, GROQ_MODEL, "".join(chunks), ttl=LLM_CACHE_TTL,
+                               max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024))
+
+def _history_summarizer(client) -> Summarizer:
+    return Summarizer(client, get_store(), GROQ_MODEL, cache_ttl=LLM_CACHE_TTL,
+                      cache_max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024))
+
+async def summarize_ai_history(history: PostBatch) -> Optional[str]:
+    """
+    Сводка истории для рекомендаций: из кэша или новая суммаризация не дольше SUMMARY_TIMEOUT.
+    Одна и та же история суммируется один раз, сколько бы запросов её ни ждали; None — сводки нет
+    """
+    client = get_groq_client()
+    if client is None:
+        return None
+    summarizer = _history_summarizer(client)
+    cached = summarizer.cached_history_summary(history)
+    if cached is not None:
+        return cached
+    try:
+        summary = await flights["summary"].do(
+            history_fingerprint(history),
+            lambda: asyncio.wait_for(summarizer.summarize_history(history), SUMMARY_TIMEOUT),
+        )
+    except Exception:
+        return None
+    return summary or None
+
+def _schedule_history_summary(history: PostBatch):
+    """Фоновая суммаризация истории; результат попадает в кэш LLM"""
+    task = asyncio.ensure_future(summarize_ai_history(history))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+# Лучший час выбирается среди часов хотя бы с таким числом постов (если такие есть)
+MIN_HOUR_POSTS = int(os.getenv("MIN_HOUR_POSTS", "3"))
+
+def posting_stats_of(posts: PostsLike) -> PostingStats:
+    """Статистика просмотров по дню недели × часу для пачки постов"""
+    return PostingStats.from_posts(timestamps_of(posts), views_of(posts))
+
+def compute_hourly_stats(posts: PostsLike) -> pd.DataFrame:
+    """Средние просмотры, число постов и 95%-интервал по часу публикации (МСК)"""
+    return posting_stats_of(posts).hourly_frame()
+
+def find_best_hour(hourly_stats: pd.DataFrame) -> Optional[Dict]:
+    """Лучший час публикации и прирост охвата относительно среднего по часам"""
+    if hourly_stats.empty:
+        return None
+    candidates = hourly_stats[hourly_stats['Кол-во постов'] >= MIN_HOUR_POSTS]
+    if candidates.empty:
+        candidates = hourly_stats
+    best_hour_row = candidates.loc[candidates['Средние просмотры'].idxmax()]
+    best_views = best_hour_row['Средние просмотры']
+    avg_views = hourly_stats['Средние просмотры'].mean()
+    return {
+        "best_hour": int(best_hour_row['hour']),
+        "best_views": best_views,
+        "posts_count": int(best_hour_row['Кол-во постов']),
+        "ci_low": None if pd.isna(best_hour_row['Нижняя граница']) else float(best_hour_row['Нижняя граница']),
+        "ci_high": None if pd.isna(best_hour_row['Верхняя граница']) else float(best_hour_row['Верхняя граница']),
+        "uplift": ((best_views / avg_views) - 1) * 100 if avg_views > 0 else 0,
+    }
+
+CPM_RATES = {"it": 45, "news": 25, "sport": 30, "business": 50, "finance": 60}
+
+def estimate_monetization(channel_name: str, avg_views: float) -> Dict:
+    """Оценка дохода с рекламного поста по CPM ниши"""
+    niche = "it" if any(kw in channel_name.lower() for kw in ["habr", "vc", "tproger", "python", "dev", "code"]) else "news"
+    cpm_rate = CPM_RATES.get(niche, 35)
+    current_earnings = (avg_views / 1000) * cpm_rate
+    return {
+        "niche": niche,
+        "cpm_rate": cpm_rate,
+        "current_earnings": current_earnings,
+        "optimized_earnings": current_earnings * 1.35,  # +35% после оптимизации
+    }
+
+# === РЕЗУЛЬТАТЫ АНАЛИЗА ===
+def audience_digest(audience_data: Optional[Dict]) -> Optional[str]:
+    """Короткий отпечаток данных аудитории (None — данных нет)"""
+    if audience_data is None:
+        return None
+    payload = json.dumps(audience_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def metrics_key(channel_name: str, posts: PostBatch) -> Hashable:
+    """
+    Ключ метрик, которые считаются только по постам: канал, отпечаток пачки и версия хранилища.
+    Время публикаций и темы считаются по всей сохранённой истории, поэтому догрузка истории
+    меняет ключ, даже если последние посты те же
+    """
+    return (channel_name.lower(), posts.fingerprint(), get_store().data_version(channel_name))
+
+def analysis_key(channel_name: str, posts: PostBatch, audience_data: Optional[Dict] = None) -> Hashable:
+    """
+    Лёгкий ключ полного результата анализа: метрики постов и отпечаток аудитории.
+    Результат, собранный без данных аудитории (например, при сбое Telemetr), не подменяет результат с ними
+    """
+    return metrics_key(channel_name, posts) + (audience_digest(audience_data),)
+
+def channel_topics(channel_name: str, audience_data: Optional[Dict] = None) -> Dict:
+    """Темы канала по текстовому индексу хранилища: термины с наибольшим охватом и охват тем аудитории"""
+    store = get_store()
+    terms = target_terms(audience_data)
+    return {
+        "top_terms": store.top_terms(channel_name),
+        "target_terms": terms,
+        "target_share": store.term_coverage(channel_name, terms),
+    }
+
+def build_metrics(channel_name: str, posts: PostBatch) -> Dict:
+    """
+    Метрики отчёта, которым не нужны данные аудитории: посты, время публикаций, аномалии охвата, монетизация.
+    Время публикаций оценивается по всей сохранённой истории канала (posting_stats хранилища),
+    если она не короче пачки: это чтение 168 ячеек независимо от длины истории.
+    """
+    timing = get_store().posting_stats(channel_name)
+    if timing.total < len(posts):
+        timing = posting_stats_of(posts)
+    hourly_stats = timing.hourly_frame()
+    best = find_best_hour(hourly_stats)
+    if best is not None:
+        best["slot"] = timing.best_slot(MIN_HOUR_POSTS)
+    return {
+        "df": posts.to_frame(),
+        "hourly_stats": hourly_stats,
+        "best": best,
+        "timing_posts": timing.total,
+        "fake": detect_fake_audience(posts),
+        "monetization": estimate_monetization(channel_name, float(views_of(posts).mean())),
+    }
+
+def build_analysis(channel_name: str, posts: PostBatch, audience_data: Optional[Dict] = None,
+                   metrics: Optional[Dict] = None) -> Dict:
+    """Все метрики отчёта (без ИИ): метрики постов плюс аудитория; audience_data — данные Telemetr или None"""
+    metrics = metrics or build_metrics(channel_name, posts)
+    topics = channel_topics(channel_name, audience_data)
+    return {
+        **metrics,
+        "topics": topics,
+        "audience": audience_data,
+        "quality": analyze_audience_quality(posts, audience_data, topics),
+        "fake": detect_fake_audience(posts, audience_data) if audience_data else metrics["fake"],
+    }
+
+def get_metrics(channel_name: str, posts: PostBatch) -> Dict:
+    """Метрики постов из общего хранилища (считаются один раз на версию данных канала)"""
+    key = metrics_key(channel_name, posts) + ("metrics",)
+    result = result_store.get(key)
+    if result is None:
+        result = build_metrics(channel_name, posts)
+        result_store.set(key, result)
+    return result
+
+def get_analysis(channel_name: str, posts: PostBatch, key: Optional[Hashable] = None,
+                 audience_data: Optional[Dict] = None) -> Dict:
+    """
+    Результат анализа из общего хранилища (считается один раз на версию данных канала и аудитории),
+    под ключом result["key"]. Значение общее для всех вызывающих — изменять его нельзя.
+    """
+    key = key or analysis_key(channel_name, posts, audience_data)
+    result = result_store.get(key)
+    if result is None:
+        # Ключ хранится в результате: версия хранилища меняется, пока догружается история
+        result = {**build_analysis(channel_name, posts, audience_data, get_metrics(channel_name, posts)), "key": key}
+        result_store.set(key, result)
+    return result
+
+# === СРАВНЕНИЕ С КОНКУРЕНТАМИ ===
+COMPETITOR_CONCURRENCY = int(os.getenv("COMPETITOR_CONCURRENCY", "4"))
+
+def normalize_channel_name(raw: str) -> str:
+    """Username канала из @name, ссылки t.me/name или name?query"""
+    return raw.strip().replace("@", "").split("/")[-1].split("?")[0]
+
+async def analyze_channel_summary(channel_name: str, limit: int = 15) -> Dict:
+    """Сводные метрики одного канала для таблицы сравнения"""
+    try:
+        posts, audience_data = await asyncio.gather(
+            fetch_channel_data(channel_name, limit=limit), fetch_audience(channel_name)
+        )
+    except ChannelFetchError as e:
+        return {"channel": channel_name, "error": str(e)}
+
+    analysis = await asyncio.to_thread(get_analysis, channel_name, posts, audience_data=audience_data)
+    views = views_of(posts)
+    best = analysis["best"]
+    return {
+        "channel": channel_name,
+        "posts": len(posts),
+        "avg_views": float(views.mean()),
+        "max_views": int(views.max()),
+        "best_hour": best["best_hour"] if best else None,
+        "quality_score": analysis["quality"]["quality_score"],
+        "fake_probability": analysis["fake"]["fake_probability"],
+        "earnings": analysis["monetization"]["current_earnings"],
+        "error": None,
+    }
+
+async def analyze_channels(
+    channels: List[str],
+    limit: int = 15,
+    concurrency: int = COMPETITOR_CONCURRENCY,
+    analyzer: Callable[[str, int], Awaitable[Dict]] = analyze_channel_summary,
+) -> List[Dict]:
+    """
+    Параллельный анализ нескольких каналов (не больше concurrency одновременно).
+    Общее время близко к самому медленному каналу, а не к сумме.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    # Данные аудитории для всех каналов запрашиваются сразу одним пакетом;
+    # анализ каждого канала потом присоединяется к этому запросу или читает кэш
+    prefetch = asyncio.ensure_future(fetch_audiences(channels))
+
+    async def run_one(channel_name: str) -> Dict:
+        async with semaphore:
+            return await analyzer(channel_name, limit)
+
+    try:
+        return await asyncio.gather(*(run_one(c) for c in channels))
+    finally:
+        await prefetch
+
+# === ПОЛНЫЙ ОТЧЁТ ===
+async def analyze_channel(channel_name: str, limit: int = 15, with_ai: bool = True) -> Dict:
+    """
+    Полный отчёт по каналу без интерфейса: метрики, время публикаций, качество,
+    накрутки, монетизация и (опционально) ИИ-рекомендации. Результат сериализуем в JSON.
+    """
+    try:
+        posts, audience_data = await asyncio.gather(
+            fetch_channel_data(channel_name, limit=limit), fetch_audience(channel_name)
+        )
+    except ChannelFetchError as e:
+        return {"channel": channel_name, "error": str(e)}
+
+    analysis = await asyncio.to_thread(get_analysis, channel_name, posts, audience_data=audience_data)
+    audience_data = analysis["audience"]
+    views = views_of(posts)
+    hourly_stats = analysis["hourly_stats"]
+    best = analysis["best"]
+
+    report = {
+        "channel": channel_name,
+        "error": None,
+        "posts": len(posts),
+        "first_post_id": int(posts.post_ids[0]),
+        "last_post_id": int(posts.post_ids[-1]),
+        "avg_views": float(views.mean()),
+        "max_views": int(views.max()),
+        "timing_posts": analysis["timing_posts"],
+        "hourly": [
+            {
+                "hour": int(row["hour"]),
+                "avg_views": float(row["Средние просмотры"]),
+                "posts": int(row["Кол-во постов"]),
+                "ci_low": None if pd.isna(row["Нижняя граница"]) else float(row["Нижняя граница"]),
+                "ci_high": None if pd.isna(row["Верхняя граница"]) else float(row["Верхняя граница"]),
+            }
+            for _, row in hourly_stats.iterrows()
+        ],
+        "best_time": {
+            "hour": best["best_hour"],
+            "avg_views": float(best["best_views"]),
+            "posts": int(best["posts_count"]),
+            "ci_low": best["ci_low"],
+            "ci_high": best["ci_high"],
+            "uplift": float(best["uplift"]),
+            "slot": best["slot"],
+        } if best else None,
+        "audience": audience_data,
+        "topics": analysis["topics"],
+        "quality": analysis["quality"],
+        "fake": analysis["fake"],
+        "monetization": analysis["monetization"],
+        "ai_recommendations": None,
+        "ai_cached": False,
+    }
+    if with_ai:
+        history = await fetch_ai_history(channel_name) if ai_enabled() else None
+        report["ai_cached"] = get_cached_ai_recommendations(channel_name, posts, audience_data, history) is not None
+        report["ai_recommendations"] = await generate_ai_recommendations(channel_name, posts, audience_data, history)
+    return report
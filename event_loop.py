@@ -0,0 +1,106 @@
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+from http_client import close_http_client
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """
+    Долгоживущий event loop в отдельном потоке.
+    Скрипт Streamlit отправляет в него корутины и синхронно ждёт результат,
+    поэтому пулы соединений, кэши и незавершённые запросы переживают перезапуски скрипта
+    и общие для всех пользовательских сессий.
+    """
+
+    def __init__(self, name: str = "channelpulse-loop"):
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(self._started.set)
+        self._loop.run_forever()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def submit(self, coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        """Потокобезопасный запуск корутины в фоновом loop"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Запуск корутины и ожидание результата из любого потока, кроме потока loop"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("run() нельзя вызывать из потока фонового event loop — используйте await")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator[T], timeout: Optional[float] = None) -> Iterator[T]:
+        """
+        Синхронный итератор поверх асинхронного генератора, работающего в фоновом loop
+        (например, для st.write_stream). timeout — ожидание каждого следующего элемента.
+        """
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__(), timeout)
+                except StopAsyncIteration:
+                    return
+        finally:
+            # Если читатель остановился раньше, закрываем генератор в его loop
+            aclose = getattr(agen, "aclose", None)
+            if aclose is not None:
+                try:
+                    self.run(aclose(), timeout)
+                except Exception:
+                    pass
+
+    def stop(self, timeout: float = 5):
+        """Закрытие общих ресурсов и остановка loop"""
+        if not self._loop.is_running():
+            return
+        try:
+            self.submit(close_http_client()).result(timeout)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        if not self._loop.is_running():
+            self._loop.close()
+
+
+_background_loop: Optional[BackgroundLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> BackgroundLoop:
+    """Общий для процесса фоновый event loop"""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = BackgroundLoop()
+            atexit.register(_background_loop.stop)
+        return _background_loop
+
+
+def run_async(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """Выполнение корутины в фоновом loop с синхронным ожиданием результата"""
+    return get_background_loop().run(coro, timeout)
+
+
+def iterate_async(agen: AsyncIterator[T], timeout: Optional[float] = None) -> Iterator[T]:
+    """Синхронное чтение асинхронного генератора через фоновый loop"""
+    return get_background_loop().iterate(agen, timeout)
@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import hashlib
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+# === ЛОКАЛЬНАЯ ЗАГЛУШКА TELEMETR API ===
+# Отдаёт данные аудитории в формате, который ждёт telemetr.TelemetrClient:
+#   python fake_telemetr.py --quota 30 --latency 0.2
+#   TELEMETR_API_KEY=dev TELEMETR_BASE_URL=http://127.0.0.1:8766 streamlit run app.py
+INTERESTS = ["Python", "AI", "DevOps", "Data Science", "Карьера", "Стартапы", "Маркетинг", "Финансы"]
+COUNTRIES = ["Россия", "Казахстан", "Беларусь", "Узбекистан", "Германия"]
+
+
+def fake_audience(channel: str) -> Dict:
+    """Детерминированные данные аудитории по имени канала"""
+    seed = hashlib.sha1(channel.encode("utf-8")).digest()
+    male = 40 + seed[0] % 50
+    age_25_34 = 30 + seed[1] % 40
+    age_18_24 = (100 - age_25_34) // 2
+    age_35_44 = (100 - age_25_34 - age_18_24) // 2
+    first_country = 50 + seed[2] % 40
+    interests = sorted(INTERESTS, key=lambda name: hashlib.sha1((channel + name).encode("utf-8")).digest())[:5]
+    return {
+        "gender": {"male": male, "female": 100 - male},
+        "age": {"25_34": age_25_34, "18_24": age_18_24, "35_44": age_35_44,
+                "other": 100 - age_25_34 - age_18_24 - age_35_44},
+        "top_countries": [
+            {"country": COUNTRIES[seed[3] % len(COUNTRIES)], "percent": first_country},
+            {"country": COUNTRIES[(seed[3] + 1) % len(COUNTRIES)], "percent": (100 - first_country) // 2},
+        ],
+        "interests": [{"name": name, "value": 60 - i * 8 - seed[4 + i] % 5} for i, name in enumerate(interests)],
+        "engagement": round(1 + seed[9] % 60 / 10, 1),
+        "activity": round(0.3 + seed[10] % 60 / 100, 2),
+    }
+
+
+class FakeTelemetr:
+    """Заглушка с проверкой ключа, квотой запросов в минуту на ключ и задержкой ответа"""
+
+    def __init__(self, quota: Optional[int], latency: float, unknown_prefix: str, max_batch: int):
+        self.quota = quota
+        self.latency = latency
+        self.unknown_prefix = unknown_prefix
+        self.max_batch = max_batch
+        self._windows: Dict[str, List[float]] = {}
+        self.stats = {"requests": 0, "channels": 0, "max_batch_seen": 0, "unauthorized": 0, "throttled": 0}
+
+    def _retry_after(self, key: str) -> Optional[int]:
+        if not self.quota:
+            return None
+        now = time.monotonic()
+        window = self._windows[key] = [t for t in self._windows.get(key, []) if now - t < 60]
+        if len(window) >= self.quota:
+            return int(60 - (now - window[0])) + 1
+        window.append(now)
+        return None
+
+    async def audience(self, request: web.Request) -> web.Response:
+        self.stats["requests"] += 1
+        auth = request.headers.get("Authorization", "")
+        if not auth.startswith("Bearer ") or not auth[len("Bearer "):]:
+            self.stats["unauthorized"] += 1
+            return web.json_response({"error": "unauthorized"}, status=401)
+        retry_after = self._retry_after(auth)
+        if retry_after is not None:
+            self.stats["throttled"] += 1
+            return web.json_response({"error": "quota exceeded"}, status=429, headers={"Retry-After": str(retry_after)})
+
+        usernames = [u for u in request.query.get("usernames", "").split(",") if u]
+        if len(usernames) > self.max_batch:
+            return web.json_response({"error": f"не больше {self.max_batch} каналов за запрос"}, status=400)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.stats["channels"] += len(usernames)
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(usernames))
+        # Каналы, о которых «Telemetr не знает», в ответ не попадают
+        channels = {u: fake_audience(u.lower()) for u in usernames if not u.lower().startswith(self.unknown_prefix)}
+        return web.json_response({"channels": channels})
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+
+# Состояние заглушки в приложении aiohttp (для проверок в тестах)
+FAKE = web.AppKey("fake", FakeTelemetr)
+
+
+def make_app(quota: Optional[int] = None, latency: float = 0.0, unknown_prefix: str = "unknown",
+             max_batch: int = 50) -> web.Application:
+    fake = FakeTelemetr(quota, latency, unknown_prefix, max_batch)
+    app = web.Application()
+    app[FAKE] = fake
+    app.router.add_get("/v1/channels/audience", fake.audience)
+    app.router.add_get("/stats", fake.get_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная заглушка Telemetr API для разработки и проверки кэша")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--quota", type=int, default=None, help="запросов в минуту на ключ до ответа 429")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, сек")
+    parser.add_argument("--unknown-prefix", default="unknown", help="каналы с таким префиксом остаются без данных")
+    parser.add_argument("--max-batch", type=int, default=50, help="максимум каналов в одном запросе")
+    args = parser.parse_args()
+    web.run_app(make_app(args.quota, args.latency, args.unknown_prefix, args.max_batch), port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from aiohttp import web
+
+# === ЛОКАЛЬНАЯ ЗАГЛУШКА t.me/s ===
+# Отдаёт страницы каналов в разметке t.me и умеет изображать троттлинг и сбои:
+#   python fake_tme.py --rate 5 --error-rate 0.1
+#   TME_BASE_URL=http://127.0.0.1:8765/s streamlit run app.py
+PAGE_SIZE = 20
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def post_html(channel: str, post_id: int) -> str:
+    date = EPOCH + timedelta(hours=post_id * 7)
+    views = 1000 + (post_id * 7919) % 50000
+    return (
+        '<div class="tgme_widget_message_wrap">'
+        f'<div class="tgme_widget_message js-widget_message" data-post="{channel}/{post_id}">'
+        f'<div class="tgme_widget_message_text js-message_text">Пост {post_id} канала {channel}: '
+        f'<b>заметка</b> о разработке &amp; инструментах</div>'
+        '<div class="tgme_widget_message_footer">'
+        f'<span class="tgme_widget_message_views">{views / 1000:.1f}K</span>'
+        f'<a class="tgme_widget_message_date"><time datetime="{date.isoformat()}" class="time">'
+        f'{date:%H:%M}</time></a></div></div></div>'
+    )
+
+
+def page_ids(total: int, before: Optional[int]) -> List[int]:
+    top = min(total, (before or total + 1) - 1)
+    return [i for i in range(top - PAGE_SIZE + 1, top + 1) if i >= 1]
+
+
+class FakeTme:
+    """Заглушка с окном частоты запросов, случайными 503 и задержкой ответа"""
+
+    def __init__(self, posts: int, rate: Optional[float], error_rate: float, latency: float, retry_after: int):
+        self.posts = posts
+        self.rate = rate
+        self.error_rate = error_rate
+        self.latency = latency
+        self.retry_after = retry_after
+        self._window: List[float] = []
+        self.stats = {"requests": 0, "ok": 0, "not_modified": 0, "throttled": 0, "errors": 0}
+
+    def _throttled(self) -> bool:
+        if not self.rate:
+            return False
+        now = time.monotonic()
+        self._window = [t for t in self._window if now - t < 1]
+        if len(self._window) >= self.rate:
+            return True
+        self._window.append(now)
+        return False
+
+    async def channel(self, request: web.Request) -> web.Response:
+        self.stats["requests"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._throttled():
+            self.stats["throttled"] += 1
+            return web.Response(status=429, headers={"Retry-After": str(self.retry_after)})
+        if random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=503)
+
+        channel = request.match_info["channel"]
+        before = request.query.get("before")
+        ids = page_ids(self.posts, int(before) if before else None)
+        body = f"<html><body><section>{''.join(post_html(channel, i) for i in ids)}</section></body></html>"
+        etag = '"' + hashlib.md5(body.encode("utf-8")).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.stats["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        self.stats["ok"] += 1
+        return web.Response(text=body, content_type="text/html", headers={"ETag": etag})
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+
+# Состояние заглушки в приложении aiohttp (для проверок в тестах)
+FAKE = web.AppKey("fake", FakeTme)
+
+
+def make_app(posts: int = 1000, rate: Optional[float] = None, error_rate: float = 0.0,
+             latency: float = 0.0, retry_after: int = 1) -> web.Application:
+    fake = FakeTme(posts, rate, error_rate, latency, retry_after)
+    app = web.Application()
+    app[FAKE] = fake
+    app.router.add_get("/s/{channel}", fake.channel)
+    app.router.add_get("/stats", fake.get_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная заглушка t.me/s для разработки и нагрузочных проверок")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--posts", type=int, default=1000, help="число постов в каждом канале")
+    parser.add_argument("--rate", type=float, default=None, help="запросов в секунду до ответа 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="значение Retry-After для 429, сек")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля случайных ответов 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, сек")
+    args = parser.parse_args()
+    web.run_app(make_app(args.posts, args.rate, args.error_rate, args.latency, args.retry_after), port=args.port)
+
+
+if __name__ == "__main__":
+    main()
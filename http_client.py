@@ -0,0 +1,91 @@
+import asyncio
+import os
+import threading
+from typing import Optional
+
+import aiohttp
+
+# === НАСТРОЙКИ HTTP-КЛИЕНТА ===
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "10"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "30"))
+HTTP_TIMEOUT_TOTAL = float(os.getenv("HTTP_TIMEOUT_TOTAL", "15"))
+HTTP_TIMEOUT_CONNECT = float(os.getenv("HTTP_TIMEOUT_CONNECT", "5"))
+HTTP_TIMEOUT_READ = float(os.getenv("HTTP_TIMEOUT_READ", "10"))
+
+
+def default_timeout() -> aiohttp.ClientTimeout:
+    """Политика таймаутов по умолчанию"""
+    return aiohttp.ClientTimeout(
+        total=HTTP_TIMEOUT_TOTAL,
+        connect=HTTP_TIMEOUT_CONNECT,
+        sock_read=HTTP_TIMEOUT_READ,
+    )
+
+
+class HttpClient:
+    """
+    Общий для процесса HTTP-клиент: пул соединений с keep-alive и лимитом на хост.
+    Сессия aiohttp привязана к event loop, поэтому при смене loop она пересоздаётся.
+    """
+
+    def __init__(
+        self,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_LIMIT_PER_HOST,
+        keepalive_timeout: float = HTTP_KEEPALIVE,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout or default_timeout()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def session(self) -> aiohttp.ClientSession:
+        """Сессия для текущего event loop (создаётся при первом обращении)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._session is None or self._session.closed or self._loop is not loop:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=300,
+                )
+                self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+                self._loop = loop
+            return self._session
+
+    async def close(self):
+        """Закрытие сессии и всех соединений пула"""
+        with self._lock:
+            session, self._session, self._loop = self._session, None, None
+        if session is not None and not session.closed:
+            await session.close()
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Общий HTTP-клиент процесса"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Сессия общего клиента для текущего event loop"""
+    return get_http_client().session()
+
+
+async def close_http_client():
+    """Корректное завершение общего клиента"""
+    if _client is not None:
+        await _client.close()
@@ -0,0 +1,57 @@
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from scraper import PageColumns, parse_page_columns
+
+# === НАСТРОЙКИ ПУЛА РАЗБОРА ===
+# 0 — разбор в потоке event loop без пула процессов
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+class ParsePool:
+    """
+    Пул процессов для CPU-ёмкого разбора страниц t.me.
+    Загрузка остаётся в asyncio, а разбор уходит в ProcessPoolExecutor,
+    так что сеть и CPU работают параллельно на нескольких ядрах.
+    """
+
+    def __init__(self, workers: int = PARSE_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if workers > 0:
+            # spawn: процесс Streamlit многопоточный, fork в нём небезопасен
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    async def parse(self, raw: bytes) -> PageColumns:
+        """Разбор сырой страницы в колонки постов (записи-словари в родительском процессе не строятся)"""
+        if self._executor is None:
+            return parse_page_columns(raw)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, parse_page_columns, raw)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_pool: Optional[ParsePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> ParsePool:
+    """Общий для процесса пул разбора"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ParsePool()
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Sequence
+
+from engine import (
+    AI_STREAM_TIMEOUT,
+    ai_enabled,
+    ai_inputs_key,
+    fetch_ai_history,
+    fetch_audience,
+    fetch_channel_data,
+    get_analysis,
+    get_cached_ai_recommendations,
+    get_metrics,
+    result_store,
+    stream_ai_recommendations,
+)
+
+
+class StageEvent:
+    """Итог одной стадии: значение или ошибка и время от старта конвейера"""
+
+    __slots__ = ("name", "value", "error", "elapsed")
+
+    def __init__(self, name: str, value: Any, error: Optional[BaseException], elapsed: float):
+        self.name = name
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+
+class StageGraph:
+    """
+    Граф стадий: каждая стадия — корутина от результатов своих зависимостей.
+    Все стадии запускаются сразу и ждут только свои входы, поэтому независимые ветки
+    идут параллельно. run() отдаёт события в порядке завершения стадий;
+    ошибка зависимости передаётся зависящим стадиям.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, tuple] = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable], deps: Sequence[str] = ()) -> "StageGraph":
+        """Стадия name = func(*результаты deps); зависимости должны быть добавлены раньше"""
+        missing = [d for d in deps if d not in self._stages]
+        if missing:
+            raise ValueError(f"стадия {name}: неизвестные зависимости {missing}")
+        self._stages[name] = (func, tuple(deps))
+        return self
+
+    async def run(self) -> AsyncIterator[StageEvent]:
+        started = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+        done: asyncio.Queue = asyncio.Queue()
+
+        async def run_stage(func, deps):
+            args = [await tasks[d] for d in deps]
+            return await func(*args)
+
+        for name, (func, deps) in self._stages.items():
+            tasks[name] = asyncio.ensure_future(run_stage(func, deps))
+            tasks[name].add_done_callback(lambda t, n=name: done.put_nowait((n, time.perf_counter() - started)))
+
+        try:
+            for _ in range(len(tasks)):
+                name, elapsed = await done.get()
+                task = tasks[name]
+                if task.cancelled():
+                    yield StageEvent(name, None, asyncio.CancelledError(), elapsed)
+                elif task.exception() is not None:
+                    yield StageEvent(name, None, task.exception(), elapsed)
+                else:
+                    yield StageEvent(name, task.result(), None, elapsed)
+        finally:
+            # Читатель остановился раньше — незавершённые стадии больше не нужны
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+
+# === КОНВЕЙЕР ОТЧЁТА ===
+AI_TIMEOUT_MESSAGE = "⏳ Groq отвечает слишком долго. Повторите анализ через минуту — ответ будет взят из кэша."
+
+
+async def _ai_stage(channel_name: str, posts, audience_data: Dict, history) -> Dict:
+    """
+    Готовый ответ ({text, cached_at, key}) из хранилища результатов или кэша LLM,
+    иначе начатый поток ({first, stream, key}): запрос к Groq идёт, пока интерфейс рисует остальные секции.
+    key — ключ ответа по постам, аудитории и истории (ai_cache_key)
+    """
+    key = ai_inputs_key(channel_name, posts, audience_data, history)
+    cached = result_store.get(("ai", key))
+    if cached is not None:
+        return cached
+    cached_ai = get_cached_ai_recommendations(channel_name, posts, audience_data, history)
+    if cached_ai is not None:
+        return {"text": cached_ai["response"], "cached_at": cached_ai["created_at"], "key": key}
+
+    stream = stream_ai_recommendations(channel_name, posts, audience_data, history)
+    try:
+        first = await asyncio.wait_for(stream.__anext__(), AI_STREAM_TIMEOUT)
+    except StopAsyncIteration:
+        first = ""
+    except asyncio.TimeoutError:
+        # Запрос к Groq продолжается в общем потоке и попадёт в кэш LLM, но эта стадия его больше не ждёт
+        return {"text": AI_TIMEOUT_MESSAGE, "cached_at": None, "key": key, "complete": False}
+    return {"first": first, "stream": stream, "key": key}
+
+
+def analysis_pipeline(channel_name: str, limit: int = 15, with_ai: bool = True) -> StageGraph:
+    """
+    Стадии отчёта по каналу:
+    посты и аудитория параллельно; посты → метрики постов (первые секции рисуются, не дожидаясь Telemetr);
+    метрики и аудитория → полный анализ; посты → история → ИИ (вместе с аудиторией)
+    """
+    async def audience():
+        return await fetch_audience(channel_name)
+
+    async def posts():
+        return await fetch_channel_data(channel_name, limit=limit)
+
+    # Расчёты (чтения SQLite, numpy, запросы к индексу тем) идут в потоках, а не в общем event loop:
+    # иначе они останавливали бы загрузку, Telemetr и поток Groq, которые должны идти параллельно
+    async def metrics(posts_value):
+        return await asyncio.to_thread(get_metrics, channel_name, posts_value)
+
+    async def analysis(posts_value, audience_value, metrics_value):
+        return await asyncio.to_thread(get_analysis, channel_name, posts_value, audience_data=audience_value)
+
+    async def history(posts_value):
+        # История догружается после свежих постов, чтобы не обходить первую страницу канала дважды
+        return await fetch_ai_history(channel_name) if ai_enabled() else None
+
+    async def ai(posts_value, audience_value, history_value):
+        return await _ai_stage(channel_name, posts_value, audience_value, history_value)
+
+    graph = (
+        StageGraph()
+        .add("audience", audience)
+        .add("posts", posts)
+        .add("metrics", metrics, deps=("posts",))
+        # Зависимость от метрик гарантирует, что полный анализ приходит после них
+        .add("analysis", analysis, deps=("posts", "audience", "metrics"))
+    )
+    if with_ai:
+        graph.add("history", history, deps=("posts",)).add("ai", ai, deps=("posts", "audience", "history"))
+    return graph
@@ -0,0 +1,179 @@
+import hashlib
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from scraper import MOSCOW_TZ, text_preview
+
+
+def moscow_hours(timestamps: np.ndarray) -> np.ndarray:
+    """Час публикации по Москве (UTC+3 без перехода на летнее время с 2014 года)"""
+    return ((np.asarray(timestamps, dtype=np.int64) + 3 * 3600) // 3600) % 24
+
+
+def moscow_weekdays(timestamps: np.ndarray) -> np.ndarray:
+    """День недели по Москве (0 — понедельник)"""
+    # 1970-01-01 был четвергом
+    return ((np.asarray(timestamps, dtype=np.int64) + 3 * 3600) // 86400 + 3) % 7
+
+
+class PostBatch:
+    """
+    Компактное колоночное представление постов канала в хронологическом порядке:
+    int64 id, int64 epoch-секунды, int64 просмотры и тексты в одном общем буфере со смещениями.
+    Срезы (batch[a:b]) не копируют данные — это представления тех же массивов и буфера.
+    DataFrame строится только по запросу (to_frame) для отрисовки.
+    """
+
+    __slots__ = ("post_ids", "timestamps", "views", "_text", "_offsets")
+
+    def __init__(self, post_ids: np.ndarray, timestamps: np.ndarray, views: np.ndarray,
+                 text: str, offsets: np.ndarray):
+        self.post_ids = post_ids
+        self.timestamps = timestamps
+        self.views = views
+        self._text = text
+        self._offsets = offsets
+
+    # === ПОСТРОЕНИЕ ===
+    @classmethod
+    def empty(cls) -> "PostBatch":
+        return cls.from_columns([], [], [], [])
+
+    @classmethod
+    def from_columns(cls, post_ids: Sequence[int], timestamps: Sequence[int],
+                     views: Sequence[int], texts: Sequence[str]) -> "PostBatch":
+        """Пачка из колонок; тексты склеиваются в один буфер"""
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(
+            np.asarray(post_ids, dtype=np.int64),
+            np.asarray(timestamps, dtype=np.int64),
+            np.asarray(views, dtype=np.int64),
+            "".join(texts),
+            offsets,
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "PostBatch":
+        """Пачка из записей парсера (post_id, date, views, text)"""
+        records = [r for r in records if r.get("post_id") is not None]
+        return cls.from_columns(
+            [r["post_id"] for r in records],
+            [int(r["date"].timestamp()) for r in records],
+            [r["views"] for r in records],
+            [r.get("text") or "" for r in records],
+        )
+
+    @classmethod
+    def concat(cls, batches: Sequence["PostBatch"]) -> "PostBatch":
+        """Склейка пачек в указанном порядке"""
+        batches = [b for b in batches if len(b)]
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+        return cls.from_columns(
+            np.concatenate([b.post_ids for b in batches]),
+            np.concatenate([b.timestamps for b in batches]),
+            np.concatenate([b.views for b in batches]),
+            [t for b in batches for t in b.texts()],
+        )
+
+    # === ДОСТУП ===
+    def __len__(self) -> int:
+        return len(self.post_ids)
+
+    def __getitem__(self, key: slice) -> "PostBatch":
+        if not isinstance(key, slice):
+            raise TypeError("PostBatch поддерживает только срезы; для одного поста используйте text_at()")
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError("PostBatch поддерживает только срезы с шагом 1")
+        stop = max(start, stop)
+        return PostBatch(
+            self.post_ids[start:stop],
+            self.timestamps[start:stop],
+            self.views[start:stop],
+            self._text,
+            self._offsets[start:stop + 1],
+        )
+
+    def text_at(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        return self._text[self._offsets[i]:self._offsets[i + 1]]
+
+    def texts(self) -> List[str]:
+        return [self.text_at(i) for i in range(len(self))]
+
+    @property
+    def hours(self) -> np.ndarray:
+        return moscow_hours(self.timestamps)
+
+    @property
+    def weekdays(self) -> np.ndarray:
+        return moscow_weekdays(self.timestamps)
+
+    @property
+    def nbytes(self) -> int:
+        """Объём данных пачки (буфер текста считается целиком, даже для среза)"""
+        return (self.post_ids.nbytes + self.timestamps.nbytes + self.views.nbytes
+                + self._offsets.nbytes + len(self._text.encode("utf-8")))
+
+    def fingerprint(self) -> str:
+        """Версия данных: хэш id, дат, просмотров и текстов (меняется при любом обновлении)"""
+        digest = hashlib.sha1()
+        for column in (self.post_ids, self.timestamps, self.views, self._offsets - self._offsets[0]):
+            digest.update(np.ascontiguousarray(column).tobytes())
+        digest.update(self._text[self._offsets[0]:self._offsets[-1]].encode("utf-8"))
+        return digest.hexdigest()
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame для отрисовки (строится заново при каждом вызове); превью — как у парсера (build_record)"""
+        return pd.DataFrame({
+            "post_id": self.post_ids,
+            "date": pd.to_datetime(self.timestamps, unit="s", utc=True).tz_convert(MOSCOW_TZ),
+            "views": self.views,
+            "text_preview": [text_preview(t) for t in self.texts()],
+        })
+
+
+PostsLike = Union[pd.DataFrame, PostBatch]
+
+
+def views_of(posts: PostsLike) -> np.ndarray:
+    """Просмотры постов для DataFrame или PostBatch"""
+    if isinstance(posts, PostBatch):
+        return posts.views
+    return posts['views'].values
+
+
+def post_ids_of(posts: PostsLike) -> np.ndarray:
+    """id постов"""
+    if isinstance(posts, PostBatch):
+        return posts.post_ids
+    return posts['post_id'].values
+
+
+def timestamps_of(posts: PostsLike) -> np.ndarray:
+    """Время публикации постов в epoch-секундах"""
+    if isinstance(posts, PostBatch):
+        return posts.timestamps
+    return posts['date'].astype("int64").values // 10**9
+
+
+def hours_of(posts: PostsLike) -> Optional[np.ndarray]:
+    """Часы публикации (для DataFrame — только если колонка hour уже посчитана)"""
+    if isinstance(posts, PostBatch):
+        return posts.hours
+    return posts['hour'].values if 'hour' in posts.columns else None
+
+
+def first_text_of(posts: PostsLike) -> str:
+    """Текст первого поста"""
+    if isinstance(posts, PostBatch):
+        return posts.text_at(0)
+    return str(posts.iloc[0]['text_preview'])
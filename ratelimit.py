@@ -0,0 +1,321 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+# === ЛИМИТЫ GROQ ===
+# Значения по умолчанию — бесплатный тариф для llama-3.1-8b-instant
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "6000"))
+
+# === ПОЛИТИКА ЗАПРОСОВ К ХОСТАМ ===
+HTTP_RETRY_ATTEMPTS = int(os.getenv("HTTP_RETRY_ATTEMPTS", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_CAP = float(os.getenv("HTTP_BACKOFF_CAP", "8"))
+# Retry-After длиннее этого не ждём внутри запроса — сразу отдаём ошибку с подсказкой
+HTTP_RETRY_AFTER_MAX = float(os.getenv("HTTP_RETRY_AFTER_MAX", "30"))
+AIMD_INITIAL = float(os.getenv("HTTP_AIMD_INITIAL", "4"))
+AIMD_MAX = float(os.getenv("HTTP_AIMD_MAX", os.getenv("HTTP_LIMIT_PER_HOST", "10")))
+BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("HTTP_BREAKER_RESET", "30"))
+
+
+class TokenBucket:
+    """
+    Асинхронное ведро токенов: ёмкость capacity, пополнение rate токенов в секунду.
+    acquire(n) ждёт, пока в ведре накопится n токенов; ожидающие обслуживаются по очереди.
+    Запрос больше ёмкости ждёт полного ведра и уводит его в минус, чтобы не блокироваться навсегда.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Lock привязан к event loop, поэтому пересоздаётся при смене loop
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def acquire(self, tokens: float = 1):
+        async with self._get_lock():
+            needed = min(tokens, self.capacity)
+            while True:
+                self._refill()
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                delay = (needed - self._tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class GroqLimiter:
+    """Совместное ограничение запросов в минуту и токенов в минуту для Groq API"""
+
+    def __init__(self, rpm: float = GROQ_RPM, tpm: float = GROQ_TPM):
+        self.requests = TokenBucket(rpm / 60, capacity=rpm)
+        self.tokens = TokenBucket(tpm / 60, capacity=tpm)
+
+    async def acquire(self, tokens: int):
+        """Ожидание права на запрос с оценкой tokens (промпт + max_tokens)"""
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def stats(self) -> Dict:
+        return {
+            "requests_available": self.requests.available,
+            "tokens_available": self.tokens.available,
+            "waited_seconds": self.requests.waited + self.tokens.waited,
+        }
+
+
+_groq_limiter: Optional[GroqLimiter] = None
+
+
+def get_groq_limiter() -> GroqLimiter:
+    """Общий для процесса ограничитель запросов к Groq"""
+    global _groq_limiter
+    if _groq_limiter is None:
+        _groq_limiter = GroqLimiter()
+    return _groq_limiter
+
+
+_quota_limiters: Dict[str, TokenBucket] = {}
+_quota_limiters_lock = threading.Lock()
+
+
+def get_quota_limiter(key: str, per_minute: float, burst: Optional[float] = None) -> TokenBucket:
+    """Общая для процесса квота запросов на один API-ключ (per_minute запросов в минуту)"""
+    with _quota_limiters_lock:
+        limiter = _quota_limiters.get(key)
+        if limiter is None:
+            limiter = _quota_limiters[key] = TokenBucket(per_minute / 60, capacity=burst or per_minute)
+        return limiter
+
+
+# === АДАПТИВНЫЕ ЛИМИТЫ ДЛЯ ХОСТОВ ===
+def backoff_delay(attempt: int, base: float = HTTP_BACKOFF_BASE, cap: float = HTTP_BACKOFF_CAP) -> float:
+    """Экспоненциальная задержка с полным разбросом (attempt считается с 0)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах: число секунд или HTTP-дата"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitOpenError(Exception):
+    """Предохранитель хоста разомкнут: запросы временно не выполняются"""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"{host}: слишком много ошибок подряд, повтор через {retry_after:.0f} сек")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: после failures ошибок подряд размыкается на reset_timeout секунд,
+    затем пропускает один пробный запрос (half-open) и по его итогу замыкается или снова размыкается.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.opens = 0
+
+    def before_request(self, host: str) -> bool:
+        """Разрешение на запрос; True — запрос пробный, и после него нужен вердикт или release()"""
+        if self.state == "open":
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(host, remaining)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                raise CircuitOpenError(host, self.reset_timeout)
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release(self):
+        """Пробный запрос завершился без вердикта (429, отмена) — можно пустить следующий"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self._consecutive = 0
+        self._probe_in_flight = False
+        self.state = "closed"
+
+    def record_failure(self):
+        self._consecutive += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self._consecutive >= self.failures:
+            if self.state != "open":
+                self.opens += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class HostPolicy:
+    """
+    Политика запросов к одному хосту:
+    • AIMD-лимит параллельных запросов: +1/limit за успешный ответ, ×0.5 при 429 и ошибках сервера;
+    • общая пауза по Retry-After для всех запросов к хосту;
+    • предохранитель (CircuitBreaker) от серии ошибок;
+    • счётчики для наблюдения за троттлингом.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        initial: float = AIMD_INITIAL,
+        maximum: float = AIMD_MAX,
+        minimum: float = 1,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.host = host
+        self.limit = min(initial, maximum)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.breaker = breaker or CircuitBreaker()
+        self.in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._changed: Optional[asyncio.Condition] = None
+        self._changed_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.metrics = {
+            "requests": 0, "successes": 0, "throttled": 0, "server_errors": 0, "network_errors": 0,
+            "retries": 0, "rejected": 0, "decreases": 0, "paused_seconds": 0.0, "queued_seconds": 0.0,
+        }
+
+    def _condition(self) -> asyncio.Condition:
+        # Condition привязан к event loop, поэтому пересоздаётся при смене loop
+        loop = asyncio.get_running_loop()
+        if self._changed is None or self._changed_loop is not loop:
+            self._changed = asyncio.Condition()
+            self._changed_loop = loop
+        return self._changed
+
+    @asynccontextmanager
+    async def slot(self):
+        """Место для одного запроса: предохранитель, пауза Retry-After и AIMD-лимит"""
+        try:
+            probe = self.breaker.before_request(self.host)
+        except CircuitOpenError:
+            self.metrics["rejected"] += 1
+            raise
+
+        changed = self._condition()
+        acquired = False
+        # Пробный запрос может быть отменён ещё в ожидании (crawl_channel отменяет предзагрузку,
+        # StageGraph — незавершённые стадии): без release() предохранитель остался бы полуоткрытым навсегда
+        try:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                self.metrics["paused_seconds"] += pause
+                await asyncio.sleep(pause)
+
+            queued = time.monotonic()
+            async with changed:
+                await changed.wait_for(lambda: self.in_flight < int(self.limit))
+                self.in_flight += 1
+                acquired = True
+            self.metrics["queued_seconds"] += time.monotonic() - queued
+            self.metrics["requests"] += 1
+            yield
+        finally:
+            if probe:
+                self.breaker.release()
+            if acquired:
+                async with changed:
+                    self.in_flight -= 1
+                    changed.notify_all()
+
+    def record_success(self):
+        self.metrics["successes"] += 1
+        self.breaker.record_success()
+        # Аддитивный рост: примерно +1 за каждое «окно» из limit успешных запросов
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def record_throttle(self, retry_after: Optional[float] = None):
+        self.metrics["throttled"] += 1
+        self._decrease()
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def record_failure(self, kind: str = "server_errors"):
+        self.metrics[kind] += 1
+        self.breaker.record_failure()
+        self._decrease()
+
+    def _decrease(self):
+        # Мультипликативное уменьшение не чаще раза в секунду: одна волна ошибок — одно снижение
+        now = time.monotonic()
+        if now - self._last_decrease >= 1:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = now
+            self.metrics["decreases"] += 1
+
+    def stats(self) -> Dict:
+        return {
+            **self.metrics,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "circuit": self.breaker.state,
+            "circuit_opens": self.breaker.opens,
+            "paused_for": max(0.0, self._paused_until - time.monotonic()),
+        }
+
+
+_host_policies: Dict[str, HostPolicy] = {}
+_host_policies_lock = threading.Lock()
+
+
+def get_host_policy(host: str) -> HostPolicy:
+    """Общая для процесса политика запросов к хосту"""
+    with _host_policies_lock:
+        policy = _host_policies.get(host)
+        if policy is None:
+            policy = _host_policies[host] = HostPolicy(host)
+        return policy
+
+
+def host_metrics() -> Dict[str, Dict]:
+    """Метрики всех хостов: лимит, троттлинг, повторы, состояние предохранителя"""
+    with _host_policies_lock:
+        return {host: policy.stats() for host, policy in _host_policies.items()}
@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import scraper
+from engine import normalize_channel_name
+from http_client import close_http_client, get_session
+from parse_pool import get_parse_pool
+from ratelimit import host_metrics
+from scraper import DEFAULT_MAX_POSTS, MOSCOW_TZ
+from storage import PostStore, get_store, refresh_channel
+
+logger = logging.getLogger("channelpulse.scheduler")
+
+# === НАСТРОЙКИ ПЛАНИРОВЩИКА ===
+REFRESH_INTERVAL = int(os.getenv("SCHEDULER_REFRESH_INTERVAL", "3600"))
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "4"))
+# Вежливость к одному хосту: не больше N обновлений одновременно и пауза между их стартами
+HOST_CONCURRENCY = int(os.getenv("SCHEDULER_HOST_CONCURRENCY", "2"))
+HOST_MIN_INTERVAL = float(os.getenv("SCHEDULER_HOST_MIN_INTERVAL", "2"))
+# Случайный разброс времени следующего запуска (доля интервала), чтобы каналы не совпадали по фазе
+JITTER = float(os.getenv("SCHEDULER_JITTER", "0.1"))
+RETRY_DELAY = int(os.getenv("SCHEDULER_RETRY_DELAY", "900"))
+POLL_INTERVAL = float(os.getenv("SCHEDULER_POLL_INTERVAL", "30"))
+
+
+def with_jitter(delay: float, jitter: float = JITTER) -> float:
+    return delay * (1 + random.uniform(-jitter, jitter))
+
+
+class HostPoliteness:
+    """
+    Ограничение параллельных обновлений и частоты их старта для каждого хоста.
+    Часы и ожидание подменяются в тестах.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = HOST_CONCURRENCY,
+        min_interval: float = HOST_MIN_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+    ):
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.clock = clock
+        self.sleep = sleep
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last_start: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.concurrency))
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with semaphore:
+            async with lock:
+                last_start = self._last_start.get(host)
+                wait = 0 if last_start is None else last_start + self.min_interval - self.clock()
+                if wait > 0:
+                    await self.sleep(wait)
+                self._last_start[host] = self.clock()
+            yield
+
+
+class Scheduler:
+    """
+    Фоновое обновление отслеживаемых каналов в локальное хранилище.
+    Каждый канал обновляется по своему интервалу (с разбросом), одновременно — не больше
+    concurrency каналов и не больше HOST_CONCURRENCY на один хост.
+    Работает отдельным процессом: интерфейс читает уже собранные данные из того же SQLite.
+    Расписание считается по часам clock (time.time; в тестах — подменные).
+    """
+
+    def __init__(
+        self,
+        store: PostStore,
+        concurrency: int = SCHEDULER_CONCURRENCY,
+        politeness: Optional[HostPoliteness] = None,
+        parse_pool=None,
+        clock: Callable[[], float] = time.time,
+        jitter: float = JITTER,
+    ):
+        self.store = store
+        self.parse_pool = parse_pool
+        self.clock = clock
+        self.jitter = jitter
+        self.politeness = politeness or HostPoliteness()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._running: Dict[str, asyncio.Task] = {}
+        self.stats = {"refreshed": 0, "failed": 0, "new_posts": 0, "backfilled": 0}
+
+    @staticmethod
+    def host() -> str:
+        # Все каналы живут на одном хосте t.me (или на локальной заглушке)
+        return urlparse(scraper.TME_BASE_URL).netloc
+
+    async def refresh(self, tracked: Dict):
+        channel = tracked["channel"]
+        async with self._semaphore, self.politeness.slot(self.host()):
+            started = time.monotonic()
+            try:
+                result = await refresh_channel(self.store, get_session(), channel,
+                                                  max_posts=tracked["max_posts"], parse_pool=self.parse_pool)
+            except Exception as e:
+                self.stats["failed"] += 1
+                next_run_at = self.clock() + with_jitter(min(RETRY_DELAY, tracked["interval"]), self.jitter)
+                self.store.mark_refreshed(channel, next_run_at, error=str(e)[:200] or type(e).__name__)
+                logger.warning("@%s: ошибка обновления: %s", channel, e)
+                return
+
+        self.stats["refreshed"] += 1
+        self.stats["new_posts"] += result["new_posts"]
+        self.stats["backfilled"] += result["backfilled"]
+        self.store.mark_refreshed(channel, self.clock() + with_jitter(tracked["interval"], self.jitter))
+        logger.info("@%s: обновлён за %.1f сек, новых постов: %d, догружено старых: %d",
+                    channel, time.monotonic() - started, result["new_posts"], result["backfilled"])
+
+    def run_due(self) -> int:
+        """Запуск обновления всех каналов, которым пора; возвращает число запущенных"""
+        started = 0
+        for tracked in self.store.due_channels(self.clock()):
+            channel = tracked["channel"]
+            if channel in self._running:
+                continue
+            task = asyncio.ensure_future(self.refresh(tracked))
+            self._running[channel] = task
+            task.add_done_callback(lambda t, c=channel: self._running.pop(c, None))
+            started += 1
+        return started
+
+    async def run_once(self):
+        """Одно обновление всех просроченных каналов с ожиданием завершения"""
+        self.run_due()
+        if self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    async def run_forever(self, stop: Optional[asyncio.Event] = None):
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            self.run_due()
+            # Спим до ближайшего запуска, но не дольше POLL_INTERVAL (список каналов мог измениться)
+            upcoming = [t["next_run_at"] for t in self.store.tracked_channels() if t["channel"] not in self._running]
+            delay = min([POLL_INTERVAL] + [max(0.0, at - self.clock()) for at in upcoming])
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=max(delay, 0.5))
+            except asyncio.TimeoutError:
+                pass
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+
+def _format_ts(ts: Optional[float]) -> str:
+    return datetime.fromtimestamp(ts, MOSCOW_TZ).strftime("%d.%m.%Y %H:%M") if ts else "—"
+
+
+async def _run(once: bool):
+    scheduler = Scheduler(get_store(), parse_pool=get_parse_pool())
+    try:
+        if once:
+            await scheduler.run_once()
+        else:
+            await scheduler.run_forever()
+    finally:
+        await close_http_client()
+    logger.info("Итого: обновлено %(refreshed)d, ошибок %(failed)d, новых постов %(new_posts)d, "
+                "догружено старых %(backfilled)d", scheduler.stats)
+    for host, metrics in host_metrics().items():
+        logger.info("%s: %s", host, metrics)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фоновое обновление отслеживаемых Telegram-каналов")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="отслеживать каналы")
+    add.add_argument("channels", nargs="+")
+    add.add_argument("--interval", type=int, default=REFRESH_INTERVAL, help="интервал обновления, сек")
+    add.add_argument("--max-posts", type=int, default=DEFAULT_MAX_POSTS, help="сколько постов истории хранить")
+    remove = commands.add_parser("remove", help="перестать отслеживать каналы")
+    remove.add_argument("channels", nargs="+")
+    commands.add_parser("list", help="список отслеживаемых каналов")
+    run = commands.add_parser("run", help="запустить планировщик")
+    run.add_argument("--once", action="store_true", help="обновить просроченные каналы и выйти")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    store = get_store()
+
+    if args.command == "add":
+        for channel in filter(None, map(normalize_channel_name, args.channels)):
+            # Первый запуск тоже с разбросом, чтобы новые каналы не обновлялись одной пачкой
+            store.track_channel(channel, args.interval, args.max_posts,
+                                next_run_at=time.time() + random.uniform(0, JITTER * args.interval))
+            print(f"✅ @{channel}: каждые {args.interval} сек, до {args.max_posts} постов")
+    elif args.command == "remove":
+        for channel in filter(None, map(normalize_channel_name, args.channels)):
+            print(f"{'🗑️' if store.untrack_channel(channel) else '⚠️ не найден:'} @{channel}")
+    elif args.command == "list":
+        for tracked in store.tracked_channels():
+            print(f"@{tracked['channel']}: каждые {tracked['interval']} сек • "
+                  f"обновлён {_format_ts(tracked['last_success_at'])} • "
+                  f"следующий запуск {_format_ts(tracked['next_run_at'])}"
+                  + (f" • ошибка: {tracked['last_error']}" if tracked["last_error"] else ""))
+    else:
+        try:
+            asyncio.run(_run(args.once))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            get_parse_pool().shutdown()
+
+
+if __name__ == "__main__":
+    main()
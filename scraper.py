@@ -0,0 +1,543 @@
+import asyncio
+import html as html_lib
+import os
+import re
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+import numpy as np
+import pandas as pd
+import pytz
+from bs4 import BeautifulSoup
+
+from ratelimit import (
+    HTTP_RETRY_AFTER_MAX,
+    HTTP_RETRY_ATTEMPTS,
+    CircuitOpenError,
+    backoff_delay,
+    get_host_policy,
+    parse_retry_after,
+)
+
+# === НАСТРОЙКИ СКРАПЕРА ===
+# Можно направить на локальную заглушку (см. fake_tme.py)
+TME_BASE_URL = os.getenv("TME_BASE_URL", "https://t.me/s")
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+MOSCOW_TZ = pytz.timezone('Europe/Moscow')
+
+# Бюджет по умолчанию для глубокого обхода истории
+DEFAULT_MAX_POSTS = 500
+DEFAULT_MAX_PAGES = 100
+
+
+class ChannelFetchError(Exception):
+    """Ошибка загрузки страницы канала"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class RateLimitedError(ChannelFetchError):
+    """t.me ограничил частоту запросов (429), повторы не помогли"""
+
+
+class UpstreamUnavailableError(ChannelFetchError):
+    """t.me недоступен: ошибки сервера или сети после повторов, либо разомкнут предохранитель"""
+
+
+# === ПАРСИНГ ===
+# Правила разбора просмотров:
+#  • "нравится"/"like" и строки без числа → 0
+#  • суффикс K/к/тыс → ×1 000, M/м/млн → ×1 000 000; перед суффиксом "." и "," — десятичный разделитель
+#  • без суффикса пробелы, "." и "," считаются разделителями разрядов ("1 234" → 1234)
+#  • результат округляется до целого (1.15K → 1150)
+_VIEWS_RE = re.compile(r'(?P<num>\d(?:[\d .,]*\d)?)\s*(?P<suffix>тыс|млн|k|к|m|м)?')
+_VIEWS_MULTIPLIERS = {"тыс": 1_000, "k": 1_000, "к": 1_000, "млн": 1_000_000, "m": 1_000_000, "м": 1_000_000}
+_LIKE_RE = re.compile(r'нравится|like')
+
+
+def _normalize_views(views_str: str) -> str:
+    return views_str.replace('\xa0', ' ').strip().lower()
+
+
+def parse_views(views_str: str) -> int:
+    """Конвертация просмотров из строки в число (не строка → 0)"""
+    if not isinstance(views_str, str):
+        return 0
+    views_str = _normalize_views(views_str)
+
+    # Обработка случая "нравится" или других нечисловых значений
+    if _LIKE_RE.search(views_str):
+        return 0
+
+    match = _VIEWS_RE.search(views_str)
+    if not match:
+        return 0
+
+    num, suffix = match.group('num'), match.group('suffix')
+    if suffix:
+        try:
+            return int(round(float(num.replace(' ', '').replace(',', '.')) * _VIEWS_MULTIPLIERS[suffix]))
+        except ValueError:
+            return 0
+    return int(re.sub(r'\D', '', num))
+
+
+def parse_views_batch(values) -> np.ndarray:
+    """
+    Векторная версия parse_views для целой колонки (Series, массив или список строк) → int64.
+    Правила те же, что у parse_views; нестроковые значения дают 0.
+    Строки просмотров t.me сильно повторяются ("1.2K", "12.3K"), поэтому разбираются
+    только уникальные значения, а результат раскладывается обратно по кодам.
+    """
+    raw = pd.Series(values, dtype=object)
+    try:
+        codes, uniques = pd.factorize(raw, use_na_sentinel=True)
+    except TypeError:
+        # Нехэшируемые значения (списки, словари) — тоже не строки: заменяем пропуском
+        codes, uniques = pd.factorize(raw.where(raw.map(lambda v: isinstance(v, str)), None), use_na_sentinel=True)
+    if len(codes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    parsed = np.append(_parse_views_unique(pd.Series(uniques, dtype=object)), 0)
+    # Код -1 (пропуск) указывает на добавленный в конец ноль
+    return parsed[codes]
+
+
+def _parse_views_unique(raw: pd.Series) -> np.ndarray:
+    text = raw.where(raw.map(lambda v: isinstance(v, str)), '')
+    text = text.astype(str).str.replace('\xa0', ' ', regex=False).str.strip().str.lower()
+
+    parts = text.str.extract(_VIEWS_RE.pattern)
+    num = parts['num']
+    suffix = parts['suffix']
+
+    multiplier = suffix.map(_VIEWS_MULTIPLIERS).to_numpy(dtype=float, na_value=np.nan)
+    decimal = pd.to_numeric(num.str.replace(' ', '', regex=False).str.replace(',', '.', regex=False),
+                            errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    integer = pd.to_numeric(num.str.replace(r'\D', '', regex=True), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+    result = np.where(np.isnan(multiplier), integer, np.round(decimal * multiplier))
+    result[np.isnan(result)] = 0
+    result[text.str.contains(_LIKE_RE.pattern, regex=True).to_numpy()] = 0
+    return result.astype(np.int64)
+
+
+def parse_post_id(data_post: Optional[str]) -> Optional[int]:
+    """Извлечение id поста из атрибута data-post ("channel/123")"""
+    if not data_post:
+        return None
+    tail = data_post.rsplit('/', 1)[-1]
+    return int(tail) if tail.isdigit() else None
+
+
+# Превью текста поста: первые PREVIEW_CHARS символов с "...", у поста без текста (только медиа) — MEDIA_PREVIEW
+PREVIEW_CHARS = 50
+MEDIA_PREVIEW = "[медиа]"
+
+
+def text_preview(text: Optional[str]) -> str:
+    """Короткое превью текста поста для отображения"""
+    return text[:PREVIEW_CHARS] + "..." if text else MEDIA_PREVIEW
+
+
+def build_record(data_post: Optional[str], date_str: str, views_text: str, text: Optional[str]) -> Dict:
+    """Запись о посте из извлечённых из разметки значений"""
+    post_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+    post_date = post_date.astimezone(MOSCOW_TZ)
+
+    views = parse_views(views_text.strip())
+
+    return {
+        "post_id": parse_post_id(data_post),
+        "date": post_date,
+        "views": views,
+        "text_preview": text_preview(text),
+        "text": text or "",
+    }
+
+
+def parse_posts_soup(html: str) -> List[Dict]:
+    """
+    Эталонный разбор через полное дерево BeautifulSoup (медленный, оставлен для сверки)
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    records = []
+
+    for post in soup.find_all('div', class_='tgme_widget_message'):
+        date_elem = post.find('time', class_='time')
+        views_elem = post.find('span', class_='tgme_widget_message_views')
+        text_elem = post.find('div', class_='tgme_widget_message_text')
+
+        if not date_elem or not views_elem:
+            continue
+
+        try:
+            records.append(build_record(
+                post.get('data-post'),
+                date_elem['datetime'],
+                views_elem.text,
+                text_elem.text if text_elem else None,
+            ))
+        except Exception:
+            continue
+
+    return records
+
+
+# Быстрый разбор: вместо дерева документа — поиск нужных тегов регулярными выражениями.
+# Тело тега учитывает значения атрибутов в кавычках: ">" внутри них не закрывает тег
+_TAG_BODY = r'(?:"[^"]*"|\'[^\']*\'|[^>"\'])*'
+_DIV_OPEN_RE = re.compile(r'<div\b' + _TAG_BODY + '>', re.IGNORECASE)
+_TIME_OPEN_RE = re.compile(r'<time\b' + _TAG_BODY + '>', re.IGNORECASE)
+_SPAN_OPEN_RE = re.compile(r'<span\b' + _TAG_BODY + '>', re.IGNORECASE)
+_ATTR_RE = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+_CLASS_RE = re.compile(r'\bclass\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))', re.IGNORECASE)
+# Комментарии и содержимое script/style BeautifulSoup не считает текстом, а теги внутри них — разметкой
+_SKIP_BLOCK_RE = re.compile(r'<!--.*?-->|<(script|style)\b' + _TAG_BODY + r'>.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'</?[a-zA-Z]' + _TAG_BODY + '>')
+_NESTING_RE = {name: re.compile(r'<(/?)' + name + r'\b' + _TAG_BODY + '>', re.IGNORECASE) for name in ("div", "span")}
+
+
+def _attrs(tag: str) -> Dict[str, str]:
+    """Атрибуты открывающего тега"""
+    attrs = {}
+    for name, dq, sq, bare in _ATTR_RE.findall(tag):
+        value = dq or sq or bare
+        # Как и BeautifulSoup, при повторе атрибута побеждает последнее значение
+        attrs[name.lower()] = html_lib.unescape(value)
+    return attrs
+
+
+def _has_class(tag: str, class_name: str) -> bool:
+    # Быстрая проверка подстрокой, точная — по списку классов
+    if class_name not in tag:
+        return False
+    match = _CLASS_RE.search(tag)
+    return bool(match) and class_name in (match.group(1) or match.group(2) or match.group(3) or '').split()
+
+
+def _find_tag(pattern: re.Pattern, html: str, class_name: str, start: int, end: int) -> Optional[re.Match]:
+    """Первый открывающий тег с классом class_name в диапазоне [start, end)"""
+    for match in pattern.finditer(html, start, end):
+        if _has_class(match.group(), class_name):
+            return match
+    return None
+
+
+def _element_end(html: str, open_match: re.Match, name: str = "div", end: Optional[int] = None) -> Tuple[int, int]:
+    """Границы содержимого элемента name (div или span): (начало, конец) с учётом вложенных элементов того же типа"""
+    end = len(html) if end is None else end
+    depth = 1
+    for tag in _NESTING_RE[name].finditer(html, open_match.end(), end):
+        if tag.group(1):
+            depth -= 1
+            if depth == 0:
+                return open_match.end(), tag.start()
+        elif not tag.group().endswith('/>'):
+            depth += 1
+    return open_match.end(), end
+
+
+def _inner_text(fragment: str) -> str:
+    """Текст фрагмента без тегов, как .text у BeautifulSoup (комментарии и script/style уже вырезаны)"""
+    return html_lib.unescape(_TAG_RE.sub('', fragment))
+
+
+def parse_posts_fast(html: str) -> List[Dict]:
+    """
+    Извлечение только id, даты, просмотров и текста из блоков tgme_widget_message
+    без построения дерева документа. Даёт те же записи, что и parse_posts_soup.
+    """
+    html = _SKIP_BLOCK_RE.sub('', html)
+    records = []
+    pos = 0
+
+    while True:
+        post = _find_tag(_DIV_OPEN_RE, html, 'tgme_widget_message', pos, len(html))
+        if post is None:
+            break
+        body_start, body_end = _element_end(html, post)
+        pos = body_end
+
+        time_tag = _find_tag(_TIME_OPEN_RE, html, 'time', body_start, body_end)
+        views_tag = _find_tag(_SPAN_OPEN_RE, html, 'tgme_widget_message_views', body_start, body_end)
+        if time_tag is None or views_tag is None:
+            continue
+
+        text = None
+        text_tag = _find_tag(_DIV_OPEN_RE, html, 'tgme_widget_message_text', body_start, body_end)
+        if text_tag is not None:
+            text_start, text_end = _element_end(html, text_tag)
+            text = _inner_text(html[text_start:text_end])
+
+        views_start, views_end = _element_end(html, views_tag, "span", body_end)
+        views_text = _inner_text(html[views_start:views_end])
+
+        try:
+            records.append(build_record(
+                _attrs(post.group()).get('data-post'),
+                _attrs(time_tag.group())['datetime'],
+                views_text,
+                text,
+            ))
+        except Exception:
+            continue
+
+    return records
+
+
+# Выбор парсера: CHANNELPULSE_PARSER=bs4 возвращает разбор через BeautifulSoup
+PARSER_BACKEND = os.getenv("CHANNELPULSE_PARSER", "fast")
+
+
+def parse_posts(html: str) -> List[Dict]:
+    """
+    Извлечение постов из HTML-страницы t.me/s/<channel> (в порядке страницы: от старых к новым)
+    """
+    if PARSER_BACKEND == "bs4":
+        return parse_posts_soup(html)
+    return parse_posts_fast(html)
+
+
+def parse_page(raw: bytes) -> List[Dict]:
+    """Разбор сырой страницы (байты ответа t.me)"""
+    return parse_posts(raw.decode('utf-8', errors='replace'))
+
+
+class PageColumns:
+    """
+    Посты страницы в компактных колонках (id, epoch-секунды, просмотры, превью, полный текст)
+    в порядке страницы. Так разобранная страница передаётся из процессов пула разбора и дальше
+    в хранилище: колонки из примитивов дешевле передавать между процессами и хранить, чем словари
+    с datetime, а записи строятся только там, где они действительно нужны (records()).
+    """
+
+    __slots__ = ("post_ids", "timestamps", "views", "previews", "texts")
+
+    def __init__(self, post_ids: List, timestamps: List[int], views: List[int], previews: List[str], texts: List[str]):
+        self.post_ids = post_ids
+        self.timestamps = timestamps
+        self.views = views
+        self.previews = previews
+        self.texts = texts
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "PageColumns":
+        """Колонки из записей парсера (build_record)"""
+        return cls(
+            [r["post_id"] for r in records],
+            [int(r["date"].timestamp()) for r in records],
+            [r["views"] for r in records],
+            [r["text_preview"] for r in records],
+            [r.get("text") or "" for r in records],
+        )
+
+    def __len__(self) -> int:
+        return len(self.post_ids)
+
+    def __getitem__(self, key: slice) -> "PageColumns":
+        if not isinstance(key, slice):
+            raise TypeError("PageColumns поддерживает только срезы")
+        return PageColumns(self.post_ids[key], self.timestamps[key], self.views[key], self.previews[key],
+                           self.texts[key])
+
+    def records(self) -> List[Dict]:
+        """Записи в формате build_record"""
+        return [
+            {
+                "post_id": post_id,
+                "date": datetime.fromtimestamp(ts, MOSCOW_TZ),
+                "views": views,
+                "text_preview": text_preview,
+                "text": text,
+            }
+            for post_id, ts, views, text_preview, text in zip(
+                self.post_ids, self.timestamps, self.views, self.previews, self.texts)
+        ]
+
+
+def parse_page_columns(raw: bytes) -> PageColumns:
+    """Разбор сырой страницы сразу в колонки (выполняется в процессах пула разбора)"""
+    return PageColumns.from_records(parse_page(raw))
+
+
+_DATA_POST_ID_RE = re.compile(r'data-post="[^"/]*/(\d+)"')
+
+
+def page_post_ids(raw: bytes) -> List[int]:
+    """Дешёвое извлечение id постов страницы — для курсора следующей страницы до полного разбора"""
+    return [int(m) for m in _DATA_POST_ID_RE.findall(raw.decode('utf-8', errors='replace'))]
+
+
+# === ЗАГРУЗКА СТРАНИЦ ===
+def channel_url(channel_name: str, before: Optional[int] = None) -> str:
+    """URL страницы канала; before — курсор пагинации t.me/s"""
+    url = f"{TME_BASE_URL}/{channel_name.strip()}"
+    if before is not None:
+        url += f"?before={before}"
+    return url
+
+
+# Статусы, после которых запрос имеет смысл повторить
+RETRYABLE_STATUSES = {500, 502, 503, 504}
+
+
+async def request_page(
+    session: aiohttp.ClientSession,
+    url: str,
+    headers: Dict,
+    read_body: bool = True,
+    service: str = "t.me",
+) -> Tuple[int, bytes, Mapping[str, str]]:
+    """
+    GET с политикой хоста (ratelimit.HostPolicy): адаптивный лимит параллельных запросов,
+    повторы с экспоненциальной задержкой, учёт Retry-After и предохранитель.
+    Возвращает (статус, тело, заголовки) для ответов, которые не надо повторять;
+    service — имя сервиса в сообщениях об ошибках.
+    """
+    policy = get_host_policy(urlparse(url).netloc)
+    last_error: Optional[ChannelFetchError] = None
+
+    for attempt in range(HTTP_RETRY_ATTEMPTS):
+        if attempt:
+            policy.metrics["retries"] += 1
+        try:
+            async with policy.slot():
+                try:
+                    async with session.get(url, headers=headers) as response:
+                        status = response.status
+                        response_headers = response.headers.copy()
+                        body = await response.read() if status == 200 and read_body else b""
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    policy.record_failure("network_errors")
+                    last_error = UpstreamUnavailableError(f"нет ответа от {service}: {type(e).__name__}")
+                    status = None
+                else:
+                    if status == 429:
+                        retry_after = parse_retry_after(response_headers.get("Retry-After"))
+                        policy.record_throttle(retry_after)
+                        last_error = RateLimitedError(f"{service} ограничил частоту запросов", status=429,
+                                                      retry_after=retry_after)
+                        if retry_after is not None and retry_after > HTTP_RETRY_AFTER_MAX:
+                            raise last_error
+                    elif status in RETRYABLE_STATUSES:
+                        policy.record_failure("server_errors")
+                        last_error = UpstreamUnavailableError(f"{service} вернул статус {status}", status=status)
+                    else:
+                        policy.record_success()
+                        return status, body, response_headers
+        except CircuitOpenError as e:
+            raise UpstreamUnavailableError(f"{service} временно недоступен", retry_after=e.retry_after) from e
+
+        if attempt + 1 < HTTP_RETRY_ATTEMPTS:
+            # Пауза по Retry-After уже учтена политикой хоста, здесь — только разброс
+            await asyncio.sleep(backoff_delay(attempt))
+
+    raise last_error
+
+
+async def fetch_page(session: aiohttp.ClientSession, channel_name: str, before: Optional[int] = None) -> bytes:
+    """Загрузка одной страницы канала (таймауты задаёт сессия, см. http_client)"""
+    status, body, _ = await request_page(session, channel_url(channel_name, before), DEFAULT_HEADERS)
+    if status != 200:
+        raise ChannelFetchError(f"t.me вернул статус {status}", status=status)
+    return body
+
+
+async def probe_channel(
+    session: aiohttp.ClientSession,
+    channel_name: str,
+    validators: Optional[Dict] = None,
+) -> Tuple[bool, Dict]:
+    """
+    Условный GET первой страницы канала (If-None-Match / If-Modified-Since).
+    Возвращает (изменился ли канал, новые валидаторы). Если t.me не прислал
+    ни ETag, ни Last-Modified, в валидаторах отмечается conditional=False.
+    """
+    headers = dict(DEFAULT_HEADERS)
+    validators = validators or {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    status, _, response_headers = await request_page(session, channel_url(channel_name), headers, read_body=False)
+    if status == 304:
+        return False, validators
+    if status != 200:
+        raise ChannelFetchError(f"t.me вернул статус {status}", status=status)
+    etag = response_headers.get("ETag")
+    last_modified = response_headers.get("Last-Modified")
+    return True, {
+        "etag": etag,
+        "last_modified": last_modified,
+        "conditional": bool(etag or last_modified),
+    }
+
+
+async def crawl_channel(
+    session: aiohttp.ClientSession,
+    channel_name: str,
+    max_posts: int = DEFAULT_MAX_POSTS,
+    max_pages: int = DEFAULT_MAX_PAGES,
+    before: Optional[int] = None,
+    parse_pool=None,
+) -> AsyncIterator[PageColumns]:
+    """
+    Обход истории канала по курсору ?before=<post_id>, от новых страниц к старым.
+    Отдаёт пачки постов (PageColumns) по мере загрузки страниц; HTML страницы не хранится
+    дольше, чем нужно для её разбора.
+
+    С parse_pool (см. parse_pool.ParsePool) разбор идёт в отдельных процессах,
+    а следующая страница загружается, пока разбирается текущая.
+    """
+    remaining = max_posts
+    pages = 0
+    pending = asyncio.ensure_future(fetch_page(session, channel_name, before))
+
+    try:
+        while pending is not None:
+            raw = await pending
+            pending = None
+            pages += 1
+
+            parsing = asyncio.ensure_future(parse_pool.parse(raw)) if parse_pool is not None else None
+
+            # Посты без id не дают курсора — дальше идти нельзя
+            ids = page_post_ids(raw)
+            next_before = min(ids) if ids else None
+            has_next = (
+                next_before is not None
+                and next_before > 1
+                and (before is None or next_before < before)
+                and pages < max_pages
+            )
+            # Предзагрузка, если бюджет точно не выбирается этой страницей
+            if has_next and remaining > len(ids):
+                pending = asyncio.ensure_future(fetch_page(session, channel_name, next_before))
+
+            page = await parsing if parsing is not None else parse_page_columns(raw)
+            del raw
+
+            # На странице посты идут от старых к новым — берём самые свежие в пределах бюджета
+            batch = page[-remaining:]
+            remaining -= len(batch)
+            if batch:
+                yield batch
+
+            if remaining <= 0:
+                break
+            # Часть постов страницы отброшена при разборе (без даты или просмотров) — бюджет
+            # считается по разобранным постам, поэтому следующая страница нужна и без предзагрузки
+            if pending is None and has_next:
+                pending = asyncio.ensure_future(fetch_page(session, channel_name, next_before))
+            before = next_before
+    finally:
+        if pending is not None:
+            pending.cancel()
@@ -0,0 +1,98 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Broadcast:
+    """Один исходный асинхронный поток, который читают несколько подписчиков"""
+
+    def __init__(self):
+        self.chunks: List = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+    async def run(self, source: AsyncIterator):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                async with self._changed:
+                    self._changed.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.done = True
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator:
+        # Новый подписчик сначала получает уже пришедшие фрагменты, затем ждёт следующие
+        i = 0
+        while True:
+            if i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+                continue
+            if self.done:
+                if self.error is not None and not isinstance(self.error, asyncio.CancelledError):
+                    raise self.error
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: i < len(self.chunks) or self.done)
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых запросов: пока задача с ключом выполняется,
+    остальные вызывающие ждут её результат, а не запускают дубликат.
+    Рассчитан на работу внутри одного event loop (см. event_loop.BackgroundLoop).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Выполнить factory() для ключа или присоединиться к уже идущему вызову"""
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["executions"] += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.stats["coalesced"] += 1
+
+        # shield: отмена одного ожидающего не отменяет задачу для остальных
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Потоковый вариант do(): все вызывающие с одним ключом читают один исходный поток"""
+        self.stats["calls"] += 1
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            self.stats["executions"] += 1
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            # Ссылка на задачу хранится в broadcast, пока он зарегистрирован
+            broadcast.task = task = asyncio.ensure_future(broadcast.run(factory()))
+            task.add_done_callback(lambda t: self._streams.pop(key, None) if self._streams.get(key) is broadcast else None)
+        else:
+            self.stats["coalesced"] += 1
+
+        async for chunk in broadcast.subscribe():
+            yield chunk
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Исключение уже получили ожидающие; помечаем его обработанным
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._inflight) + len(self._streams)
@@ -0,0 +1,647 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+import numpy as np
+
+from aggregators import PostingStats
+from posts import PostBatch
+from scraper import DEFAULT_MAX_PAGES, DEFAULT_MAX_POSTS, MEDIA_PREVIEW, PageColumns, crawl_channel
+from textindex import TOPIC_LIMIT, TOPIC_MIN_POSTS, normalize_term, term_row, tokenize
+
+# === НАСТРОЙКИ ХРАНИЛИЩА ===
+DB_PATH = os.getenv("CHANNELPULSE_DB", os.path.join("data", "channelpulse.db"))
+
+# Сколько последних уже сохранённых постов перечитывать при обновлении (для свежих просмотров)
+RECENT_WINDOW = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    channel TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    views INTEGER NOT NULL,
+    text_preview TEXT NOT NULL,
+    updated_at INTEGER NOT NULL,
+    text TEXT,
+    PRIMARY KEY (channel, post_id)
+);
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    accessed_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracked_channels (
+    channel TEXT PRIMARY KEY,
+    interval INTEGER NOT NULL,
+    max_posts INTEGER NOT NULL,
+    next_run_at REAL NOT NULL,
+    last_success_at REAL,
+    last_error TEXT,
+    added_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS posting_stats (
+    channel TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    m2 REAL NOT NULL,
+    PRIMARY KEY (channel, slot)
+);
+CREATE TABLE IF NOT EXISTS post_terms (
+    channel TEXT NOT NULL,
+    term TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    PRIMARY KEY (channel, term, post_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS post_terms_by_post ON post_terms (channel, post_id);
+CREATE TABLE IF NOT EXISTS term_stats (
+    channel TEXT NOT NULL,
+    term TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    m2 REAL NOT NULL,
+    PRIMARY KEY (channel, term)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS text_index_state (
+    channel TEXT PRIMARY KEY,
+    indexed_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS crawl_gaps (
+    channel TEXT NOT NULL,
+    low INTEGER NOT NULL,
+    high INTEGER NOT NULL,
+    PRIMARY KEY (channel, high)
+);
+CREATE TABLE IF NOT EXISTS audience_cache (
+    channel TEXT PRIMARY KEY,
+    data TEXT,
+    fetched_at INTEGER NOT NULL
+);
+"""
+
+TRACKED_COLUMNS = ("channel", "interval", "max_posts", "next_run_at", "last_success_at", "last_error", "added_at")
+
+
+def stored_text(text: Optional[str], preview: str) -> str:
+    """
+    Известный текст поста: полный, если сохранён; у строк, сохранённых до хранения полного текста, —
+    превью без "...", так что text_preview() даёт то же превью. У поста только с медиа текст пустой
+    """
+    if text:
+        return text
+    if preview == MEDIA_PREVIEW:
+        return ""
+    return preview[:-3] if preview.endswith("...") else preview
+
+
+def _term_rows(rows: List[Tuple]) -> List[Dict]:
+    """Строки term_stats в виде словарей с 95%-интервалом среднего"""
+    if not rows:
+        return []
+    stats = PostingStats.from_rows(((i, count, mean, m2) for i, (_, count, mean, m2) in enumerate(rows)), size=len(rows))
+    low, high = stats.interval()
+    return [term_row(row[0], row[1], row[2], low[i], high[i]) for i, row in enumerate(rows)]
+
+
+class PostStore:
+    """Локальное хранилище постов (SQLite), ключ — (канал, id поста)"""
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        # Базы, созданные до хранения полного текста постов
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(posts)")}
+        if "text" not in columns:
+            self._conn.execute("ALTER TABLE posts ADD COLUMN text TEXT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def max_post_id(self, channel: str) -> Optional[int]:
+        """Самый свежий сохранённый id поста канала"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(post_id) FROM posts WHERE channel = ?", (channel.lower(),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def post_stats(self, channel: str) -> Dict:
+        """Число сохранённых постов канала и диапазон их id"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), MIN(post_id), MAX(post_id) FROM posts WHERE channel = ?", (channel.lower(),)
+            ).fetchone()
+        return {"count": row[0], "min_post_id": row[1], "max_post_id": row[2]}
+
+    # === ПРОПУСКИ В ИСТОРИИ ===
+    def crawl_gaps(self, channel: str) -> List[Tuple[int, int]]:
+        """Незагруженные диапазоны истории (low, high): не хватает постов с id строго между ними, от новых к старым"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT low, high FROM crawl_gaps WHERE channel = ? ORDER BY high DESC", (channel.lower(),)
+            ).fetchall()
+
+    def add_crawl_gap(self, channel: str, low: int, high: int):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO crawl_gaps (channel, low, high) VALUES (?, ?, ?)", (channel.lower(), low, high)
+            )
+
+    def update_crawl_gap(self, channel: str, high: int, new_high: Optional[int] = None):
+        """Сужение пропуска до new_high после частичной догрузки; без new_high пропуск закрыт"""
+        with self._lock, self._conn:
+            if new_high is None:
+                self._conn.execute("DELETE FROM crawl_gaps WHERE channel = ? AND high = ?", (channel.lower(), high))
+            else:
+                self._conn.execute(
+                    "UPDATE crawl_gaps SET high = ? WHERE channel = ? AND high = ?", (new_high, channel.lower(), high)
+                )
+
+    def data_version(self, channel: str) -> Tuple[int, Optional[int]]:
+        """
+        Версия сохранённых данных канала: число постов и время последней записи.
+        Меняется при каждом сохранении постов, а с ней — статистика времени публикаций и текстовый индекс
+        """
+        with self._lock:
+            return tuple(self._conn.execute(
+                "SELECT COUNT(*), MAX(updated_at) FROM posts WHERE channel = ?", (channel.lower(),)
+            ).fetchone())
+
+    def upsert_posts(self, channel: str, posts: PageColumns) -> int:
+        """
+        Сохранение постов страницы; у существующих обновляются просмотры. Возвращает число строк.
+        Статистика по времени публикаций (posting_stats) обновляется в той же транзакции:
+        прежний вклад перезаписанных постов вычитается, новый — добавляется.
+        """
+        now = int(time.time())
+        channel = channel.lower()
+        # Последняя запись поста в пачке побеждает, как и при последовательном upsert;
+        # пустой текст (пост только с медиа) хранится как NULL, и вместо него читается превью
+        rows = list({
+            post_id: (channel, post_id, ts, views, preview, now, text or None)
+            for post_id, ts, views, preview, text in zip(
+                posts.post_ids, posts.timestamps, posts.views, posts.previews, posts.texts)
+            if post_id is not None
+        }.values())
+        if not rows:
+            return 0
+        ids = {row[1] for row in rows}
+        with self._lock, self._conn:
+            stats = self._posting_stats(channel)
+            self._ensure_text_index(channel)
+            # Пачка — соседние посты со страницы канала, поэтому диапазон id узкий
+            previous = {
+                post_id: (ts, views, stored_text(text, preview)) for post_id, ts, views, text, preview in self._conn.execute(
+                    "SELECT post_id, ts, views, text, text_preview FROM posts "
+                    "WHERE channel = ? AND post_id BETWEEN ? AND ?",
+                    (channel, min(ids), max(ids)),
+                )
+                if post_id in ids
+            }
+            self._conn.executemany(
+                """
+                INSERT INTO posts (channel, post_id, ts, views, text_preview, updated_at, text)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (channel, post_id) DO UPDATE SET
+                    views = excluded.views,
+                    text_preview = excluded.text_preview,
+                    updated_at = excluded.updated_at,
+                    text = COALESCE(excluded.text, posts.text)
+                """,
+                rows,
+            )
+            if previous:
+                old_ts, old_views, _ = zip(*previous.values())
+                stats = stats.remove(PostingStats.from_posts(np.array(old_ts), np.array(old_views)))
+            stats = stats.merge(PostingStats.from_posts(np.array([r[2] for r in rows]), np.array([r[3] for r in rows])))
+            self._save_posting_stats(channel, stats)
+            # Индексируется текст, который остался в строке: без нового текста сохраняется прежний (COALESCE)
+            old_texts = {post_id: text for post_id, (_, _, text) in previous.items()}
+            self._index_posts(channel, [(r[1], r[3], r[6] or old_texts.get(r[1]) or stored_text(None, r[4]))
+                                        for r in rows],
+                              {post_id: views for post_id, (_, views, _) in previous.items()})
+        return len(rows)
+
+    # === СТАТИСТИКА ПО ВРЕМЕНИ ПУБЛИКАЦИЙ ===
+    def posting_stats(self, channel: str) -> PostingStats:
+        """Просмотры по ячейкам день недели × час по всей сохранённой истории канала (168 строк)"""
+        with self._lock, self._conn:
+            return self._posting_stats(channel.lower())
+
+    def _posting_stats(self, channel: str) -> PostingStats:
+        rows = self._conn.execute(
+            "SELECT slot, count, mean, m2 FROM posting_stats WHERE channel = ?", (channel,)
+        ).fetchall()
+        if rows:
+            return PostingStats.from_rows(rows)
+        # Посты, сохранённые до появления статистики, учитываются один раз целиком
+        history = self._conn.execute("SELECT ts, views FROM posts WHERE channel = ?", (channel,)).fetchall()
+        if not history:
+            return PostingStats.empty()
+        stats = PostingStats.from_posts(*map(np.array, zip(*history)))
+        self._save_posting_stats(channel, stats)
+        return stats
+
+    def _save_posting_stats(self, channel: str, stats: PostingStats):
+        self._conn.execute("DELETE FROM posting_stats WHERE channel = ?", (channel,))
+        self._conn.executemany(
+            "INSERT INTO posting_stats (channel, slot, count, mean, m2) VALUES (?, ?, ?, ?, ?)",
+            [(channel, *row) for row in stats.rows()],
+        )
+
+    def load_batch(self, channel: str, limit: Optional[int] = None) -> PostBatch:
+        """
+        Последние limit постов канала в колоночном виде, в хронологическом порядке.
+        Тексты полные, если они сохранены; для старых строк без полного текста — из превью (см. stored_text)
+        """
+        query = "SELECT post_id, ts, views, text, text_preview FROM posts WHERE channel = ? ORDER BY post_id DESC"
+        params = [channel.lower()]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        rows.reverse()
+        if not rows:
+            return PostBatch.empty()
+        post_ids, timestamps, views, texts, previews = zip(*rows)
+        return PostBatch.from_columns(post_ids, timestamps, views, list(map(stored_text, texts, previews)))
+
+    # === КЭШ ОТВЕТОВ LLM ===
+    def get_llm_response(self, key: str, ttl: Optional[float] = None) -> Optional[Dict]:
+        """Сохранённый ответ модели по ключу-хэшу (None — нет или истёк срок)"""
+        now = int(time.time())
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT model, response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if ttl is not None and now - row[2] >= ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return {"model": row[0], "response": row[1], "created_at": row[2]}
+
+    def put_llm_response(self, key: str, model: str, response: str,
+                         ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        """
+        Сохранение ответа модели. Истёкшие записи удаляются, а при превышении max_bytes
+        вытесняются давно не читанные (LRU по accessed_at).
+        """
+        now = int(time.time())
+        size = len(response.encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO llm_cache (key, model, response, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    model = excluded.model,
+                    response = excluded.response,
+                    size = excluded.size,
+                    created_at = excluded.created_at,
+                    accessed_at = excluded.accessed_at
+                """,
+                (key, model, response, size, now, now),
+            )
+            if ttl is not None:
+                self._conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - ttl,))
+            if max_bytes is not None:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+                if total > max_bytes:
+                    # Самая новая запись не вытесняется, даже если одна превышает лимит
+                    evict = []
+                    for old_key, old_size in self._conn.execute(
+                        "SELECT key, size FROM llm_cache WHERE key != ? ORDER BY accessed_at, created_at", (key,)
+                    ):
+                        if total <= max_bytes:
+                            break
+                        evict.append((old_key,))
+                        total -= old_size
+                    self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", evict)
+
+    # === ТЕКСТОВЫЙ ИНДЕКС ===
+    def _index_posts(self, channel: str, posts: List[Tuple[int, int, str]], previous_views: Dict[int, int]):
+        """
+        Обновление индекса для постов (id, просмотры, текст): у уже проиндексированных постов
+        прежний вклад (термины и просмотры) вычитается из статистики терминов, новый — добавляется.
+        """
+        ids = [post_id for post_id, _, _ in posts]
+        old_postings = [
+            (term, previous_views[post_id]) for term, post_id in self._conn.execute(
+                "SELECT term, post_id FROM post_terms WHERE channel = ? AND post_id BETWEEN ? AND ?",
+                (channel, min(ids), max(ids)),
+            )
+            if post_id in previous_views
+        ]
+        new_postings = [(term, post_id, views) for post_id, views, text in posts for term in tokenize(text)]
+
+        self._conn.executemany(
+            "DELETE FROM post_terms WHERE channel = ? AND post_id = ?", [(channel, post_id) for post_id in previous_views]
+        )
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO post_terms (channel, term, post_id) VALUES (?, ?, ?)",
+            [(channel, term, post_id) for term, post_id, _ in new_postings],
+        )
+
+        terms = sorted({term for term, _ in old_postings} | {term for term, _, _ in new_postings})
+        if not terms:
+            return
+        slot = {term: i for i, term in enumerate(terms)}
+        stats = PostingStats.from_rows(
+            ((slot[term], count, mean, m2) for term, count, mean, m2 in self._select_term_stats(channel, terms)),
+            size=len(terms),
+        )
+        if old_postings:
+            stats = stats.remove(PostingStats.from_values(
+                [slot[term] for term, _ in old_postings], [views for _, views in old_postings], size=len(terms)))
+        stats = stats.merge(PostingStats.from_values(
+            [slot[term] for term, _, _ in new_postings], [views for _, _, views in new_postings], size=len(terms)))
+
+        self._conn.executemany(
+            "DELETE FROM term_stats WHERE channel = ? AND term = ?",
+            [(channel, terms[i]) for i in np.flatnonzero(stats.count == 0)],
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO term_stats (channel, term, count, mean, m2) VALUES (?, ?, ?, ?, ?)",
+            [(channel, terms[i], count, mean, m2) for i, count, mean, m2 in stats.rows()],
+        )
+
+    def _select_term_stats(self, channel: str, terms: List[str]) -> List[Tuple]:
+        rows = []
+        # Ограничение SQLite на число параметров запроса
+        for start in range(0, len(terms), 500):
+            chunk = terms[start:start + 500]
+            rows += self._conn.execute(
+                f"SELECT term, count, mean, m2 FROM term_stats WHERE channel = ? AND term IN ({', '.join('?' * len(chunk))})",
+                [channel, *chunk],
+            ).fetchall()
+        return rows
+
+    def _ensure_text_index(self, channel: str):
+        # Посты, сохранённые до появления индекса, индексируются один раз целиком (полный текст или превью)
+        if self._conn.execute("SELECT 1 FROM text_index_state WHERE channel = ?", (channel,)).fetchone():
+            return
+        posts = [
+            (post_id, views, stored_text(text, preview)) for post_id, views, text, preview in self._conn.execute(
+                "SELECT post_id, views, text, text_preview FROM posts WHERE channel = ?", (channel,)
+            )
+        ]
+        self._conn.execute("DELETE FROM post_terms WHERE channel = ?", (channel,))
+        self._conn.execute("DELETE FROM term_stats WHERE channel = ?", (channel,))
+        if posts:
+            self._index_posts(channel, posts, {})
+        self._conn.execute("INSERT INTO text_index_state (channel, indexed_at) VALUES (?, ?)", (channel, int(time.time())))
+
+    def term_stats(self, channel: str, terms: Iterable[str]) -> Dict[str, Dict]:
+        """Охват постов с каждым из терминов: число постов, средние просмотры и 95%-интервал"""
+        channel = channel.lower()
+        terms = sorted({normalize_term(t) for t in terms})
+        with self._lock, self._conn:
+            self._ensure_text_index(channel)
+            rows = self._select_term_stats(channel, terms) if terms else []
+        return {row["term"]: row for row in _term_rows(rows)}
+
+    def top_terms(self, channel: str, limit: int = TOPIC_LIMIT, min_posts: int = TOPIC_MIN_POSTS) -> List[Dict]:
+        """Термины с наибольшим средним охватом среди упомянутых хотя бы в min_posts постах"""
+        channel = channel.lower()
+        with self._lock, self._conn:
+            self._ensure_text_index(channel)
+            rows = self._conn.execute(
+                "SELECT term, count, mean, m2 FROM term_stats WHERE channel = ? AND count >= ? ORDER BY mean DESC, count DESC, term LIMIT ?",
+                (channel, min_posts, limit),
+            ).fetchall()
+        return _term_rows(rows)
+
+    def term_coverage(self, channel: str, terms: Iterable[str]) -> Optional[float]:
+        """Доля постов канала, где упомянут хотя бы один из терминов (None — постов нет)"""
+        channel = channel.lower()
+        terms = sorted({normalize_term(t) for t in terms})
+        with self._lock, self._conn:
+            self._ensure_text_index(channel)
+            total = self._conn.execute("SELECT COUNT(*) FROM posts WHERE channel = ?", (channel,)).fetchone()[0]
+            if not total:
+                return None
+            if not terms:
+                return 0.0
+            matched = self._conn.execute(
+                f"SELECT COUNT(DISTINCT post_id) FROM post_terms WHERE channel = ? AND term IN ({', '.join('?' * len(terms))})",
+                [channel, *terms],
+            ).fetchone()[0]
+        return matched / total
+
+    def posts_with_term(self, channel: str, term: str) -> List[int]:
+        """id постов с термином по возрастанию"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT post_id FROM post_terms WHERE channel = ? AND term = ? ORDER BY post_id",
+                (channel.lower(), normalize_term(term)),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # === КЭШ ДАННЫХ АУДИТОРИИ ===
+    def get_audience(self, channels: List[str], ttl: Optional[float] = None,
+                     miss_ttl: Optional[float] = None) -> Dict[str, Optional[Dict]]:
+        """
+        Сохранённые данные аудитории для каналов, у которых не истёк срок.
+        Канал без данных у поставщика хранится как None со своим сроком miss_ttl.
+        """
+        now = int(time.time())
+        names = [c.lower() for c in channels]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT channel, data, fetched_at FROM audience_cache WHERE channel IN ({', '.join('?' * len(names))})",
+                names,
+            ).fetchall() if names else []
+        found = {}
+        for channel, data, fetched_at in rows:
+            limit = ttl if data is not None else miss_ttl
+            if limit is None or now - fetched_at < limit:
+                found[channel] = json.loads(data) if data is not None else None
+        return found
+
+    def put_audience(self, items: Dict[str, Optional[Dict]]):
+        now = int(time.time())
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO audience_cache (channel, data, fetched_at) VALUES (?, ?, ?)
+                ON CONFLICT (channel) DO UPDATE SET data = excluded.data, fetched_at = excluded.fetched_at
+                """,
+                [(c.lower(), json.dumps(d, ensure_ascii=False) if d is not None else None, now) for c, d in items.items()],
+            )
+
+    # === ОТСЛЕЖИВАЕМЫЕ КАНАЛЫ ===
+    def track_channel(self, channel: str, interval: int, max_posts: int = DEFAULT_MAX_POSTS,
+                      next_run_at: Optional[float] = None):
+        """Добавление канала в расписание (или изменение интервала и объёма истории)"""
+        next_run_at = time.time() if next_run_at is None else next_run_at
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO tracked_channels (channel, interval, max_posts, next_run_at, added_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (channel) DO UPDATE SET
+                    interval = excluded.interval,
+                    max_posts = excluded.max_posts,
+                    next_run_at = MIN(tracked_channels.next_run_at, excluded.next_run_at)
+                """,
+                (channel.lower(), int(interval), int(max_posts), next_run_at, int(time.time())),
+            )
+
+    def untrack_channel(self, channel: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM tracked_channels WHERE channel = ?", (channel.lower(),))
+        return cursor.rowcount > 0
+
+    def tracked_channel(self, channel: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(TRACKED_COLUMNS)} FROM tracked_channels WHERE channel = ?", (channel.lower(),)
+            ).fetchone()
+        return dict(zip(TRACKED_COLUMNS, row)) if row else None
+
+    def tracked_channels(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(TRACKED_COLUMNS)} FROM tracked_channels ORDER BY next_run_at"
+            ).fetchall()
+        return [dict(zip(TRACKED_COLUMNS, row)) for row in rows]
+
+    def due_channels(self, now: Optional[float] = None) -> List[Dict]:
+        """Каналы, которым пора обновляться, от самых просроченных"""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(TRACKED_COLUMNS)} FROM tracked_channels WHERE next_run_at <= ? ORDER BY next_run_at",
+                (now,),
+            ).fetchall()
+        return [dict(zip(TRACKED_COLUMNS, row)) for row in rows]
+
+    def mark_refreshed(self, channel: str, next_run_at: float, error: Optional[str] = None):
+        """Результат обновления по расписанию; при ошибке время последнего успеха не меняется"""
+        with self._lock, self._conn:
+            if error is None:
+                self._conn.execute(
+                    "UPDATE tracked_channels SET next_run_at = ?, last_success_at = ?, last_error = NULL WHERE channel = ?",
+                    (next_run_at, time.time(), channel.lower()),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE tracked_channels SET next_run_at = ?, last_error = ? WHERE channel = ?",
+                    (next_run_at, error, channel.lower()),
+                )
+
+    def llm_cache_stats(self) -> Dict:
+        """Число сохранённых ответов модели и их объём в байтах"""
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        return {"entries": row[0], "bytes": row[1]}
+
+
+async def refresh_channel(
+    store: PostStore,
+    session: aiohttp.ClientSession,
+    channel: str,
+    max_posts: int = DEFAULT_MAX_POSTS,
+    max_pages: int = DEFAULT_MAX_PAGES,
+    recent_window: int = RECENT_WINDOW,
+    parse_pool=None,
+) -> Dict[str, int]:
+    """
+    Инкрементальное обновление канала: загружаются только посты новее сохранённых
+    плюс окно из recent_window последних (для обновления просмотров).
+    Если бюджет max_posts кончился раньше, чем обход дошёл до сохранённых постов, между ними
+    остаётся пропуск: он запоминается и догружается следующими обновлениями (по max_posts постов
+    на каждое, сверх новых). Если сохранено меньше max_posts, история догружается от самого
+    старого сохранённого поста. parse_pool передаётся в crawl_channel для разбора страниц
+    в отдельных процессах. Возвращает число новых и догруженных старых постов.
+    Работа с SQLite (запись, индекс терминов, статистика) идёт в потоках (asyncio.to_thread),
+    чтобы большая догрузка не останавливала общий event loop.
+    """
+    known_max = await asyncio.to_thread(store.max_post_id, channel)
+    stop_id = known_max - recent_window if known_max is not None else None
+    new_posts = 0
+    lowest = None
+    reached_known = False
+
+    async for batch in crawl_channel(session, channel, max_posts=max_posts, max_pages=max_pages,
+                                     parse_pool=parse_pool):
+        await asyncio.to_thread(store.upsert_posts, channel, batch)
+        ids = [i for i in batch.post_ids if i is not None]
+        new_posts += sum(1 for i in ids if known_max is None or i > known_max)
+        if ids:
+            lowest = min(ids) if lowest is None else min(lowest, min(ids))
+        if stop_id is not None and ids and min(ids) <= stop_id:
+            reached_known = True
+            break
+
+    # Обход не дошёл до сохранённых постов: между ними пропуск, который догрузится позже
+    if known_max is not None and not reached_known and lowest is not None and lowest > known_max + 1:
+        await asyncio.to_thread(store.add_crawl_gap, channel, known_max, lowest)
+    else:
+        new_posts += await _fill_crawl_gaps(store, session, channel, max(max_posts - new_posts, 0), max_pages,
+                                            parse_pool)
+
+    # Догрузка более старой истории, если бюджет ещё не выбран
+    backfilled = 0
+    stats = await asyncio.to_thread(store.post_stats, channel)
+    missing = max_posts - stats["count"]
+    if known_max is not None and missing > 0 and (stats["min_post_id"] or 0) > 1:
+        async for batch in crawl_channel(session, channel, max_posts=missing, max_pages=max_pages,
+                                         before=stats["min_post_id"], parse_pool=parse_pool):
+            backfilled += await asyncio.to_thread(store.upsert_posts, channel, batch)
+
+    return {"new_posts": new_posts, "backfilled": backfilled}
+
+
+async def _fill_crawl_gaps(store: PostStore, session: aiohttp.ClientSession, channel: str,
+                           budget: int, max_pages: int, parse_pool=None) -> int:
+    """Догрузка запомненных пропусков от новых к старым в пределах budget постов; возвращает число догруженных"""
+    filled = 0
+    for low, high in await asyncio.to_thread(store.crawl_gaps, channel):
+        if budget <= 0:
+            break
+        lowest = high
+        async for batch in crawl_channel(session, channel, max_posts=budget, max_pages=max_pages,
+                                         before=high, parse_pool=parse_pool):
+            await asyncio.to_thread(store.upsert_posts, channel, batch)
+            budget -= len(batch)
+            ids = [i for i in batch.post_ids if i is not None]
+            filled += sum(1 for i in ids if low < i < high)
+            lowest = min(ids + [lowest])
+            if lowest <= low + 1:
+                break
+        # t.me отдаёт посты строго старше before, поэтому id не выше low означает, что пропуск закрыт
+        await asyncio.to_thread(store.update_crawl_gap, channel, high, None if lowest <= low + 1 else lowest)
+    return filled
+
+
+_default_store: Optional[PostStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_store() -> PostStore:
+    """Общее для процесса хранилище постов"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = PostStore()
+        return _default_store
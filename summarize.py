@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from posts import PostBatch
+from ratelimit import GroqLimiter, get_groq_limiter
+from scraper import MOSCOW_TZ
+
+# === НАСТРОЙКИ СУММАРИЗАЦИИ ===
+# Бюджет токенов на один фрагмент истории и на итоговую сводку в финальном промпте
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1500"))
+SUMMARY_REDUCE_TOKENS = int(os.getenv("SUMMARY_REDUCE_TOKENS", "1200"))
+SUMMARY_MAX_TOKENS = 200
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+# Ограничения одной суммаризации: суммируются только последние фрагменты истории,
+# а не уложившаяся во время сводка отбрасывается (готовые сводки фрагментов остаются в кэше)
+SUMMARY_MAX_CHUNKS = int(os.getenv("SUMMARY_MAX_CHUNKS", "12"))
+SUMMARY_TIMEOUT = float(os.getenv("SUMMARY_TIMEOUT", "180"))
+
+# Границы фрагментов привязаны к диапазонам id постов, поэтому не сдвигаются,
+# когда появляются новые посты или старые выпадают из окна истории
+CHUNK_ID_SPAN = 50
+
+# Смена шаблонов промптов сбрасывает кэш сводок
+SUMMARY_PROMPT_VERSION = "1"
+
+MAP_PROMPT = """Ниже посты Telegram-канала в формате «#id дата 👁просмотры: текст».
+Кратко (до 5 пунктов) опиши темы и форматы этих постов и какие из них собрали больше всего просмотров.
+Отвечай на русском, без вступлений.
+
+{text}"""
+
+REDUCE_PROMPT = """Ниже краткие сводки по последовательным периодам Telegram-канала (от старых к новым).
+Объедини их в одну сводку до 6 пунктов: устойчивые темы, самые успешные форматы, как менялся интерес аудитории.
+Отвечай на русском, без вступлений.
+
+{text}"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (для кириллицы у Llama ~3 символа на токен)"""
+    return len(text) // 3 + 1
+
+
+def _round_views(views: int) -> int:
+    # Две значащие цифры: мелкие изменения просмотров не меняют текст фрагмента и его ключ
+    if views < 100:
+        return int(views)
+    digits = len(str(int(views))) - 2
+    return int(round(views, -digits))
+
+
+def format_post(post_id: int, timestamp: int, views: int, text: str) -> str:
+    date = datetime.fromtimestamp(int(timestamp), MOSCOW_TZ)
+    text = " ".join(text.split())
+    return f"#{post_id} {date:%d.%m.%Y %H:%M} 👁{_round_views(views)}: {text}"
+
+
+class Chunk:
+    """Фрагмент истории канала для суммаризации"""
+
+    __slots__ = ("first_id", "last_id", "text", "tokens")
+
+    def __init__(self, first_id: int, last_id: int, text: str, tokens: int):
+        self.first_id = first_id
+        self.last_id = last_id
+        self.text = text
+        self.tokens = tokens
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+
+
+def chunk_posts(history: PostBatch, budget: int = SUMMARY_CHUNK_TOKENS, span: int = CHUNK_ID_SPAN) -> List[Chunk]:
+    """
+    Разбиение истории (в хронологическом порядке) на фрагменты не больше budget токенов.
+    Сначала посты группируются по диапазонам id шириной span, затем группа при необходимости
+    делится по бюджету, так что новый пост меняет только последний фрагмент.
+    """
+    chunks: List[Chunk] = []
+    lines: List[str] = []
+    ids: List[int] = []
+    tokens = 0
+    group = None
+
+    def flush():
+        nonlocal lines, ids, tokens
+        if lines:
+            chunks.append(Chunk(ids[0], ids[-1], "\n".join(lines), tokens))
+        lines, ids, tokens = [], [], 0
+
+    for i in range(len(history)):
+        post_id = int(history.post_ids[i])
+        line = format_post(post_id, history.timestamps[i], history.views[i], history.text_at(i))
+        line_tokens = estimate_tokens(line)
+        if post_id // span != group or (lines and tokens + line_tokens > budget):
+            flush()
+            group = post_id // span
+        lines.append(line)
+        ids.append(post_id)
+        tokens += line_tokens
+    flush()
+    return chunks
+
+
+def _pack(texts: List[str], budget: int) -> List[str]:
+    """Последовательная упаковка сводок в группы не больше budget токенов"""
+    groups: List[str] = []
+    current: List[str] = []
+    tokens = 0
+    for text in texts:
+        text_tokens = estimate_tokens(text)
+        if current and tokens + text_tokens > budget:
+            groups.append("\n\n".join(current))
+            current, tokens = [], 0
+        current.append(text)
+        tokens += text_tokens
+    if current:
+        groups.append("\n\n".join(current))
+    return groups
+
+
+class Summarizer:
+    """
+    Map-reduce суммаризация истории канала через Groq: фрагменты суммируются параллельно
+    (не больше concurrency одновременно и в рамках лимитов Groq), затем сводки объединяются.
+    Сводки фрагментов кэшируются в хранилище по хэшу текста, поэтому при обновлении
+    канала заново суммируются только новые фрагменты.
+    """
+
+    def __init__(
+        self,
+        client,
+        store,
+        model: str,
+        temperature: float = 0.2,
+        concurrency: int = SUMMARY_CONCURRENCY,
+        limiter: Optional[GroqLimiter] = None,
+        cache_ttl: Optional[float] = None,
+        cache_max_bytes: Optional[int] = None,
+    ):
+        self.client = client
+        self.store = store
+        self.model = model
+        self.temperature = temperature
+        self.limiter = limiter or get_groq_limiter()
+        self.cache_ttl = cache_ttl
+        self.cache_max_bytes = cache_max_bytes
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.stats = {"chunks": 0, "cached": 0, "requests": 0, "failed": 0}
+
+    def _cache_key(self, kind: str, text: str) -> str:
+        payload = "\x00".join([SUMMARY_PROMPT_VERSION, kind, self.model, str(self.temperature), text])
+        return "summary:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _summarize(self, kind: str, template: str, text: str) -> str:
+        key = self._cache_key(kind, text)
+        cached = self.store.get_llm_response(key, ttl=self.cache_ttl)
+        if cached is not None:
+            self.stats["cached"] += 1
+            return cached["response"]
+
+        prompt = template.format(text=text)
+        async with self._semaphore:
+            await self.limiter.acquire(estimate_tokens(prompt) + SUMMARY_MAX_TOKENS)
+            self.stats["requests"] += 1
+            response = await self.client.chat.completions.create(
+                messages=[{"role": "user", "content": prompt}],
+                model=self.model,
+                temperature=self.temperature,
+                max_tokens=SUMMARY_MAX_TOKENS,
+            )
+        summary = (response.choices[0].message.content or "").strip()
+        if summary:
+            self.store.put_llm_response(key, self.model, summary, ttl=self.cache_ttl, max_bytes=self.cache_max_bytes)
+        return summary
+
+    async def _map(self, kind: str, template: str, texts: List[str]) -> List[str]:
+        """Параллельная суммаризация; неудавшиеся части пропускаются, если удалась хотя бы одна"""
+        results = await asyncio.gather(*[self._summarize(kind, template, t) for t in texts], return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        self.stats["failed"] += len(errors)
+        summaries = [r for r in results if not isinstance(r, BaseException) and r]
+        if errors and not summaries:
+            raise errors[0]
+        return summaries
+
+    def _history_key(self, history: PostBatch) -> str:
+        return self._cache_key("history", history_fingerprint(history))
+
+    def cached_history_summary(self, history: PostBatch) -> Optional[str]:
+        """Готовая итоговая сводка этой истории из кэша (None — ещё не построена)"""
+        cached = self.store.get_llm_response(self._history_key(history), ttl=self.cache_ttl)
+        return cached["response"] if cached is not None else None
+
+    async def summarize_history(self, history: PostBatch) -> str:
+        """
+        Итоговая сводка истории канала не длиннее SUMMARY_REDUCE_TOKENS по последним
+        SUMMARY_MAX_CHUNKS фрагментам; сохраняется в кэш по отпечатку истории (см. cached_history_summary)
+        """
+        chunks = chunk_posts(history)[-SUMMARY_MAX_CHUNKS:]
+        self.stats["chunks"] += len(chunks)
+        summaries = await self._map("map", MAP_PROMPT, [c.text for c in chunks])
+
+        # Иерархическое сведение, пока сводки не помещаются в бюджет финального промпта
+        while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > SUMMARY_REDUCE_TOKENS:
+            groups = _pack(summaries, SUMMARY_CHUNK_TOKENS)
+            if len(groups) == len(summaries):
+                # Каждая сводка сама по себе на пределе бюджета — сводим попарно
+                groups = ["\n\n".join(summaries[i:i + 2]) for i in range(0, len(summaries), 2)]
+            summaries = await self._map("reduce", REDUCE_PROMPT, groups)
+
+        summary = "\n\n".join(summaries)
+        if summary:
+            self.store.put_llm_response(self._history_key(history), self.model, summary,
+                                        ttl=self.cache_ttl, max_bytes=self.cache_max_bytes)
+        return summary
+
+
+def summarized_posts(history: PostBatch) -> int:
+    """Сколько последних постов истории попадает в сводку (с учётом SUMMARY_MAX_CHUNKS)"""
+    chunks = chunk_posts(history)[-SUMMARY_MAX_CHUNKS:]
+    return int((history.post_ids >= chunks[0].first_id).sum()) if chunks else 0
+
+
+def history_fingerprint(history: PostBatch) -> str:
+    """Отпечаток истории для ключа кэша итоговых рекомендаций"""
+    digest = hashlib.sha256()
+    for chunk in chunk_posts(history):
+        digest.update(chunk.key.encode("ascii"))
+    return digest.hexdigest()
@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlencode
+
+from http_client import get_session
+from ratelimit import get_quota_limiter
+from scraper import request_page
+from storage import PostStore, get_store
+
+logger = logging.getLogger("channelpulse.telemetr")
+
+# === НАСТРОЙКИ TELEMETR ===
+TELEMETR_API_KEY = os.getenv("TELEMETR_API_KEY", "")
+TELEMETR_BASE_URL = os.getenv("TELEMETR_BASE_URL", "https://api.telemetr.me").rstrip("/")
+# Демография аудитории меняется медленно: ответы хранятся сутками, «нет данных» — несколько часов
+TELEMETR_CACHE_TTL = float(os.getenv("TELEMETR_CACHE_TTL", str(3 * 24 * 3600)))
+TELEMETR_MISS_TTL = float(os.getenv("TELEMETR_MISS_TTL", str(6 * 3600)))
+# Запросы за разными каналами, пришедшие в пределах окна, уходят одним пакетом
+TELEMETR_BATCH_SIZE = int(os.getenv("TELEMETR_BATCH_SIZE", "20"))
+TELEMETR_BATCH_WINDOW = float(os.getenv("TELEMETR_BATCH_WINDOW", "0.05"))
+# Квота тарифа на один ключ, запросов в минуту
+TELEMETR_QUOTA_PER_MINUTE = float(os.getenv("TELEMETR_QUOTA_PER_MINUTE", "60"))
+
+AUDIENCE_FIELDS = ("gender", "age", "top_countries", "interests", "engagement", "activity")
+
+
+def sample_audience(channel_name: str) -> Dict:
+    """Демо-данные аудитории, когда ключ Telemetr не задан"""
+    sample_data = {
+        "gender": {"male": 73, "female": 27},
+        "age": {"25_34": 52, "18_24": 28, "35_44": 15, "other": 5},
+        "top_countries": [
+            {"country": "Россия", "percent": 68},
+            {"country": "Украина", "percent": 8},
+            {"country": "Казахстан", "percent": 5}
+        ],
+        "interests": [
+            {"name": "Python", "value": 42},
+            {"name": "Инструкции", "value": 35},
+            {"name": "AI", "value": 28},
+            {"name": "Data Science", "value": 25},
+            {"name": "Карьера", "value": 22}
+        ],
+        "engagement": 3.5,
+        "activity": 0.65,
+        "source": "sample",
+    }
+
+    # Если пользователь ввел habr_com, используем специфические данные
+    if "habr" in channel_name.lower():
+        sample_data["interests"] = [
+            {"name": "Программирование", "value": 65},
+            {"name": "AI", "value": 58},
+            {"name": "DevOps", "value": 45},
+            {"name": "Data Science", "value": 42},
+            {"name": "Кибербезопасность", "value": 38}
+        ]
+        sample_data["engagement"] = 5.2
+        sample_data["activity"] = 0.78
+
+    return sample_data
+
+
+def parse_audience(item: Optional[Dict]) -> Optional[Dict]:
+    """Данные одного канала из ответа API; неполная запись считается отсутствием данных"""
+    if not isinstance(item, dict) or any(field not in item for field in AUDIENCE_FIELDS):
+        return None
+    audience = {field: item[field] for field in AUDIENCE_FIELDS}
+    audience["source"] = "telemetr"
+    return audience
+
+
+class TelemetrClient:
+    """
+    Клиент данных аудитории Telemetr.
+    • Ответы хранятся в SQLite (audience_cache) с долгим сроком, поэтому повторный анализ не тратит квоту;
+    • одновременные запросы за разными каналами собираются в пакеты до batch_size каналов
+      (ждём не дольше batch_window), запросы за одним каналом объединяются;
+    • каждый пакет — один запрос в рамках квоты ключа (ratelimit.get_quota_limiter).
+    Ошибки API не кэшируются: вызывающий получает None и продолжает без данных аудитории.
+    """
+
+    def __init__(
+        self,
+        api_key: str = TELEMETR_API_KEY,
+        base_url: str = TELEMETR_BASE_URL,
+        store: Optional[PostStore] = None,
+        ttl: float = TELEMETR_CACHE_TTL,
+        miss_ttl: float = TELEMETR_MISS_TTL,
+        batch_size: int = TELEMETR_BATCH_SIZE,
+        batch_window: float = TELEMETR_BATCH_WINDOW,
+        quota_per_minute: float = TELEMETR_QUOTA_PER_MINUTE,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.store = store or get_store()
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.quota = get_quota_limiter(f"telemetr:{api_key}", quota_per_minute)
+        # Ожидающие каналы и таймер пакета привязаны к event loop и сбрасываются при его смене
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._queue: List[str] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.stats = {"lookups": 0, "cache_hits": 0, "requests": 0, "channels_requested": 0, "errors": 0}
+
+    async def get(self, channel_name: str) -> Optional[Dict]:
+        """Данные аудитории канала или None (нет у поставщика или API недоступен)"""
+        return (await self.get_many([channel_name])).get(channel_name.lower())
+
+    async def get_many(self, channels: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """Данные аудитории для нескольких каналов; ключи — username в нижнем регистре"""
+        names = list(dict.fromkeys(c.lower() for c in channels))
+        self.stats["lookups"] += len(names)
+        result = self.store.get_audience(names, ttl=self.ttl, miss_ttl=self.miss_ttl)
+        self.stats["cache_hits"] += len(result)
+
+        missing = [name for name in names if name not in result]
+        futures = [self._enqueue(name) for name in missing]
+        for name, outcome in zip(missing, await asyncio.gather(*futures, return_exceptions=True)):
+            if isinstance(outcome, BaseException):
+                logger.warning("Telemetr: нет данных для @%s: %s", name, outcome)
+                outcome = None
+            result[name] = outcome
+        return result
+
+    def _enqueue(self, name: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._pending, self._queue, self._timer = loop, {}, [], None
+
+        future = self._pending.get(name)
+        if future is None:
+            future = self._pending[name] = loop.create_future()
+            self._queue.append(name)
+            if len(self._queue) >= self.batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.batch_window, self._flush)
+        # Отмена одного ожидающего не должна отменять общий результат для остальных
+        return asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+            task = asyncio.ensure_future(self._fetch_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch_batch(self, batch: List[str]):
+        pending = self._pending
+        try:
+            audiences = await self._request(batch)
+        except Exception as e:
+            self.stats["errors"] += 1
+            for name in batch:
+                future = pending.pop(name, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+                    # Ошибка уже передана вызывающим; если их не осталось, не шумим в лог loop
+                    future.exception()
+            return
+
+        self.store.put_audience(audiences)
+        for name in batch:
+            future = pending.pop(name, None)
+            if future is not None and not future.done():
+                future.set_result(audiences.get(name))
+
+    async def _request(self, batch: List[str]) -> Dict[str, Optional[Dict]]:
+        """Один запрос к API за пакетом каналов: {"channels": {username: {...}}}"""
+        await self.quota.acquire(1)
+        self.stats["requests"] += 1
+        self.stats["channels_requested"] += len(batch)
+        url = f"{self.base_url}/v1/channels/audience?{urlencode({'usernames': ','.join(batch)})}"
+        headers = {"Authorization": f"Bearer {self.api_key}", "Accept": "application/json"}
+        status, body, _ = await request_page(get_session(), url, headers, service="Telemetr")
+        if status != 200:
+            raise RuntimeError(f"Telemetr вернул статус {status}")
+        channels = json.loads(body).get("channels") or {}
+        items = {str(name).lower(): item for name, item in channels.items()}
+        return {name: parse_audience(items.get(name)) for name in batch}
+
+
+_client: Optional[TelemetrClient] = None
+
+
+def get_telemetr_client() -> Optional[TelemetrClient]:
+    """Общий клиент процесса; None, если TELEMETR_API_KEY не задан"""
+    global _client
+    if _client is None and TELEMETR_API_KEY:
+        _client = TelemetrClient()
+    return _client
+
+
+async def fetch_audience(channel_name: str) -> Optional[Dict]:
+    """Данные аудитории из Telemetr, без ключа — демо-данные"""
+    client = get_telemetr_client()
+    if client is None:
+        return sample_audience(channel_name)
+    return await client.get(channel_name)
+
+
+async def fetch_audiences(channels: Iterable[str]) -> Dict[str, Optional[Dict]]:
+    """Данные аудитории для нескольких каналов одним или несколькими пакетными запросами"""
+    channels = list(channels)
+    client = get_telemetr_client()
+    if client is None:
+        return {c.lower(): sample_audience(c) for c in channels}
+    return await client.get_many(channels)
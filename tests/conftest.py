@@ -0,0 +1,48 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Модули проекта лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+import fake_telemetr  # noqa: E402
+import fake_tme  # noqa: E402
+import scraper  # noqa: E402
+import telemetr  # noqa: E402
+
+
+@pytest.fixture
+def run_fake_tme(monkeypatch):
+    """
+    Запуск сценария scenario(app, session) против локальной заглушки t.me (fake_tme.make_app);
+    scraper.TME_BASE_URL на время теста указывает на неё
+    """
+    def run(scenario, **options):
+        async def main():
+            app = fake_tme.make_app(**options)
+            async with TestServer(app) as server, aiohttp.ClientSession() as session:
+                monkeypatch.setattr(scraper, "TME_BASE_URL", str(server.make_url("/s")))
+                return await scenario(app, session)
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def run_fake_telemetr(monkeypatch):
+    """
+    Запуск сценария scenario(app, base_url) против локальной заглушки Telemetr (fake_telemetr.make_app);
+    клиенты Telemetr на время теста ходят через сессию теста
+    """
+    def run(scenario, **options):
+        async def main():
+            app = fake_telemetr.make_app(**options)
+            async with TestServer(app) as server, aiohttp.ClientSession() as session:
+                monkeypatch.setattr(telemetr, "get_session", lambda: session)
+                return await scenario(app, str(server.make_url("")).rstrip("/"))
+        return asyncio.run(main())
+    return run
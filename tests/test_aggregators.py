@@ -0,0 +1,65 @@
+import random
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from aggregators import SLOTS, PostingStats
+from scraper import PageColumns
+from storage import PostStore
+
+
+def random_stats(rng: np.random.Generator, n: int) -> PostingStats:
+    return PostingStats.from_values(rng.integers(0, SLOTS, n), rng.lognormal(8, 1.5, n).round())
+
+
+def assert_stats_close(actual: PostingStats, expected: PostingStats):
+    np.testing.assert_array_equal(actual.count, expected.count)
+    np.testing.assert_allclose(actual.mean, expected.mean, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(actual.m2, expected.m2, rtol=1e-7, atol=1e-3)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_merge_matches_batch_statistics(seed):
+    rng = np.random.default_rng(seed)
+    slots = rng.integers(0, SLOTS, 2000)
+    values = rng.lognormal(8, 1.5, 2000).round()
+    split = int(rng.integers(1, 2000))
+    merged = PostingStats.from_values(slots[:split], values[:split]).merge(
+        PostingStats.from_values(slots[split:], values[split:]))
+    assert_stats_close(merged, PostingStats.from_values(slots, values))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_remove_undoes_merge(seed):
+    rng = np.random.default_rng(seed)
+    a, b = random_stats(rng, 1500), random_stats(rng, int(rng.integers(1, 500)))
+    assert_stats_close(a.merge(b).remove(b), a)
+    # Удаление всего набора даёт пустую статистику
+    assert_stats_close(b.remove(b), PostingStats.empty())
+
+
+def page(post_ids, views_of) -> PageColumns:
+    return PageColumns.from_records([{
+        "post_id": post_id,
+        "date": datetime.fromtimestamp(1_700_000_000 + post_id * 5281, timezone.utc),
+        "views": views_of(post_id),
+        "text_preview": "[медиа]",
+        "text": None,
+    } for post_id in post_ids])
+
+
+def test_incremental_store_stats_match_rebuild():
+    rng = random.Random(7)
+    store = PostStore(":memory:")
+    # Первичная загрузка, затем обновления просмотров пересекающимися окнами и повторы тех же постов
+    store.upsert_posts("demo", page(range(1, 301), lambda i: 1000 + i))
+    for _ in range(30):
+        start = rng.randint(1, 320)
+        window = range(start, start + rng.randint(1, 40))
+        store.upsert_posts("demo", page(window, lambda i: rng.randint(100, 100_000)))
+    store.upsert_posts("demo", page(range(250, 300), lambda i: 5))
+
+    history = store.load_batch("demo")
+    assert_stats_close(store.posting_stats("demo"), PostingStats.from_posts(history.timestamps, history.views))
+    assert store.posting_stats("demo").total == len(history) > 300
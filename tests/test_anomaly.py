@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from anomaly import DIP, SPIKE, detect_anomalies
+
+
+@pytest.mark.parametrize("window", [1, 2, 3, 20, 21, 22])
+@pytest.mark.parametrize("n", [0, 1, 2, 5, 6, 7, 20, 21, 100])
+def test_any_window_gives_odd_centered_window(window, n):
+    views = np.random.default_rng(n).integers(1_000, 2_000, n)
+    report = detect_anomalies(views, np.arange(n) * 3600, window=window)
+    assert len(report) == n
+    assert report.window % 2 == 1
+    assert report.window <= max(n, 1)
+
+
+def test_even_window_flags_spike_and_dip():
+    views = np.full(60, 1_000)
+    views[20], views[40] = 30_000, 30
+    report = detect_anomalies(views, window=20)
+    assert report.window == 19
+    assert np.flatnonzero(report.flags & SPIKE).tolist() == [20]
+    assert np.flatnonzero(report.flags & DIP).tolist() == [40]
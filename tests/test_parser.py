@@ -0,0 +1,105 @@
+import pytest
+
+import fake_tme
+from scraper import crawl_channel, parse_posts_fast, parse_posts_soup
+
+
+def message(post_id, text_html=None, views="1.2K", date="2024-03-01T10:00:00+00:00", extra=""):
+    """Блок поста в разметке t.me; text_html=None — пост без текста (только медиа)"""
+    text = f'<div class="tgme_widget_message_text js-message_text" dir="auto">{text_html}</div>' if text_html is not None else ""
+    return (
+        '<div class="tgme_widget_message_wrap js-widget_message_wrap">'
+        f'<div class="tgme_widget_message text_not_supported_wrap js-widget_message" data-post="demo/{post_id}">'
+        f'{extra}{text}'
+        '<div class="tgme_widget_message_footer compact js-message_footer">'
+        f'<div class="tgme_widget_message_info short js-message_info"><span class="tgme_widget_message_views">{views}</span>'
+        f'<span class="tgme_widget_message_meta"><a class="tgme_widget_message_date" href="https://t.me/demo/{post_id}">'
+        f'<time datetime="{date}" class="time">10:00</time></a></span></div></div></div></div>'
+    )
+
+
+def page(*messages, head=""):
+    return f'<html><head>{head}</head><body><section class="tgme_channel_history">{"".join(messages)}</section></body></html>'
+
+
+PAGES = {
+    "quoted_gt_in_attributes": page(
+        message(1, 'Ссылка <a href="https://example.com/?q=a>b" title=\'x > y\'>тут</a> и дальше'),
+        message(2, 'Текст', extra='<div class="tgme_widget_message_author" data-title="a > b"><span>Автор</span></div>'),
+    ),
+    "entities": page(message(3, 'A &amp; B &lt;tag&gt; &quot;q&quot; &#8212; &#x2014; &nbsp;&copy &laquo;ёлка&raquo;')),
+    "nested_divs": page(message(4, 'Верх <div class="inner"><div>глубже <b>жирный</b></div></div> низ<br/>строка')),
+    "scripts_and_comments": page(
+        message(5, 'До<script>var s = "<div class=\\"tgme_widget_message\\">";</script> после<style>.a > b {}</style>'
+                   '<!-- <div> комментарий </div> --> конец'),
+        head='<script>document.write("<div class=\'tgme_widget_message\' data-post=\'x/9\'>")</script>',
+    ),
+    "media_only": page(
+        message(6, extra='<a class="tgme_widget_message_photo_wrap" style="background-image:url(\'https://cdn/x.jpg\')"></a>'),
+        message(7, ''),
+    ),
+    "reply_blocks": page(message(
+        8, 'Ответ на пост',
+        extra='<a class="tgme_widget_message_reply" href="https://t.me/demo/1"><div class="tgme_widget_message_author">'
+              '<span class="tgme_widget_message_author_name">Канал</span></div>'
+              '<div class="tgme_widget_message_text js-message_reply_text" dir="auto">Исходный &amp; пост</div></a>',
+    )),
+    "views_markup": page(
+        message(9, 'x', views='<span class="counter">12,3K</span>'),
+        message(10, 'y', views='нравится'),
+        message(11, 'z', views='1\xa0234'),
+    ),
+    "broken_posts": page(
+        '<div class="tgme_widget_message" data-post="demo/12"><div class="tgme_widget_message_text">без даты</div></div>',
+        message(13, 'нормальный'),
+        message(14, 'битая дата', date="не дата"),
+        message(15, 'без id').replace(' data-post="demo/15"', ''),
+    ),
+    "unquoted_and_case": page(
+        message(16, 'Регистр').replace('class="tgme_widget_message text_not_supported_wrap js-widget_message"',
+                                      'CLASS=tgme_widget_message'),
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(PAGES))
+def test_fast_parser_matches_soup(name):
+    html = PAGES[name]
+    expected = parse_posts_soup(html)
+    assert expected, "страница должна давать хотя бы один пост"
+    assert parse_posts_fast(html) == expected
+
+
+def test_fast_parser_on_fake_tme_page():
+    html = page(*(fake_tme.post_html("demo", i) for i in range(1, 21)))
+    records = parse_posts_fast(html)
+    assert records == parse_posts_soup(html)
+    assert [r["post_id"] for r in records] == list(range(1, 21))
+
+
+def test_fast_parser_examples():
+    records = {r["post_id"]: r for name in ("quoted_gt_in_attributes", "scripts_and_comments", "media_only")
+               for r in parse_posts_fast(PAGES[name])}
+    assert records[1]["text"] == "Ссылка тут и дальше"
+    assert records[5]["text"] == "До после конец"
+    assert records[6]["text_preview"] == "[медиа]"
+    assert 9 not in records
+
+
+def test_crawl_budget_counts_parsed_posts(run_fake_tme, monkeypatch):
+    post_html = fake_tme.post_html
+
+    def without_views(channel, post_id):
+        # Каждый второй пост — служебный, без счётчика просмотров: разбор его отбрасывает
+        html = post_html(channel, post_id)
+        return html if post_id % 2 else html.replace("tgme_widget_message_views", "tgme_widget_message_meta")
+
+    monkeypatch.setattr(fake_tme, "post_html", without_views)
+
+    async def scenario(app, session):
+        return [page async for page in crawl_channel(session, "demo", max_posts=30)]
+
+    pages = run_fake_tme(scenario, posts=100)
+    post_ids = [i for page in pages for i in page.post_ids]
+    assert len(post_ids) == 30
+    assert sorted(post_ids) == list(range(41, 100, 2))
@@ -0,0 +1,208 @@
+import asyncio
+import itertools
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+import fake_tme
+import scraper
+from ratelimit import HTTP_RETRY_AFTER_MAX, HTTP_RETRY_ATTEMPTS, CircuitBreaker, get_host_policy
+from scraper import (
+    DEFAULT_HEADERS,
+    RateLimitedError,
+    UpstreamUnavailableError,
+    channel_url,
+    request_page,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # Разброс между повторами проверяется отдельно от политики хоста; здесь он только замедлял бы тесты
+    monkeypatch.setattr(scraper, "backoff_delay", lambda attempt: 0)
+
+
+def host_policy():
+    """Политика хоста заглушки (у каждого тестового сервера свой порт — и своя политика)"""
+    return get_host_policy(urlparse(channel_url("demo")).netloc)
+
+
+async def get_page(session):
+    return await request_page(session, channel_url("demo"), DEFAULT_HEADERS)
+
+
+def scripted_errors(monkeypatch, outcomes):
+    """Ответы заглушки по сценарию: True — 503, False — нормальная страница"""
+    values = itertools.chain((0.0 if fail else 1.0 for fail in outcomes), itertools.repeat(1.0))
+    monkeypatch.setattr(fake_tme.random, "random", lambda: next(values))
+
+
+def test_retry_after_pauses_host_and_retries(run_fake_tme):
+    async def scenario(app, session):
+        status, _, _ = await get_page(session)
+        assert status == 200
+        # Второй запрос в ту же секунду получает 429 с Retry-After: 1, повтор — после паузы
+        started = time.monotonic()
+        status, body, _ = await get_page(session)
+        return status, body, time.monotonic() - started, app[fake_tme.FAKE].stats
+
+    status, body, elapsed, stats = run_fake_tme(scenario, rate=1, retry_after=1)
+    assert status == 200 and b"tgme_widget_message" in body
+    assert stats["throttled"] == 1
+    assert elapsed >= 0.9
+    policy = host_policy()
+    assert policy.metrics["throttled"] == 1
+    assert policy.metrics["retries"] == 1
+    assert policy.metrics["paused_seconds"] > 0.5
+
+
+def test_long_retry_after_fails_fast(run_fake_tme):
+    async def scenario(app, session):
+        await get_page(session)
+        started = time.monotonic()
+        with pytest.raises(RateLimitedError) as error:
+            await get_page(session)
+        return error.value, time.monotonic() - started, app[fake_tme.FAKE].stats
+
+    error, elapsed, stats = run_fake_tme(scenario, rate=1, retry_after=int(HTTP_RETRY_AFTER_MAX) + 30)
+    assert error.status == 429
+    assert error.retry_after == HTTP_RETRY_AFTER_MAX + 30
+    # Без повторов и без ожидания внутри запроса
+    assert stats["requests"] == 2
+    assert elapsed < 1
+
+
+def test_server_errors_are_retried(run_fake_tme, monkeypatch):
+    scripted_errors(monkeypatch, [True, True])
+
+    async def scenario(app, session):
+        status, _, _ = await get_page(session)
+        return status, app[fake_tme.FAKE].stats
+
+    status, stats = run_fake_tme(scenario, error_rate=0.5)
+    assert status == 200
+    assert stats == {**stats, "requests": 3, "errors": 2, "ok": 1}
+    assert host_policy().metrics["retries"] == 2
+    assert host_policy().metrics["server_errors"] == 2
+
+
+def test_server_errors_exhaust_attempts(run_fake_tme):
+    async def scenario(app, session):
+        with pytest.raises(UpstreamUnavailableError) as error:
+            await get_page(session)
+        return error.value, app[fake_tme.FAKE].stats
+
+    error, stats = run_fake_tme(scenario, error_rate=1.0)
+    assert error.status == 503
+    assert stats["requests"] == HTTP_RETRY_ATTEMPTS
+
+
+def test_breaker_opens_probes_and_closes(run_fake_tme):
+    async def scenario(app, session):
+        policy = host_policy()
+        policy.breaker = CircuitBreaker(failures=2, reset_timeout=0.3)
+
+        # Две ошибки подряд размыкают предохранитель, третья попытка уже не уходит на сервер
+        with pytest.raises(UpstreamUnavailableError, match="временно недоступен"):
+            await get_page(session)
+        assert policy.breaker.state == "open"
+        assert app[fake_tme.FAKE].stats["requests"] == 2
+
+        with pytest.raises(UpstreamUnavailableError, match="временно недоступен"):
+            await get_page(session)
+        assert app[fake_tme.FAKE].stats["requests"] == 2
+        assert policy.metrics["rejected"] == 2
+
+        # После reset_timeout пробный запрос проходит и замыкает предохранитель
+        app[fake_tme.FAKE].error_rate = 0.0
+        await asyncio.sleep(0.35)
+        status, _, _ = await get_page(session)
+        assert status == 200
+        assert policy.breaker.state == "closed"
+        assert policy.breaker.opens == 1
+
+    run_fake_tme(scenario, error_rate=1.0)
+
+
+def test_failed_probe_reopens_breaker(run_fake_tme):
+    async def scenario(app, session):
+        policy = host_policy()
+        policy.breaker = CircuitBreaker(failures=2, reset_timeout=0.2)
+        with pytest.raises(UpstreamUnavailableError):
+            await get_page(session)
+        await asyncio.sleep(0.25)
+        requests = app[fake_tme.FAKE].stats["requests"]
+        # Пробный запрос снова получает 503 — предохранитель размыкается без новых попыток
+        with pytest.raises(UpstreamUnavailableError):
+            await get_page(session)
+        assert app[fake_tme.FAKE].stats["requests"] == requests + 1
+        assert policy.breaker.state == "open"
+        assert policy.breaker.opens == 2
+
+    run_fake_tme(scenario, error_rate=1.0)
+
+
+def test_cancelled_probe_releases_breaker(run_fake_tme):
+    async def scenario(app, session):
+        policy = host_policy()
+        policy.breaker = CircuitBreaker(failures=2, reset_timeout=0.1)
+        with pytest.raises(UpstreamUnavailableError):
+            await get_page(session)
+        await asyncio.sleep(0.15)
+
+        # Пробный запрос ждёт паузы Retry-After и отменяется, не дойдя до сервера
+        policy._paused_until = time.monotonic() + 10
+        probe = asyncio.ensure_future(get_page(session))
+        await asyncio.sleep(0.05)
+        assert policy.breaker.state == "half_open"
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert not policy.breaker._probe_in_flight
+
+        # Следующий запрос становится пробным и замыкает предохранитель
+        policy._paused_until = 0.0
+        app[fake_tme.FAKE].error_rate = 0.0
+        status, _, _ = await get_page(session)
+        assert status == 200
+        assert policy.breaker.state == "closed"
+        assert policy.in_flight == 0
+
+    run_fake_tme(scenario, error_rate=1.0)
+
+
+def test_aimd_halves_on_errors_and_grows_on_success(run_fake_tme, monkeypatch):
+    scripted_errors(monkeypatch, [True])
+
+    async def scenario(app, session):
+        policy = host_policy()
+        initial = policy.limit
+        await get_page(session)
+        # Одна 503 — одно мультипликативное снижение, затем +1/limit за успешный ответ
+        assert policy.metrics["decreases"] == 1
+        assert policy.limit == pytest.approx(initial / 2 + 2 / initial)
+        limits = [policy.limit]
+        for _ in range(10):
+            await get_page(session)
+            limits.append(policy.limit)
+        assert all(b > a for a, b in zip(limits, limits[1:]))
+        assert policy.limit <= policy.maximum
+
+    run_fake_tme(scenario, error_rate=0.5)
+
+
+def test_aimd_decreases_once_per_wave_of_throttling(run_fake_tme):
+    async def scenario(app, session):
+        policy = host_policy()
+        initial = policy.limit
+        await get_page(session)
+        # Два из четырёх одновременных запросов упираются в 429, но лимит снижается один раз за волну,
+        # а после паузы Retry-After оба повтора проходят
+        results = await asyncio.gather(*(get_page(session) for _ in range(4)), return_exceptions=True)
+        assert [r[0] for r in results] == [200] * 4
+        assert policy.metrics["throttled"] == 2
+        assert policy.metrics["decreases"] == 1
+        assert policy.limit < initial
+
+    run_fake_tme(scenario, rate=3, retry_after=1)
@@ -0,0 +1,127 @@
+import asyncio
+import random
+
+import pytest
+
+import scheduler
+from scheduler import HostPoliteness, Scheduler, with_jitter
+from storage import PostStore
+
+
+class FakeClock:
+    """Подменные часы: ожидание не спит, а сдвигает время"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        self.now += max(delay, 0)
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    """Вместо обхода t.me — запись (канал, время) каждого обновления"""
+    calls = []
+
+    def install(clock):
+        async def fake_refresh(store, session, channel, max_posts, parse_pool=None):
+            calls.append((channel, clock()))
+            return {"new_posts": 1, "backfilled": 0}
+
+        monkeypatch.setattr(scheduler, "refresh_channel", fake_refresh)
+        monkeypatch.setattr(scheduler, "get_session", lambda: None)
+        return calls
+
+    return install
+
+
+def test_jitter_stays_within_bounds():
+    random.seed(1)
+    delays = [with_jitter(3600, 0.1) for _ in range(1000)]
+    assert all(3240 <= d <= 3960 for d in delays)
+    assert max(delays) - min(delays) > 500
+
+
+def test_due_channels_are_refreshed_most_overdue_first(refreshes):
+    clock = FakeClock()
+    calls = refreshes(clock)
+    store = PostStore(":memory:")
+    store.track_channel("late", 3600, next_run_at=clock.now - 30)
+    store.track_channel("later", 3600, next_run_at=clock.now - 10)
+    store.track_channel("latest", 3600, next_run_at=clock.now - 20)
+    store.track_channel("future", 3600, next_run_at=clock.now + 60)
+
+    sched = Scheduler(store, concurrency=1, politeness=HostPoliteness(min_interval=0, clock=clock, sleep=clock.sleep),
+                      clock=clock, jitter=0)
+    asyncio.run(sched.run_once())
+
+    assert [channel for channel, _ in calls] == ["late", "latest", "later"]
+    assert {t["channel"]: t["next_run_at"] for t in store.tracked_channels()}["late"] == clock.now + 3600
+
+
+@pytest.mark.parametrize("jitter", [0, 0.1])
+def test_channels_are_never_refreshed_faster_than_interval(refreshes, jitter):
+    random.seed(2)
+    clock = FakeClock()
+    calls = refreshes(clock)
+    store = PostStore(":memory:")
+    intervals = {"hourly": 3600, "halfhour": 1800, "daily": 86400}
+    for channel, interval in intervals.items():
+        store.track_channel(channel, interval, next_run_at=clock.now)
+
+    sched = Scheduler(store, politeness=HostPoliteness(min_interval=2, clock=clock, sleep=clock.sleep),
+                      clock=clock, jitter=jitter)
+
+    async def simulate():
+        # Двое суток опросов раз в минуту
+        for _ in range(2 * 24 * 60):
+            await sched.run_once()
+            clock.now += 60
+
+    asyncio.run(simulate())
+
+    for channel, interval in intervals.items():
+        times = [t for c, t in calls if c == channel]
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        assert gaps, channel
+        assert min(gaps) >= interval * (1 - jitter)
+        # Просроченный канал подхватывается на ближайшем опросе
+        assert max(gaps) <= interval * (1 + jitter) + 60 + 2 * len(intervals)
+    assert sched.stats["refreshed"] == len(calls)
+
+
+def test_host_politeness_spaces_starts_and_caps_concurrency():
+    clock = FakeClock()
+    politeness = HostPoliteness(concurrency=2, min_interval=5, clock=clock, sleep=clock.sleep)
+    starts = []
+    active = peak = 0
+
+    async def job():
+        nonlocal active, peak
+        async with politeness.slot("t.me"):
+            starts.append(clock.now)
+            active += 1
+            peak = max(peak, active)
+            await clock.sleep(20)
+            active -= 1
+
+    async def other_host():
+        async with politeness.slot("example.org"):
+            return clock.now
+
+    async def main():
+        started_at = clock.now
+        other_start, *_ = await asyncio.gather(other_host(), *(job() for _ in range(6)))
+        return started_at, other_start
+
+    started_at, other_start = asyncio.run(main())
+    assert peak == 2
+    assert len(starts) == 6
+    assert starts[0] == started_at
+    assert all(b - a >= 5 for a, b in zip(starts, starts[1:]))
+    # Пауза между стартами действует на каждый хост отдельно
+    assert other_start == started_at
@@ -0,0 +1,124 @@
+import threading
+from datetime import datetime, timezone
+
+from fake_tme import FAKE
+from parse_pool import ParsePool
+from scraper import PageColumns
+from storage import PostStore, refresh_channel
+
+
+def test_refresh_fills_gap_left_by_budget(run_fake_tme):
+    store = PostStore(":memory:")
+
+    async def scenario(app, session):
+        await refresh_channel(store, session, "demo", max_posts=100)
+        # Канал вырос на 200 постов, а первое обновление успевает взять только 15
+        app[FAKE].posts = 300
+        first = await refresh_channel(store, session, "demo", max_posts=15)
+        assert first == {"new_posts": 15, "backfilled": 0}
+        assert store.crawl_gaps("demo") == [(100, 286)]
+
+        second = await refresh_channel(store, session, "demo", max_posts=200)
+        assert second["new_posts"] == 185
+        assert store.crawl_gaps("demo") == []
+
+    run_fake_tme(scenario, posts=100)
+    batch = store.load_batch("demo", limit=200)
+    assert list(batch.post_ids) == list(range(101, 301))
+
+
+def test_refresh_counts_backfill_separately(run_fake_tme):
+    store = PostStore(":memory:")
+
+    async def scenario(app, session):
+        await refresh_channel(store, session, "demo", max_posts=20)
+        return await refresh_channel(store, session, "demo", max_posts=60, recent_window=5)
+
+    result = run_fake_tme(scenario, posts=100)
+    assert result == {"new_posts": 0, "backfilled": 40}
+    assert store.post_stats("demo") == {"count": 60, "min_post_id": 41, "max_post_id": 100}
+
+
+def test_refresh_writes_off_the_event_loop_thread(run_fake_tme, monkeypatch):
+    store = PostStore(":memory:")
+    threads = []
+    upsert = store.upsert_posts
+
+    def recording_upsert(channel, records):
+        threads.append(threading.current_thread())
+        return upsert(channel, records)
+
+    monkeypatch.setattr(store, "upsert_posts", recording_upsert)
+
+    async def scenario(app, session):
+        await refresh_channel(store, session, "demo", max_posts=60)
+        return threading.current_thread()
+
+    loop_thread = run_fake_tme(scenario, posts=100)
+    assert threads and loop_thread not in threads
+    assert store.post_stats("demo")["count"] == 60
+
+
+def test_refresh_through_parse_pool(run_fake_tme):
+    store = PostStore(":memory:")
+    pool = ParsePool(workers=1)
+    try:
+        result = run_fake_tme(lambda app, session: refresh_channel(store, session, "demo", max_posts=50, parse_pool=pool),
+                              posts=100)
+    finally:
+        pool.shutdown()
+    assert result == {"new_posts": 50, "backfilled": 0}
+    batch = store.load_batch("demo")
+    assert list(batch.post_ids) == list(range(51, 101))
+    assert batch.text_at(0).startswith("Пост 51 канала demo: заметка о разработке & инструментах")
+
+
+def post_record(post_id, text=None):
+    return {
+        "post_id": post_id,
+        "date": datetime.fromtimestamp(1_700_000_000 + post_id * 3600, timezone.utc),
+        "views": 100 + post_id,
+        "text_preview": text[:50] + "..." if text else "[медиа]",
+        "text": text,
+    }
+
+
+def test_load_batch_returns_full_text():
+    store = PostStore(":memory:")
+    text = "Длинный пост про python и асинхронность, " * 5
+    # У поста только с медиа парсер отдаёт пустой текст
+    records = [post_record(1, text), post_record(2, "Коротко"), post_record(3), post_record(4, "")]
+    store.upsert_posts("demo", PageColumns.from_records(records))
+    batch = store.load_batch("demo")
+    assert batch.texts() == [text, "Коротко", "", ""]
+    # Превью в таблице для отрисовки — как у парсера
+    assert batch.to_frame()["text_preview"].tolist() == [r["text_preview"] for r in records]
+    assert records[1]["text_preview"] == "Коротко..."
+
+
+def test_rows_without_full_text_keep_their_preview():
+    store = PostStore(":memory:")
+    records = [post_record(1, "Старый пост про python, сохранённый только с превью текста"), post_record(2, "Коротко"),
+               post_record(3)]
+    # Строки из базы до хранения полного текста: text = NULL
+    store.upsert_posts("demo", PageColumns.from_records([{**r, "text": None} for r in records]))
+    batch = store.load_batch("demo")
+    assert batch.texts() == [records[0]["text"][:50], "Коротко", ""]
+    assert batch.to_frame()["text_preview"].tolist() == [r["text_preview"] for r in records]
+    assert store.posts_with_term("demo", "python") == [1]
+    assert store.posts_with_term("demo", "медиа") == []
+
+
+def test_upsert_without_text_keeps_stored_text_indexed():
+    store = PostStore(":memory:")
+    # Термин встречается только в конце текста, за пределами превью
+    text = "Обзор новостей недели и ответы на вопросы читателей, а в конце — python"
+    store.upsert_posts("demo", PageColumns.from_records([post_record(i, text) for i in range(1, 21)]))
+    assert len(store.posts_with_term("demo", "python")) == 20
+
+    # Повторный обход без полного текста (например, пост перечитан из превью) не меняет сохранённый текст
+    store.upsert_posts("demo", PageColumns.from_records(
+        [{**post_record(i), "text_preview": text[:50] + "..."} for i in range(1, 11)]))
+    assert store.load_batch("demo").texts() == [text] * 20
+    assert len(store.posts_with_term("demo", "python")) == 20
+    assert store.term_stats("demo", ["python"])["python"]["posts"] == 20
@@ -0,0 +1,96 @@
+import asyncio
+import math
+import uuid
+
+import pytest
+
+import telemetr
+from fake_telemetr import FAKE, fake_audience
+from storage import PostStore
+from telemetr import TelemetrClient, fetch_audience
+
+
+def make_client(base_url, **options):
+    # У каждого клиента свой ключ — и своя квота в общем реестре ratelimit
+    options.setdefault("quota_per_minute", 1000)
+    return TelemetrClient(api_key=f"test-{uuid.uuid4().hex}", base_url=base_url, store=PostStore(":memory:"),
+                          **options)
+
+
+def test_concurrent_lookups_are_batched(run_fake_telemetr):
+    channels = [f"channel_{i}" for i in range(45)]
+
+    async def scenario(app, base_url):
+        client = make_client(base_url, batch_size=20, batch_window=0.05)
+        results = await asyncio.gather(*(client.get(c) for c in channels))
+        return client, results, app[FAKE].stats
+
+    client, results, stats = run_fake_telemetr(scenario)
+    assert stats["requests"] <= math.ceil(len(channels) / 20)
+    assert stats["max_batch_seen"] <= 20
+    assert stats["channels"] == len(channels)
+    assert [r["gender"] for r in results] == [fake_audience(c)["gender"] for c in channels]
+    assert all(r["source"] == "telemetr" for r in results)
+    assert client.stats["requests"] == stats["requests"]
+
+
+def test_duplicate_lookups_share_one_request(run_fake_telemetr):
+    async def scenario(app, base_url):
+        client = make_client(base_url)
+        results = await asyncio.gather(*(client.get("Habr_Com") for _ in range(5)), client.get("habr_com"))
+        return results, app[FAKE].stats
+
+    results, stats = run_fake_telemetr(scenario)
+    assert stats["requests"] == 1 and stats["channels"] == 1
+    assert all(r == results[0] for r in results)
+
+
+def test_cache_hits_skip_the_api(run_fake_telemetr):
+    async def scenario(app, base_url):
+        client = make_client(base_url)
+        first = await client.get_many(["alpha", "beta"])
+        requests = app[FAKE].stats["requests"]
+        second = await client.get_many(["alpha", "beta"])
+        return client, first, second, requests, app[FAKE].stats["requests"]
+
+    client, first, second, before, after = run_fake_telemetr(scenario)
+    assert first == second
+    assert before == after == 1
+    assert client.stats["cache_hits"] == 2
+
+
+@pytest.mark.parametrize("miss_ttl, expected_requests", [(3600, 1), (0, 2)])
+def test_unknown_channel_is_cached_for_miss_ttl(run_fake_telemetr, miss_ttl, expected_requests):
+    async def scenario(app, base_url):
+        client = make_client(base_url, miss_ttl=miss_ttl)
+        first = await client.get("unknown_channel")
+        second = await client.get("unknown_channel")
+        return first, second, app[FAKE].stats["requests"]
+
+    first, second, requests = run_fake_telemetr(scenario)
+    assert first is None and second is None
+    assert requests == expected_requests
+
+
+def test_exhausted_quota_returns_none_and_is_not_cached(run_fake_telemetr):
+    async def scenario(app, base_url):
+        client = make_client(base_url, batch_window=0.01)
+        served = await client.get("alpha")
+        # Квота заглушки — один запрос в минуту: Retry-After больше HTTP_RETRY_AFTER_MAX, повтора нет
+        throttled = await client.get("beta")
+        return client, served, throttled, app[FAKE].stats
+
+    client, served, throttled, stats = run_fake_telemetr(scenario, quota=1)
+    assert served is not None
+    assert throttled is None
+    assert stats["throttled"] == 1
+    assert client.stats["errors"] == 1
+    assert client.store.get_audience(["alpha", "beta"], ttl=None, miss_ttl=None) == {"alpha": served}
+
+
+def test_missing_key_falls_back_to_sample(monkeypatch):
+    monkeypatch.setattr(telemetr, "TELEMETR_API_KEY", "")
+    monkeypatch.setattr(telemetr, "_client", None)
+    audience = asyncio.run(fetch_audience("habr_com"))
+    assert audience["source"] == "sample"
+    assert audience == telemetr.sample_audience("habr_com")
@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+import pytest
+
+from scraper import parse_views, parse_views_batch
+
+SUFFIXES = ["", "K", "k", "к", "К", "M", "m", "м", "М", "тыс", "тыс.", "млн", "млн."]
+SEPARATORS = [" ", "\xa0", ".", ","]
+NOISE = ["", " ", "\xa0", "  ", "👁 ", " views", " просмотров"]
+
+
+def random_number(rng: random.Random) -> str:
+    """Число в одном из видов, которые встречаются на t.me: 12, 1.2, 1,25, 1 234, 12.345.678"""
+    kind = rng.randrange(4)
+    if kind == 0:
+        return str(rng.randrange(0, 10 ** rng.randint(1, 7)))
+    if kind == 1:
+        return f"{rng.randrange(0, 1000)}{rng.choice('.,')}{rng.randrange(0, 100)}"
+    groups = [str(rng.randrange(1, 1000))] + [f"{rng.randrange(0, 1000):03d}" for _ in range(rng.randint(1, 3))]
+    return rng.choice(SEPARATORS).join(groups)
+
+
+def random_views(rng: random.Random) -> str:
+    if rng.random() < 0.05:
+        return rng.choice(["нравится", "Like", "", "   ", "—", "K", "views"])
+    space = rng.choice(["", "", " ", "\xa0"])
+    return rng.choice(NOISE) + random_number(rng) + space + rng.choice(SUFFIXES) + rng.choice(NOISE)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_batch_matches_scalar(seed):
+    rng = random.Random(seed)
+    values = [random_views(rng) for _ in range(500)]
+    # Повторы — основной случай для разбора по уникальным значениям
+    values += rng.choices(values, k=200)
+    assert parse_views_batch(values).tolist() == [parse_views(v) for v in values]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1.2K", 1200), ("1,15K", 1150), ("12.3M", 12_300_000), ("1 234", 1234), ("1\xa0234", 1234),
+    ("5 тыс", 5000), ("2 млн", 2_000_000), ("999", 999), ("нравится", 0), ("", 0),
+])
+def test_documented_grammar(value, expected):
+    assert parse_views(value) == expected
+    assert parse_views_batch([value]).tolist() == [expected]
+
+
+def test_missing_and_non_string_values():
+    values = [None, np.nan, 1200, 1.5, b"1.2K", ["1K"], "1.2K"]
+    assert parse_views_batch(values).tolist() == [parse_views(v) for v in values] == [0, 0, 0, 0, 0, 0, 1200]
+
+
+def test_empty_batch():
+    assert parse_views_batch([]).dtype == np.int64
+    assert len(parse_views_batch([])) == 0
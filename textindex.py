@@ -0,0 +1,71 @@
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+# === НАСТРОЙКИ ТЕКСТОВОГО ИНДЕКСА ===
+# Темы для отчёта: термины хотя бы из TOPIC_MIN_POSTS постов, по убыванию среднего охвата
+TOPIC_MIN_POSTS = int(os.getenv("TOPIC_MIN_POSTS", "3"))
+TOPIC_LIMIT = int(os.getenv("TOPIC_LIMIT", "10"))
+MIN_TERM_LENGTH = 2
+
+# Слова вида python, c++, c#, data-science, #хэштег; слово начинается с буквы
+_TERM_RE = re.compile(r"#?[^\W\d_][\w+#-]*", re.UNICODE)
+
+STOPWORDS = frozenset("""
+и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне было вот от
+меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до вас нибудь опять уж вам
+ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего
+раз тоже себе под будет ж тогда кто этот того потому этого какой совсем ним здесь этом один почти мой тем
+чтобы нее сейчас были куда зачем всех никогда можно при наконец два об другой хоть после над больше тот через
+эти нас про всего них какая много разве три эту моя впрочем хорошо свою этой перед иногда лучше чуть том нельзя
+такой им более всегда конечно всю между это как-то также свои очень который которые которая которое своих
+вас ваш ваши вашего наш наши нашего пост поста посты канал канала каналы канале медиа подробнее читать ссылка
+the and for with that this from you your are was were will have has not but all can our out about into more
+new how what when who why its it's just get got via amp http https www com
+of to in is on at by be or an as we it my me so if do no up us am
+""".split())
+
+
+def normalize_term(word: str) -> str:
+    return word.lower().replace("ё", "е").strip("-")
+
+
+def tokenize(text: Optional[str]) -> Set[str]:
+    """
+    Уникальные термины текста: слова в нижнем регистре (ё → е) от MIN_TERM_LENGTH символов
+    и хэштеги, без стоп-слов. Словоформы не приводятся к основе.
+    """
+    if not text:
+        return set()
+    terms = set()
+    for match in _TERM_RE.finditer(text):
+        word = normalize_term(match.group())
+        # Составное слово индексируется целиком и по частям: ai-ассистент → ai-ассистент, ai, ассистент;
+        # хэштег — и как #тег, и как слово
+        parts = [word] + (word.lstrip("#").split("-") if "-" in word or word.startswith("#") else [])
+        for term in parts:
+            if len(term) < MIN_TERM_LENGTH and not any(c in term for c in "+#"):
+                continue
+            if term not in STOPWORDS:
+                terms.add(term)
+    return terms
+
+
+def query_terms(phrases: Iterable[str]) -> List[str]:
+    """Термины для поиска по фразам (например, интересам аудитории): «Data Science» → data, science"""
+    terms: Set[str] = set()
+    for phrase in phrases:
+        terms |= tokenize(phrase)
+    return sorted(terms)
+
+
+def term_row(term: str, count: int, mean: float, ci_low: float, ci_high: float) -> Dict:
+    """Статистика охвата термина в сериализуемом виде (интервал — None, если постов меньше двух)"""
+    return {
+        "term": term,
+        "posts": int(count),
+        "avg_views": float(mean),
+        "ci_low": None if math.isnan(ci_low) else float(max(ci_low, 0)),
+        "ci_high": None if math.isnan(ci_high) else float(ci_high),
+    }